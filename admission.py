@@ -0,0 +1,180 @@
+"""
+Admission control in front of ``call_agent``.
+
+Expensive work is grouped into classes (LLM calls, market data, forecasting,
+reports), each behind a global concurrency limit with a bounded wait queue. On
+top of that every user has a token bucket, and heavier intents cost more
+tokens. A request that would exceed its user's rate, or that finds its class
+queue full or not freeing up within ADMISSION_WAIT_SECONDS, gets an immediate
+"busy" reply instead of piling onto a backlog and timing out.
+
+The per-user buckets apply everywhere. The class gates only see concurrent
+requests in the web app, whose sessions share one process. The Telegram bot
+handles updates one at a time (its Application is built without
+``concurrent_updates``, because every request writes through the one shared
+SQLite connection), so there the gates never queue anything.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from tracing import span
+import config
+
+logger = logging.getLogger(__name__)
+
+INTENT_CLASSES = {
+    "general": "llm",
+    "stock": "market_data",
+    "stock_analysis": "market_data",
+    "stock_comparison": "market_data",
+    "mutual_fund_analysis": "market_data",
+    "sector_analysis": "market_data",
+    "investment_recommendation": "market_data",
+    "dfg_analysis": "forecasting",
+    "behavioral_analysis": "forecasting",
+    "report_generation": "reports",
+}
+LIGHT_CLASS = "light"  # Plain SQLite reads/writes: rate-limited per user only
+
+# Token-bucket cost per request; a chat answer costs one token, like a plain SQLite command
+CLASS_COSTS = {"light": 1, "llm": 1, "market_data": 2, "forecasting": 3, "reports": 5}
+
+MAX_TRACKED_USERS = 20000
+
+BUSY_REPLY = "⏳ I'm handling a lot of requests right now. Please try again in a minute!"
+RATE_LIMITED_REPLY = ("🐢 You've sent a lot of requests in a short time, so I'm pacing them. "
+                      "Please wait about {seconds}s and try again.")
+
+class AdmissionRejected(Exception):
+    """Raised instead of running a request; ``reply`` is the message to send back."""
+
+    def __init__(self, reply: str, reason: str):
+        super().__init__(reason)
+        self.reply = reply
+        self.reason = reason
+
+class ConcurrencyGate:
+    """A counting semaphore whose waiting line has a fixed length."""
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if self.active < self.limit and self.waiting == 0:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.limit, timeout)
+            finally:
+                self.waiting -= 1
+            if admitted:
+                self.active += 1
+            return admitted
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+class AdmissionController:
+    """Global per-class gates plus per-user token buckets."""
+
+    def __init__(self, limits: Dict[str, int] = None, queue_factor: int = None, wait_seconds: float = None,
+                 user_burst: float = None, user_rate: float = None):
+        limits = limits or {
+            "llm": config.ADMISSION_LLM_CONCURRENCY,
+            "market_data": config.ADMISSION_MARKET_DATA_CONCURRENCY,
+            "forecasting": config.ADMISSION_FORECAST_CONCURRENCY,
+            "reports": config.ADMISSION_REPORT_CONCURRENCY,
+        }
+        queue_factor = config.ADMISSION_QUEUE_FACTOR if queue_factor is None else queue_factor
+        self.gates = {name: ConcurrencyGate(limit, limit * queue_factor) for name, limit in limits.items()}
+        self.wait_seconds = config.ADMISSION_WAIT_SECONDS if wait_seconds is None else wait_seconds
+        self.user_burst = config.ADMISSION_USER_BURST if user_burst is None else user_burst
+        self.user_rate = config.ADMISSION_USER_RATE if user_rate is None else user_rate
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._bucket_lock = threading.Lock()
+        self.counts = Counter()
+
+    def _take_tokens(self, telegram_id: int, cost: float) -> Optional[float]:
+        """Charge the user's bucket; returns seconds until enough tokens if it can't pay."""
+        now = time.monotonic()
+        with self._bucket_lock:
+            bucket = self._buckets.get(telegram_id)
+            if bucket is None:
+                bucket = self._buckets[telegram_id] = TokenBucket(self.user_burst)
+                if len(self._buckets) > MAX_TRACKED_USERS:
+                    # The least recently active user has long since refilled to a full bucket
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(telegram_id)
+                bucket.tokens = min(self.user_burst, bucket.tokens + (now - bucket.updated) * self.user_rate)
+                bucket.updated = now
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return None
+            return (cost - bucket.tokens) / self.user_rate
+
+    @contextmanager
+    def admit(self, telegram_id: int, intent: str) -> Iterator[None]:
+        """
+        Hold a slot for the request while the body runs.
+
+        :param telegram_id: The requesting user.
+        :param intent: The routed intent, which picks the class and token cost.
+        :raises AdmissionRejected: When the user is over their rate or the class is saturated.
+        """
+        intent_class = INTENT_CLASSES.get(intent, LIGHT_CLASS)
+        retry_after = self._take_tokens(telegram_id, CLASS_COSTS[intent_class])
+        if retry_after is not None:
+            self.counts[f"{intent_class}.rate_limited"] += 1
+            logger.info("Rate limited user %s on %s (retry in %.0fs)", telegram_id, intent_class, retry_after)
+            raise AdmissionRejected(RATE_LIMITED_REPLY.format(seconds=math.ceil(retry_after)), "rate_limited")
+
+        gate = self.gates.get(intent_class)
+        if gate is None:
+            self.counts[f"{intent_class}.admitted"] += 1
+            yield
+            return
+
+        with span("admission.wait", intent_class=intent_class):
+            admitted = gate.acquire(self.wait_seconds)
+        if not admitted:
+            self.counts[f"{intent_class}.busy"] += 1
+            logger.warning("Rejected %s request: %d running, %d waiting", intent_class, gate.active, gate.waiting)
+            raise AdmissionRejected(BUSY_REPLY, "busy")
+        self.counts[f"{intent_class}.admitted"] += 1
+        try:
+            yield
+        finally:
+            gate.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Running/waiting per class plus admitted, rate-limited and busy counters."""
+        return {
+            "gates": {name: {"active": g.active, "waiting": g.waiting, "limit": g.limit}
+                      for name, g in self.gates.items()},
+            "counts": dict(self.counts),
+        }
+
+# Create instance
+admission = AdmissionController()
@@ -1,38 +1,58 @@
 from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
-from langchain.prompts import ChatPromptTemplate
-from typing import TypedDict, Annotated, Literal
+from langgraph.constants import Send
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig, ensure_config
+from typing import TypedDict, Annotated, Literal, Callable, List, Optional
 import operator
+import json
+import asyncio
+import logging
 from tools.income_tool import income_tool
 from tools.fraud_tool import fraud_tool
 from tools.stock_tool import stock_tool
 from tools.goal_tool import goal_tool
 from tools.risk_tool import risk_tool
-from tools.investment_intelligence_tool import investment_intelligence_tool
+from tools.investment_intelligence_tool import investment_intelligence_tool, MAX_COMPARE_TICKERS
 from tools.report_tool import report_tool
 from tools.cash_flow_tool import predict_cash_flow
-from tools.dynamic_budget_tool import generate_dynamic_budget
+from tools.dynamic_budget_tool import generate_dynamic_budget, load_active_goals
 from tools.behavioral_bias_tool import analyze_user_activity
+from tools.ledger import get_ledger
+from tools.budget_tracker import budget_tracker
+from tools.ticker_resolver import resolve_tickers
+from tools.amount_parser import first_money, foreign_currency_reply, parse_goal_command
+from intent_router import route, route_clauses
+from intent_classifier import classify_intent
+from response_cache import response_cache, detect_language, is_context_dependent
+from model_router import complete
+from conversation_memory import conversation_memory
+from admission import admission, AdmissionRejected
+import tracing
 from database import db_conn, db_manager
 import os
 import config
 import re
 
+logger = logging.getLogger(__name__)
+
 # Define agent state
 class AgentState(TypedDict):
     telegram_id: int
     message: str
     intent: str
+    intent_rule: str
     response: str
     tool_calls: Annotated[list, operator.add]
-    file_paths: list
+    file_paths: Annotated[list, operator.add]
+    branches: list  # [(intent, message)] in message order
+    branch_run: list  # [(branch, intent, message)] one call_agent runs in order
+    partial_responses: Annotated[list, operator.add]  # [(branch, intent, response)]
+    conversation_log: Annotated[list, operator.add]  # [(branch, intent, message, response)] saved by merge_responses
 
-# Initialize Claude
-llm = ChatAnthropic(
-    model="claude-3-opus-20240229",
-    anthropic_api_key=config.ANTHROPIC_API_KEY,
-    temperature=0.7
-)
+MAX_PARALLEL_INTENTS = 3
+# Branches that write through the shared db_conn; they run one after another, in message order
+DB_WRITE_INTENTS = {'income', 'expense', 'goal', 'risk_profile', 'dfg_analysis', 'behavioral_analysis'}
+BRANCH_SEPARATOR = "\n\n━━━━━━━━━━━━━━━\n\n"
 
 # Create agent prompt
 prompt = ChatPromptTemplate.from_messages([
@@ -49,50 +69,98 @@ You help with:
 Be concise (2-3 sentences max), encouraging, and use emojis sparingly.
 Always prioritize user safety and financial security.
 
-Context: User #{telegram_id} is asking about {intent}"""),
+Context: User #{telegram_id} is asking about {intent}{history_summary}"""),
+    MessagesPlaceholder("history"),
     ("human", "{message}"),
 ])
 
 # Define workflow nodes
 def route_intent(state: AgentState) -> AgentState:
     """Determine user intent from message."""
-    message = state['message'].lower()
+    result = route(state['message'])
+    state['intent'] = result.intent
+    state['intent_rule'] = result.rule
     
-    # Check for specific intents
-    if any(word in message for word in ['earned', 'got paid', 'income', 'salary', 'received money']):
-        state['intent'] = 'income'
-    elif any(word in message for word in ['scam', 'fraud', 'guarantee', 'double', 'risk-free', 'suspicious', 'ponzi']):
-        state['intent'] = 'fraud'
-    elif any(word in message for word in ['goal', 'target', 'save for', 'saving for', 'allocate']):
-        state['intent'] = 'goal'
-    elif 'is' in message and 'good' in message and any(word in message for word in ['stock', 'share', 'company']):
-        state['intent'] = 'stock_analysis'
-    elif 'is' in message and 'good' in message and any(word in message for word in ['mutual fund', 'mf', 'fund']):
-        state['intent'] = 'mutual_fund_analysis'
-    elif any(word in message for word in ['sector', 'top performer', 'best stock', 'most profit', 'highest return']) and any(word in message for word in ['analyze', 'show', 'tell', 'which', 'find']):
-        state['intent'] = 'sector_analysis'
-    elif any(word in message for word in ['stock', 'share', 'equity', 'nse', 'bse']) and 'check' in message:
-        state['intent'] = 'stock'
-    elif any(word in message for word in ['suggest', 'recommend', 'investment', 'where to invest', 'should i invest']):
-        state['intent'] = 'investment_recommendation'
-    elif any(word in message for word in ['generate report', 'create report', 'download report', 'export report', 'pdf report', 'excel report', 'spreadsheet', 'spending report', 'investment report', 'comprehensive report']):
-        state['intent'] = 'report_generation'
-    elif any(word in message for word in ['dashboard', 'summary', 'overview']):
-        state['intent'] = 'dashboard'
-    elif any(word in message for word in ['expense', 'spent', 'paid for', 'bought']):
-        state['intent'] = 'expense'
-    elif any(word in message for word in ['risk', 'risk profile', 'risk level']):
-        state['intent'] = 'risk_profile'
-    elif any(word in message for word in ['dfg', 'cash flow', 'prediction', 'dynamic budget']):
-        state['intent'] = 'dfg_analysis'
-    elif any(word in message for word in ['bias', 'behavior', 'habits']):
-        state['intent'] = 'behavioral_analysis'
+    # No keyword rule fired: let the local classifier pick a tool before falling back to the LLM
+    if result.intent == 'general':
+        predicted = classify_intent(state['message'])
+        if predicted:
+            state['intent'] = predicted[0]
+            state['intent_rule'] = 'classifier'
+
+    # "I earned 20000 and check TCS stock": one branch per clause that asks for a tool
+    branches = route_clauses(state['message'])
+    if branches:
+        state['branches'] = branches[:MAX_PARALLEL_INTENTS]
+        state['intent'] = "+".join(intent for intent, _ in state['branches'])
+        state['intent_rule'] = 'clauses'
     else:
-        state['intent'] = 'general'
-    
+        state['branches'] = [(state['intent'], state['message'])]
+    tracing.set_attributes(intent=state['intent'], intent_rule=state['intent_rule'])
     return state
 
-def call_agent(state: AgentState) -> AgentState:
+def fan_out(state: AgentState) -> List[Send]:
+    """
+    Send branches to call_agent; LangGraph runs the sends concurrently. Read-only branches
+    get a send each; branches that write to the database share one and run in message
+    order, so "create goal X. allocate 5000 to X" can't race on the shared connection.
+    """
+    branches = list(enumerate(state['branches']))
+    runs = [[(i, intent, message)] for i, (intent, message) in branches if intent not in DB_WRITE_INTENTS]
+    writes = [(i, intent, message) for i, (intent, message) in branches if intent in DB_WRITE_INTENTS]
+    if writes:
+        runs.append(writes)
+    return [
+        Send("call_agent", {
+            **state,
+            "branch_run": run,
+            "response": "",
+            "file_paths": [],
+            "partial_responses": [],
+            "conversation_log": [],
+        })
+        for run in runs
+    ]
+
+def call_agent(state: AgentState) -> dict:
+    """
+    Admit each branch of this run under the per-user and per-class limits, then run its tool.
+    Only reducer channels are returned, so parallel runs can't overwrite each other.
+    """
+    # LangGraph sets the run's config in a context variable for each node call
+    run_config = ensure_config()
+    partial_responses, file_paths, conversation_log = [], [], []
+    for branch, intent, message in state['branch_run']:
+        branch_state = {**state, "intent": intent, "message": message, "response": "", "file_paths": [],
+                        "conversation_log": []}
+        try:
+            with admission.admit(state['telegram_id'], intent):
+                branch_state = run_intent(branch_state, run_config)
+        except AdmissionRejected as e:
+            branch_state['response'] = e.reply
+        partial_responses.append((branch, intent, branch_state['response']))
+        file_paths.extend(branch_state['file_paths'])
+        conversation_log.extend((branch, *entry) for entry in branch_state['conversation_log'])
+    return {
+        "partial_responses": partial_responses,
+        "file_paths": file_paths,
+        "conversation_log": conversation_log,
+    }
+
+def merge_responses(state: AgentState) -> dict:
+    """
+    Join branch replies in the order the user asked for them, and save the branches that
+    completed to the conversation history. Saving commits the shared connection, so it
+    happens here, after every branch is done, rather than in a branch that could commit
+    another branch's half-finished write.
+    """
+    for _, intent, message, response in sorted(state['conversation_log'], key=lambda entry: entry[0]):
+        db_manager.save_conversation(state['telegram_id'], message, response, intent)
+        conversation_memory.append(state['telegram_id'], message, response)
+    parts = sorted(state['partial_responses'], key=lambda part: part[0])
+    return {"response": BRANCH_SEPARATOR.join(response for _, _, response in parts if response)}
+
+def run_intent(state: AgentState, run_config: RunnableConfig) -> AgentState:
     """Call appropriate tool based on intent."""
     telegram_id = state['telegram_id']
     message = state['message']
@@ -114,22 +182,22 @@ def call_agent(state: AgentState) -> AgentState:
             if 'create' in message_lower or 'new' in message_lower or 'set' in message_lower:
                 # Extract goal name and amount
                 # Pattern: "create goal NAME with target AMOUNT"
-                match = re.search(r'(?:create|new|set)\s+goal\s+(.+?)\s+(?:with\s+)?(?:target|amount|of)?\s*₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)', message, re.IGNORECASE)
-                if match:
-                    goal_name = match.group(1).strip()
-                    target_amount = float(match.group(2).replace(',', ''))
-                    result = goal_tool._run(telegram_id, 'create', goal_name=goal_name, target_amount=target_amount)
+                command = parse_goal_command(message)
+                if command and command.amount and command.currency != 'INR':
+                    result = foreign_currency_reply(command.currency)
+                elif command and command.action == 'create' and command.goal_name and command.amount:
+                    result = goal_tool._run(telegram_id, 'create', goal_name=command.goal_name, target_amount=command.amount)
                 else:
                     result = "Please specify goal name and target amount.\n\nExample: 'Create goal Emergency Fund with target 100000'"
             
             elif 'allocate' in message_lower or 'add' in message_lower:
                 # Pattern: "allocate AMOUNT to GOAL"
-                # More flexible pattern to handle: 10, 10rs, 10₹, 10 rupees, ₹10, etc.
-                match = re.search(r'(?:allocate|add)\s+(?:₹|rs\.?|rupees?)?\s*(\d+(?:,\d+)*(?:\.\d+)?)\s*(?:rs\.?|₹|rupees?)?\s+(?:to|for|in)\s+(.+)', message, re.IGNORECASE)
-                if match:
-                    amount = float(match.group(1).replace(',', ''))
-                    goal_name = match.group(2).strip()
-                    result = goal_tool._run(telegram_id, 'allocate', goal_name=goal_name, allocation_amount=amount)
+                # Handles 10, 10rs, ₹10, 10 rupees, 5k, 2.5 lakh, etc.
+                command = parse_goal_command(message)
+                if command and command.amount and command.currency != 'INR':
+                    result = foreign_currency_reply(command.currency)
+                elif command and command.action == 'allocate' and command.goal_name and command.amount:
+                    result = goal_tool._run(telegram_id, 'allocate', goal_name=command.goal_name, allocation_amount=command.amount)
                 else:
                     result = "Please specify amount and goal name.\n\nExample: 'Allocate 5000 to Emergency Fund'"
             
@@ -149,13 +217,19 @@ def call_agent(state: AgentState) -> AgentState:
         
         elif intent == 'stock_analysis':
             # Comprehensive stock analysis
-            tickers = re.findall(r'\b([A-Z]{2,10})\b', message.upper())
+            tickers = resolve_tickers(message, limit=1)
             if tickers:
                 result = investment_intelligence_tool._run(tickers[0], 'stock_analysis')
             else:
                 result = "Please specify a stock ticker.\n\nExample: 'Is RELIANCE a good stock?'"
             state['response'] = result
         
+        elif intent == 'stock_comparison':
+            # Side-by-side comparison of every stock mentioned
+            tickers = resolve_tickers(message, limit=MAX_COMPARE_TICKERS)
+            result = investment_intelligence_tool._run(" ".join(tickers), 'stock_comparison')
+            state['response'] = result
+        
         elif intent == 'mutual_fund_analysis':
             # Extract fund name
             match = re.search(r'is\s+(.+?)\s+(?:a\s+)?good', message, re.IGNORECASE)
@@ -200,7 +274,7 @@ Example: "Analyze gold sector stocks" or "Show me IT sector top performers" """
         
         elif intent == 'stock':
             # Quick stock check
-            tickers = re.findall(r'\b([A-Z]{2,10})\b', message.upper())
+            tickers = resolve_tickers(message, limit=1)
             if tickers:
                 result = stock_tool._run(tickers[0])
                 state['response'] = result
@@ -256,11 +330,15 @@ Choose your risk level:
 
 Reply with: "I want low/medium/high risk investments" """
             else:
+                # Optional amount to split, e.g. "suggest stocks for 50000"
+                money = first_money(message, minimum=500)
+                amount = money.value if money and money.currency == 'INR' else None
+                
                 # Determine investment type
                 if 'stock' in message.lower():
-                    result = risk_tool._run(risk_level, 'stock')
+                    result = risk_tool._run(risk_level, 'stock', amount)
                 elif 'mutual fund' in message.lower() or 'mf' in message.lower():
-                    result = risk_tool._run(risk_level, 'mutual_fund')
+                    result = risk_tool._run(risk_level, 'mutual_fund', amount)
                 else:
                     # Ask what they want
                     risk_upper = risk_level.upper()
@@ -272,6 +350,8 @@ What would you like recommendations for?
 💼 Mutual Funds - Professionally managed funds
 
 Reply: "Suggest stocks" or "Suggest mutual funds" """
+                if money and money.currency != 'INR':
+                    result += f"\n\n💱 Amounts are planned in rupees; send the {money.currency} amount in ₹ for a split."
                 
                 state['response'] = result
         
@@ -300,15 +380,20 @@ Try asking:
         
         elif intent == 'expense':
             # Extract amount from message
-            amounts = re.findall(r'₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)', message.replace(',', ''))
-            if amounts:
-                amount = float(amounts[0])
+            money = first_money(message)
+            if money is not None and money.currency != 'INR':
+                state['response'] = foreign_currency_reply(money.currency)
+            elif money is not None:
+                amount = money.value
                 # Log expense
                 c = db_conn.cursor()
                 from datetime import datetime
+                today = datetime.now().date().isoformat()
                 c.execute("""INSERT INTO transactions (telegram_id, amount, type, category, description, date)
                              VALUES (?, ?, 'expense', 'General', ?, ?)""",
-                          (telegram_id, amount, message, datetime.now().date().isoformat()))
+                          (telegram_id, amount, message, today))
+                budget_alert = budget_tracker.record_expense(db_conn, telegram_id, amount, 'General', message,
+                                                             today, c.lastrowid)
                 db_conn.commit()
                 
                 state['response'] = f"""✅ Logged ₹{amount:,.0f} as expense!
@@ -316,6 +401,8 @@ Try asking:
 💡 Tip: Track your expenses regularly to understand your spending patterns.
 
 Use /dashboard to see your financial overview."""
+                if budget_alert:
+                    state['response'] += f"\n\n{budget_alert}"
             else:
                 state['response'] = "Please specify the amount. Example: 'Spent 2500 on groceries'"
         
@@ -357,19 +444,16 @@ Use /dashboard to see your financial overview."""
         elif intent == 'dfg_analysis':
             from datetime import datetime
             # 1. Fetch transactions
-            raw_transactions = db_manager.get_transactions(telegram_id, days=90) # Use 90 days for better prediction
-            if len(raw_transactions) < 10:
+            ledger = get_ledger(telegram_id, days=90) # Use 90 days for better prediction
+            if len(ledger) < 10:
                 state['response'] = "I need more transaction data (at least 10 transactions over 90 days) to provide a reliable cash flow prediction. Keep logging your income and expenses!"
                 return state
 
-            transactions = [{'date': t[5], 'amount': t[1], 'currency': 'INR'} for t in raw_transactions]
-
             # 2. Call cash flow prediction tool
-            cash_flow_prediction = predict_cash_flow(transactions)
+            cash_flow_prediction = predict_cash_flow(ledger, user_id=telegram_id)
 
-            # 3. Call dynamic budget tool
-            # For now, we pass no specific goals. This can be enhanced later.
-            dynamic_budget = generate_dynamic_budget(cash_flow_prediction)
+            # 3. Call dynamic budget tool, sharing savings across the user's active goals
+            dynamic_budget = generate_dynamic_budget(cash_flow_prediction, load_active_goals(telegram_id, db_conn))
 
             # 4. Save results to DB
             c = db_conn.cursor()
@@ -378,7 +462,7 @@ Use /dashboard to see your financial overview."""
                          VALUES (?, ?, ?, ?)""",
                       (telegram_id, 
                        cash_flow_prediction['volatility_score'],
-                       str(cash_flow_prediction),
+                       json.dumps(cash_flow_prediction),
                        datetime.now().isoformat()))
             
             c.execute("""INSERT INTO dynamic_budgets 
@@ -386,18 +470,38 @@ Use /dashboard to see your financial overview."""
                          VALUES (?, ?, ?, ?)""",
                       (telegram_id,
                        datetime.now().strftime('%Y-%m'),
-                       str(dynamic_budget),
+                       json.dumps(dynamic_budget),
                        datetime.now().isoformat()))
+            if 'error' not in dynamic_budget:
+                budget_tracker.set_allocations(db_conn, telegram_id, dynamic_budget)
             db_conn.commit()
 
             # 5. Format response
+            simulation = cash_flow_prediction.get('simulation')
+            range_line = ""
+            if simulation:
+                range_line = (f"\n🎲 **Likely Range (P10–P90):** ₹{simulation['net_p10']:,.0f} to ₹{simulation['net_p90']:,.0f}"
+                              f"\n⚠️ **Chance of a Negative Balance:** {simulation['prob_negative_balance']:.0%}")
+            next_inflow = next((f for f in cash_flow_prediction.get('expected_flows', []) if f['kind'] == 'income'), None)
+            if next_inflow:
+                range_line += (f"\n📅 **Next Expected {next_inflow['period'].title()} Income:** "
+                               f"₹{next_inflow['amount']:,.0f} around {datetime.fromisoformat(next_inflow['date']):%d %b}")
+            goal_lines = ""
+            if dynamic_budget.get('goal_allocations'):
+                goal_lines = "\n\n**🎯 Monthly Goal Savings (earliest deadline first)**\n"
+                for goal in dynamic_budget['goal_allocations']:
+                    status = "✅" if goal['on_track'] else "⚠️"
+                    due = f" by {goal['deadline']}" if goal['deadline'] else ""
+                    goal_lines += (f"\n{status} **{goal['goal_name']}:** ₹{goal['allocation']:,.0f}"
+                                   f" of ₹{goal['required_monthly']:,.0f} needed{due}")
+            income = cash_flow_prediction['predicted_income'] or 1
             response = f"""🔮 **Your Dynamic Financial Genome (Next 30 Days)**
 
 Here's your AI-powered financial forecast:
 
 📈 **Predicted Income:** ₹{cash_flow_prediction['predicted_income']:,.0f}
 📉 **Predicted Expenses:** ₹{cash_flow_prediction['predicted_expenses']:,.0f}
-💸 **Predicted Net Flow:** ₹{cash_flow_prediction['net_cash_flow']:,.0f}
+💸 **Predicted Net Flow:** ₹{cash_flow_prediction['net_cash_flow']:,.0f}{range_line}
 
 🌪️ **Income Volatility:** {cash_flow_prediction['volatility_score']:.2f}
 *(A higher score means your income is less stable. <1 is low, >2 is high)*
@@ -408,9 +512,9 @@ Here's your AI-powered financial forecast:
 
 Based on your forecast, here’s a suggested budget:
 
-- **Needs (50%):** ₹{dynamic_budget.get('needs_allocation', 0):,.0f}
-- **Wants (30%):** ₹{dynamic_budget.get('wants_allocation', 0):,.0f}
-- **Savings (20%):** ₹{dynamic_budget.get('savings_allocation', 0):,.0f}
+- **Needs ({dynamic_budget.get('needs_allocation', 0) / income:.0%}):** ₹{dynamic_budget.get('needs_allocation', 0):,.0f}
+- **Wants ({dynamic_budget.get('wants_allocation', 0) / income:.0%}):** ₹{dynamic_budget.get('wants_allocation', 0):,.0f}
+- **Savings ({dynamic_budget.get('savings_allocation', 0) / income:.0%}):** ₹{dynamic_budget.get('savings_allocation', 0):,.0f}{goal_lines}
 
 *{dynamic_budget.get('notes')}*
 """
@@ -419,18 +523,15 @@ Based on your forecast, here’s a suggested budget:
         elif intent == 'behavioral_analysis':
             from datetime import datetime
             # 1. Fetch transactions
-            raw_transactions = db_manager.get_transactions(telegram_id, days=90)
-            if not raw_transactions:
+            ledger = get_ledger(telegram_id, days=90)
+            if not len(ledger):
                 state['response'] = "I need some transaction data to analyze your financial behavior."
                 return state
-            
-            transactions = [{'id': t[0], 'date': t[5], 'amount': t[1], 'description': t[4]} for t in raw_transactions]
-
 
             # 2. Call behavioral analysis tool (mock market data)
             # In a real scenario, this would come from a market data API
             mock_market_data = {"market_change_pct": -4.5} 
-            biases = analyze_user_activity(transactions, mock_market_data)
+            biases = analyze_user_activity(ledger, mock_market_data)
 
             # 3. Save biases to DB
             c = db_conn.cursor()
@@ -544,17 +645,32 @@ Based on your forecast, here’s a suggested budget:
 • "Run DFG Analysis" - Predict cash flow"""
         
         else:
-            # General conversation with Claude
-            formatted_prompt = prompt.format_messages(
-                telegram_id=telegram_id,
-                intent=intent,
-                message=message
-            )
-            response = llm.invoke(formatted_prompt)
-            state['response'] = response.content
+            # General conversation with Claude, reusing answers to repeat questions.
+            # Follow-ups that lean on earlier turns neither hit nor fill the cache.
+            language = detect_language(message, db_manager.get_user_language(telegram_id))
+            on_token = run_config.get("configurable", {}).get("on_token")
+            follow_up = conversation_memory.in_conversation(telegram_id) and is_context_dependent(message)
+            cached = None if follow_up else response_cache.lookup(message, language)
+            if cached:
+                state['response'] = cached
+                if on_token:
+                    on_token(cached)
+            else:
+                summary, history = conversation_memory.history(telegram_id)
+                formatted_prompt = prompt.format_messages(
+                    telegram_id=telegram_id,
+                    intent=intent,
+                    history_summary=f"\n\nEarlier in this conversation the user asked about:\n{summary}" if summary else "",
+                    history=history,
+                    message=message
+                )
+                reply = complete(formatted_prompt, message, on_token)
+                state['response'] = reply.text
+                if reply.complete and not follow_up:
+                    response_cache.store(message, language, reply.text, telegram_id)
         
-        # Save conversation to database
-        db_manager.save_conversation(telegram_id, message, state['response'], intent)
+        # Saved to the conversation history by merge_responses once every branch is done
+        state['conversation_log'] = [(intent, message, state['response'])]
     
     except Exception as e:
         state['response'] = f"⚠️ Oops! Something went wrong: {str(e)}\n\nPlease try again or contact support."
@@ -567,33 +683,59 @@ Based on your forecast, here’s a suggested budget:
 # Build graph
 workflow = StateGraph(AgentState)
 
-workflow.add_node("route_intent", route_intent)
-workflow.add_node("call_agent", call_agent)
+workflow.add_node("route_intent", tracing.traced("node.route_intent")(route_intent))
+workflow.add_node("call_agent", tracing.traced("node.call_agent")(call_agent))
+workflow.add_node("merge_responses", merge_responses)
 
 workflow.set_entry_point("route_intent")
-workflow.add_edge("route_intent", "call_agent")
-workflow.add_edge("call_agent", END)
+workflow.add_conditional_edges("route_intent", fan_out, ["call_agent"])
+workflow.add_edge("call_agent", "merge_responses")
+workflow.add_edge("merge_responses", END)
 
 # Compile graph
 graph = workflow.compile()
 
-# Runner function
-async def run_agent_graph(telegram_id: int, message: str, intent: str = None):
-    """Execute the agent graph. Returns (response, file_paths)."""
+# Runner functions
+def invoke_agent_graph(telegram_id: int, message: str, intent: str = None,
+                       on_token: Optional[Callable[[str], None]] = None):
+    """
+    Execute the agent graph synchronously. Returns (response, file_paths).
+
+    ``on_token`` receives LLM text chunks as they stream in (general answers only).
+    LangGraph runs nodes on its own worker threads, so it is called from one of those,
+    not from the caller's thread; hand chunks to the caller's thread through a queue.
+    """
     initial_state = {
         "telegram_id": telegram_id,
         "message": message,
         "intent": intent or "general",
+        "intent_rule": "",
         "response": "",
         "tool_calls": [],
-        "file_paths": []
+        "file_paths": [],
+        "branches": [],
+        "branch_run": [],
+        "partial_responses": [],
+        "conversation_log": []
     }
     
     try:
-        result = graph.invoke(initial_state)
+        with tracing.start_trace("agent_graph", telegram_id):
+            result = graph.invoke(initial_state, {"configurable": {"on_token": on_token}})
         return result['response'], result.get('file_paths', [])
     except Exception as e:
         print(f"Error in run_agent_graph: {e}")
         import traceback
         traceback.print_exc()
-        return f"⚠️ Sorry, I encountered an error: {str(e)}\n\nPlease try again!", []
\ No newline at end of file
+        return f"⚠️ Sorry, I encountered an error: {str(e)}\n\nPlease try again!", []
+
+async def run_agent_graph(telegram_id: int, message: str, intent: str = None,
+                          on_token: Optional[Callable[[str], None]] = None):
+    """
+    Execute the agent graph. Returns (response, file_paths).
+
+    The graph runs on a worker thread so the event loop stays free to forward
+    streamed chunks while this request runs or waits for admission; ``on_token`` is
+    called from a LangGraph worker thread, never the event loop.
+    """
+    return await asyncio.to_thread(invoke_agent_graph, telegram_id, message, intent, on_token)
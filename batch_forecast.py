@@ -0,0 +1,197 @@
+"""
+Nightly cash flow forecasts for every active user.
+
+Users with a transaction in the last HISTORY_DAYS are read from SQLite in
+chunks (keyset-paginated on telegram_id, so memory stays flat however many
+users there are), forecast across a process pool, and bulk-upserted into
+``dynamic_financial_genome``. The DFG page then only has to read the table.
+
+Each chunk's results are committed in the same transaction as a checkpoint
+row, so an interrupted run resumes after the last committed user instead of
+starting over.
+
+Usage:
+    python -m batch_forecast                   # resume an unfinished run, or start a new one
+    python -m batch_forecast --restart         # ignore the checkpoint
+    python -m batch_forecast --workers 8 --chunk-size 500
+
+Run it nightly from cron, e.g. ``15 2 * * * cd /srv/karobuddy && python -m batch_forecast``.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from tools.cash_flow_tool import predict_cash_flow
+from tools.ledger import Ledger
+import config
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "dfg_forecast"
+HISTORY_DAYS = 90
+MIN_TRANSACTIONS = 10  # Same threshold as the interactive DFG reply
+HORIZON_DAYS = 30
+
+UserLedger = Tuple[int, Ledger]
+GenomeRow = Tuple[int, float, str, str]  # Column order of the upsert
+
+def _ensure_schema(conn: sqlite3.Connection):
+    conn.execute('''CREATE TABLE IF NOT EXISTS batch_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_user_id INTEGER,
+        users_done INTEGER,
+        started_at TEXT,
+        updated_at TEXT,
+        finished_at TEXT
+    )''')
+    conn.commit()
+
+def _load_checkpoint(conn: sqlite3.Connection) -> Optional[Tuple[int, int, str]]:
+    """(last_user_id, users_done, started_at) of an unfinished run, if any."""
+    row = conn.execute("""SELECT last_user_id, users_done, started_at FROM batch_checkpoints
+                          WHERE job=? AND finished_at IS NULL""", (JOB_NAME,)).fetchone()
+    return tuple(row) if row else None
+
+def _save_checkpoint(c: sqlite3.Cursor, last_user_id: int, users_done: int, started_at: str,
+                     finished: bool = False):
+    now = datetime.now().isoformat()
+    c.execute("""INSERT OR REPLACE INTO batch_checkpoints
+                 (job, last_user_id, users_done, started_at, updated_at, finished_at)
+                 VALUES (?, ?, ?, ?, ?, ?)""",
+              (JOB_NAME, last_user_id, users_done, started_at, now, now if finished else None))
+
+def iter_user_chunks(conn: sqlite3.Connection, after_user_id: Optional[int],
+                     chunk_size: int) -> Iterator[List[UserLedger]]:
+    """
+    Active users' recent transactions as signed ledgers, ``chunk_size`` users at a time, in telegram_id order.
+
+    :param conn: SQLite connection.
+    :param after_user_id: Only users after this id (the checkpoint); None for all.
+    :param chunk_size: Users per chunk.
+    """
+    since = f"-{HISTORY_DAYS} days"
+    last_id = after_user_id
+    while True:
+        c = conn.cursor()
+        c.execute("""SELECT DISTINCT telegram_id FROM transactions
+                     WHERE (? IS NULL OR telegram_id > ?) AND date > date('now', ?)
+                     ORDER BY telegram_id LIMIT ?""", (last_id, last_id, since, chunk_size))
+        user_ids = [row[0] for row in c.fetchall()]
+        if not user_ids:
+            return
+        placeholders = ",".join("?" * len(user_ids))
+        c.execute(f"""SELECT telegram_id, id, amount, type, category, description, date FROM transactions
+                      WHERE telegram_id IN ({placeholders}) AND date > date('now', ?)
+                      ORDER BY telegram_id""", (*user_ids, since))
+        grouped = {user_id: Ledger.from_rows([row[1:] for row in rows])
+                   for user_id, rows in itertools.groupby(c.fetchall(), key=lambda row: row[0])}
+        yield [(user_id, grouped.get(user_id) or Ledger.from_rows([])) for user_id in user_ids]
+        last_id = user_ids[-1]
+
+def _init_worker():
+    # Workers would all append to the same rotating trace file; the batch reports its own throughput
+    config.TRACE_ENABLED = False
+
+def forecast_chunk(chunk: List[UserLedger]) -> List[GenomeRow]:
+    """Forecast one chunk in a worker process; users with too little history are left out."""
+    rows = []
+    for user_id, ledger in chunk:
+        if len(ledger) < MIN_TRANSACTIONS:
+            continue
+        try:
+            prediction = predict_cash_flow(ledger, HORIZON_DAYS)
+        except Exception as e:
+            logger.warning("Forecast failed for user %s: %s", user_id, e)
+            continue
+        rows.append((user_id, float(prediction['volatility_score']),
+                     json.dumps(prediction, default=float), datetime.now().isoformat()))
+    return rows
+
+def run(db_path: str = None, workers: int = None, chunk_size: int = None, restart: bool = False) -> Dict[str, Any]:
+    """
+    Forecast every active user and upsert the results.
+
+    :param db_path: SQLite database; defaults to DATABASE_PATH.
+    :param workers: Worker processes; defaults to BATCH_FORECAST_WORKERS (0 = one per CPU).
+    :param chunk_size: Users per chunk; defaults to BATCH_FORECAST_CHUNK_USERS.
+    :param restart: Start from the first user even if an unfinished run left a checkpoint.
+    :return: Users scanned and forecast in this invocation, elapsed seconds and users per second.
+    """
+    workers = workers or config.BATCH_FORECAST_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or config.BATCH_FORECAST_CHUNK_USERS
+    conn = sqlite3.connect(db_path or config.DATABASE_PATH)
+    _ensure_schema(conn)
+
+    checkpoint = None if restart else _load_checkpoint(conn)
+    if checkpoint:
+        last_user_id, users_done, started_at = checkpoint
+        logger.info("Resuming forecast run from %s after user %s (%d users done)", started_at, last_user_id, users_done)
+    else:
+        last_user_id, users_done, started_at = None, 0, datetime.now().isoformat()
+
+    scanned = forecasted = 0
+    start = time.perf_counter()
+    # Keep a bounded number of chunks in flight and commit them in order, so the checkpoint
+    # only ever moves past users whose results are already stored
+    in_flight = deque()
+    chunks = iter_user_chunks(conn, last_user_id, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            while len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                in_flight.append((chunk[-1][0], len(chunk), pool.submit(forecast_chunk, chunk)))
+            if not in_flight:
+                break
+            chunk_last_id, chunk_users, future = in_flight.popleft()
+            rows = future.result()
+
+            c = conn.cursor()
+            c.executemany("""INSERT OR REPLACE INTO dynamic_financial_genome
+                             (user_id, income_volatility_score, predicted_cash_flow_json, last_updated)
+                             VALUES (?, ?, ?, ?)""", rows)
+            last_user_id = chunk_last_id
+            users_done += chunk_users
+            _save_checkpoint(c, last_user_id, users_done, started_at)
+            conn.commit()
+
+            scanned += chunk_users
+            forecasted += len(rows)
+            logger.info("%d users scanned, %d forecast (%.0f users/s)",
+                        scanned, forecasted, scanned / (time.perf_counter() - start))
+
+    _save_checkpoint(conn.cursor(), last_user_id, users_done, started_at, finished=True)
+    conn.commit()
+    conn.close()
+    seconds = time.perf_counter() - start
+    return {
+        "users_scanned": scanned,
+        "users_forecast": forecasted,
+        "users_done_in_run": users_done,
+        "seconds": round(seconds, 2),
+        "users_per_second": round(scanned / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=None, help="SQLite path (default: DATABASE_PATH)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="Ignore an unfinished run's checkpoint")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    stats = run(args.db, args.workers, args.chunk_size, args.restart)
+    print(f"✅ Forecast {stats['users_forecast']} of {stats['users_scanned']} active users "
+          f"in {stats['seconds']:.1f}s ({stats['users_per_second']:,.1f} users/s)")
+
+if __name__ == "__main__":
+    main()
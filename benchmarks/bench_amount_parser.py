@@ -0,0 +1,48 @@
+"""
+Throughput of tools.amount_parser on statement-sized inputs, against the inline
+regex it replaced (which also misses "25k", "2.5 lakh" and Devanagari digits).
+
+Usage:
+    python -m benchmarks.bench_amount_parser --lines 100000
+"""
+import argparse
+import random
+import re
+import time
+from benchmarks.fuzz_amount_parser import make_case
+from tools.amount_parser import first_amount, parse_amounts
+
+def legacy_first_amount(message: str):
+    """The pattern previously inlined in call_agent and IncomeAnalyzerTool._run."""
+    amounts = re.findall(r'₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)', message.replace(',', ''))
+    return float(amounts[0]) if amounts else None
+
+def time_per_line(fn, lines) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return (time.perf_counter() - start) / len(lines) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    cases = [make_case(rng) for _ in range(args.lines)]
+    lines = [message for message, _ in cases]
+
+    print(f"{args.lines} statement lines, {sum(map(len, lines)) / len(lines):.0f} chars on average")
+    for label, fn in [("legacy inline regex", legacy_first_amount),
+                      ("first_amount", first_amount),
+                      ("parse_amounts", parse_amounts)]:
+        us = time_per_line(fn, lines)
+        print(f"  {label:<20} {us:6.2f} us/line  ({1e6 / us:,.0f} lines/s)")
+
+    for label, fn in [("legacy inline regex", legacy_first_amount), ("first_amount", first_amount)]:
+        correct = sum(fn(message) is not None and abs(fn(message) - expected) < 1e-6 * max(expected, 1)
+                      for message, expected in cases)
+        print(f"  {label:<20} reads {correct / len(cases):.1%} of amounts correctly")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Cost of the behavioral bias detectors on large synthetic ledgers.
+
+Each synthetic user holds ``--transactions`` transactions: everyday spending,
+salary credits, stock buys and sells (a few tickers, so a concentration
+pattern shows up) and some one-off descriptions. ``analyze_user_activity`` is
+timed against ``reference_analyze``, the earlier DataFrame implementation
+(``iterrows`` over matched rows, ``str.contains`` with the pattern compiled on
+every call), kept here as the baseline. Both must return the same records.
+
+Usage:
+    python -m benchmarks.bench_behavioral_bias --users 5 --transactions 20000
+    python -m benchmarks.bench_behavioral_bias --output data/bias_benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+import config
+from tools.behavioral_bias_tool import (CONCENTRATION_MIN_ASSETS, CONCENTRATION_RATIO_THRESHOLD,
+                                        FOMO_QUANTILE_THRESHOLD, MARKET_DOWNTURN_THRESHOLD, analyze_user_activity)
+from tools.ledger import Ledger
+
+DOWNTURN = {"market_change_pct": -5.0}
+
+SPENDING = ("Groceries", "Uber ride", "Electricity bill", "Dinner out", "Mobile recharge", "Rent", "Pharmacy")
+TICKERS = ("RELIANCE", "TCS", "INFY", "HDFCBANK")
+
+def make_activity_ledger(transactions: int, seed: int, end: date = None) -> Ledger:
+    """A year-ish of mixed activity with ``transactions`` rows, ids 1..n."""
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    kind = rng.choice(4, size=transactions, p=[0.80, 0.05, 0.10, 0.05])  # spend, income, buy, sell
+    ticker = rng.choice(len(TICKERS), size=transactions, p=[0.6, 0.2, 0.1, 0.1])
+    amount = rng.gamma(2.0, 800.0, transactions)
+    amount[kind == 1] = rng.uniform(30000, 60000, (kind == 1).sum())
+    amount[kind >= 2] = rng.lognormal(np.log(8000), 0.9, (kind >= 2).sum())
+    days = rng.integers(0, 365, transactions)
+    records = []
+    for i in range(transactions):
+        k, t = int(kind[i]), TICKERS[ticker[i]]
+        if k == 0:
+            # Every 20th purchase has a one-off description, like free-text chat expenses
+            description = f"Spent on order #{i}" if i % 20 == 0 else SPENDING[i % len(SPENDING)]
+            records.append({'id': i + 1, 'amount': -amount[i], 'type': 'expense', 'description': description,
+                            'date': (end - timedelta(days=int(days[i]))).isoformat()})
+        elif k == 1:
+            records.append({'id': i + 1, 'amount': amount[i], 'type': 'income', 'description': "Salary credit",
+                            'date': (end - timedelta(days=int(days[i]))).isoformat()})
+        else:
+            verb, sign = ("Buy stock", -1) if k == 2 else ("Sold stock", 1)
+            records.append({'id': i + 1, 'amount': sign * amount[i], 'type': 'expense' if sign < 0 else 'income',
+                            'description': f"{verb} {t}", 'date': (end - timedelta(days=int(days[i]))).isoformat()})
+    return Ledger.from_transactions(records)
+
+def reference_analyze(ledger: Ledger, market_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The detectors as they were before vectorizing, for timing and output comparison."""
+    df = pd.DataFrame({'id': ledger.ids, 'date': pd.to_datetime(ledger.day), 'amount': ledger.amount,
+                       'description': ledger.description})
+    biases = []
+    if market_data and market_data.get('market_change_pct', 0) < MARKET_DOWNTURN_THRESHOLD:
+        recent_sells = df[(df['amount'] > 0) & (df['description'].str.contains('sell|sold', case=False, na=False))]
+        for _, row in recent_sells.iterrows():
+            biases.append({
+                "bias_type": "PANIC_SELLING",
+                "event_timestamp": row['date'].isoformat(),
+                "description": f"Potential panic sell detected: Sold assets during a market downturn of {market_data['market_change_pct']}%.",
+                "related_transaction_id": row.get('id')
+            })
+    spending_df = df[df['amount'] < 0]
+    if not spending_df.empty:
+        investment_buys = spending_df[
+            (spending_df['description'].str.contains('buy|invest|purchase', case=False, na=False)) &
+            (spending_df['amount'].abs() > spending_df['amount'].abs().quantile(FOMO_QUANTILE_THRESHOLD))
+        ]
+        for _, row in investment_buys.iterrows():
+            biases.append({
+                "bias_type": "FOMO_BUYING",
+                "event_timestamp": row['date'].isoformat(),
+                "description": f"Potential FOMO buy detected: Unusually large investment of {row['amount']}. Monitor if this was chasing high returns.",
+                "related_transaction_id": row.get('id')
+            })
+    asset_counts = df[df['description'].str.contains('stock|asset', case=False, na=False)]['description'].value_counts()
+    total_assets = asset_counts.sum()
+    if total_assets > 0 and (asset_counts.iloc[0] / total_assets) > CONCENTRATION_RATIO_THRESHOLD \
+            and total_assets > CONCENTRATION_MIN_ASSETS:
+        biases.append({"bias_type": "CONCENTRATION_RISK", "event_timestamp": pd.Timestamp.now().isoformat(),
+                       "description": "", "related_transaction_id": None})
+    return biases
+
+def _comparable(biases: List[Dict[str, Any]]) -> List[tuple]:
+    # The concentration record is stamped with the current time, so compare its type only
+    return [(b["bias_type"], b["event_timestamp"], b["description"], int(b["related_transaction_id"]))
+            if b["related_transaction_id"] is not None else (b["bias_type"],) for b in biases]
+
+def _time(fn, ledgers: List[Ledger], repeats: int) -> Dict[str, float]:
+    times = []
+    for ledger in ledgers:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(ledger, DOWNTURN)
+            times.append(time.perf_counter() - start)
+    times_ms = np.array(times) * 1000
+    return {"ms_mean": round(float(times_ms.mean()), 2), "ms_p95": round(float(np.percentile(times_ms, 95)), 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--transactions", type=int, default=20000, help="Transactions per user")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(config.BASE_DIR, "data", "bias_benchmark.json"))
+    args = parser.parse_args()
+    config.TRACE_ENABLED = False
+
+    ledgers = [make_activity_ledger(args.transactions, args.seed + u) for u in range(args.users)]
+    records = 0
+    for ledger in ledgers:
+        vectorized, reference = analyze_user_activity(ledger, DOWNTURN), reference_analyze(ledger, DOWNTURN)
+        if _comparable(vectorized) != _comparable(reference):
+            raise SystemExit("❌ Vectorized detectors disagree with the reference implementation")
+        records += len(vectorized)
+
+    results = {"vectorized": _time(analyze_user_activity, ledgers, args.repeats),
+               "reference": _time(reference_analyze, ledgers, args.repeats)}
+    speedup = results["reference"]["ms_mean"] / max(results["vectorized"]["ms_mean"], 1e-9)
+    print(f"  {args.users} users x {args.transactions:,} transactions, {records / args.users:,.0f} biases per user "
+          f"(identical to the reference)")
+    for name, r in results.items():
+        print(f"  {name:<10} {r['ms_mean']:8.2f} ms/user  (p95 {r['ms_p95']:.2f} ms)")
+    print(f"  speedup    {speedup:8.1f}x")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+        "speedup": round(speedup, 1),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Accuracy and cost of the cash flow forecasters on synthetic ledgers.
+
+For every archetype in benchmarks.synthetic_ledgers, the daily income and
+expense series of ``--users`` users are backtested at ``--origins`` rolling
+origins: each forecaster sees the days before the origin and predicts the next
+``--horizon``. Reported per archetype, series and forecaster:
+
+- MAPE of the horizon total (the number the DFG shows), over origins with a non-zero actual
+- MASE of the daily values, scaled by the in-sample error of a 7-day seasonal naive
+- fit time per call (mean and p95) and peak memory of one call (tracemalloc)
+
+Before the backtests, a slow extra candidate is checked to be skipped by
+``select_model`` rather than overrunning its time budget.
+
+"selected" is the backtest-driven choice predict_cash_flow makes, and
+"predict_cash_flow" times the whole call end to end and scores its totals,
+which also place detected paydays and other recurring streams on their dates. Results go to a JSON file;
+pass a previous file as ``--baseline`` to print the changes.
+
+Usage:
+    python -m benchmarks.bench_forecasting --users 25 --output data/forecast_benchmark.json
+    python -m benchmarks.bench_forecasting --arima --baseline data/forecast_benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+import numpy as np
+import config
+from benchmarks.synthetic_ledgers import ARCHETYPES, daily_series, make_ledger
+from tools.cash_flow_tool import predict_cash_flow, _arima_daily_forecast
+from tools.fast_forecast import FORECASTERS, MIN_TRAIN_DAYS, SEASON_DAYS, select_model
+
+def selected_forecast(y: np.ndarray, steps: int) -> np.ndarray:
+    """The model predict_cash_flow would pick for this history."""
+    model, _ = select_model(y, steps, config.FORECAST_TIME_BUDGET_MS / 1000)
+    return FORECASTERS[model](y, steps)
+
+def check_time_budget(budget_seconds: float = 0.02):
+    """A candidate slower than the budget must be skipped, whether its cost is hinted or was measured."""
+    y = daily_series("gig", 90, seed=0)[0]
+
+    def slow_forecast(train: np.ndarray, steps: int) -> np.ndarray:
+        time.sleep(budget_seconds)
+        return FORECASTERS["mean"](train, steps)
+
+    calls = (
+        ("hinted", {"slow_hinted": slow_forecast}, {"slow_hinted": budget_seconds}),
+        ("first run", {"slow_measured": slow_forecast}, None),  # Not skipped yet: times the candidate
+        ("measured", {"slow_measured": slow_forecast}, None),
+    )
+    for label, extra, expected in calls:
+        start = time.perf_counter()
+        model, _ = select_model(y, 30, budget_seconds, extra, expected)
+        elapsed = time.perf_counter() - start
+        if label != "first run" and (model.startswith("slow") or elapsed > budget_seconds):
+            raise SystemExit(f"❌ select_model ran a slow candidate ({label}): {elapsed * 1000:.0f} ms "
+                             f"against a {budget_seconds * 1000:.0f} ms budget")
+    print(f"  select_model skips candidates that don't fit its {budget_seconds * 1000:.0f} ms budget")
+
+def backtest(forecaster: Callable, series: List[np.ndarray], horizon: int, origins: int) -> Dict[str, Any]:
+    """Rolling-origin errors and call timings for one forecaster over many series."""
+    ape, ase, times = [], [], []
+    for y in series:
+        steps_back = [len(y) - horizon - k * max(1, horizon // 2) for k in range(origins)]
+        for origin in [o for o in steps_back if o >= MIN_TRAIN_DAYS]:
+            train, actual = y[:origin], y[origin:origin + horizon]
+            start = time.perf_counter()
+            forecast = np.asarray(forecaster(train, horizon), dtype=float)
+            times.append(time.perf_counter() - start)
+
+            if actual.sum() > 0:
+                ape.append(abs(forecast.sum() - actual.sum()) / actual.sum())
+            scale = np.abs(train[SEASON_DAYS:] - train[:-SEASON_DAYS]).mean()
+            if scale > 0:
+                ase.append(np.abs(forecast - actual).mean() / scale)
+
+    # Peak allocation of a single call, measured apart from the timings
+    tracemalloc.start()
+    forecaster(series[0][:len(series[0]) - horizon], horizon)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times_us = np.array(times) * 1e6
+    return {
+        "mape": round(float(np.mean(ape)), 4) if ape else None,
+        "mase": round(float(np.mean(ase)), 4) if ase else None,
+        "fit_us_mean": round(float(times_us.mean()), 1),
+        "fit_us_p95": round(float(np.percentile(times_us, 95)), 1),
+        "peak_kib": round(peak / 1024, 1),
+        "forecasts": len(times),
+    }
+
+def time_predict_cash_flow(ledgers: List[list], simulations: int) -> Dict[str, Any]:
+    times = []
+    for ledger in ledgers:
+        start = time.perf_counter()
+        predict_cash_flow(ledger, simulations=simulations)
+        times.append(time.perf_counter() - start)
+    times_ms = np.array(times) * 1000
+    return {"ms_mean": round(float(times_ms.mean()), 2), "ms_p95": round(float(np.percentile(times_ms, 95)), 2),
+            "calls": len(times)}
+
+def predict_cash_flow_accuracy(archetype: str, seeds: List[int], history_days: int, horizon: int) -> Dict[str, Any]:
+    """MAPE of predict_cash_flow's income and expense totals (recurring streams included) on held-out days."""
+    cutoff = (datetime.now().date() - timedelta(days=horizon)).isoformat()
+    errors = {"income": [], "expenses": []}
+    for seed in seeds:
+        ledger = make_ledger(archetype, history_days + horizon, seed)
+        prediction = predict_cash_flow([t for t in ledger if t['date'] <= cutoff], horizon, simulations=0)
+        future = [t['amount'] for t in ledger if t['date'] > cutoff]
+        actual = {"income": sum(a for a in future if a > 0), "expenses": -sum(a for a in future if a < 0)}
+        for side, key in (("income", "predicted_income"), ("expenses", "predicted_expenses")):
+            if actual[side] > 0:
+                errors[side].append(abs(prediction[key] - actual[side]) / actual[side])
+    return {f"{side}_mape": round(float(np.mean(e)), 4) if e else None for side, e in errors.items()}
+
+def print_changes(results: List[Dict[str, Any]], baseline: Dict[str, Any], baseline_path: str):
+    baseline = {(r["archetype"], r["series"], r["model"]): r for r in baseline["results"]}
+    print(f"\nChanges against {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["archetype"], r["series"], r["model"]))
+        if old is None:
+            continue
+        deltas = []
+        for key in ("mape", "mase", "fit_us_mean"):
+            if r[key] is not None and old.get(key):
+                deltas.append(f"{key} {(r[key] - old[key]) / old[key]:+.1%}")
+        print(f"  {r['archetype']:<10} {r['series']:<8} {r['model']:<15} " + ", ".join(deltas))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=25, help="Synthetic users per archetype")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--origins", type=int, default=4)
+    parser.add_argument("--arima", action="store_true", help="Also backtest ARIMA (slow)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(config.BASE_DIR, "data", "forecast_benchmark.json"))
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+    config.TRACE_ENABLED = False
+    # Read the baseline first: it is often the file this run overwrites
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    check_time_budget(config.FORECAST_TIME_BUDGET_MS / 1000)
+
+    forecasters = dict(FORECASTERS, selected=selected_forecast)
+    if args.arima:
+        forecasters["arima"] = _arima_daily_forecast
+
+    results, end_to_end = [], {}
+    for a, archetype in enumerate(ARCHETYPES):
+        seeds = [args.seed * 1000 + a * 100 + u for u in range(args.users)]
+        pairs = [daily_series(archetype, args.days, seed) for seed in seeds]
+        for series_name, series in (("income", [p[0] for p in pairs]), ("expenses", [p[1] for p in pairs])):
+            for name, forecaster in forecasters.items():
+                row = {"archetype": archetype, "series": series_name, "model": name,
+                       **backtest(forecaster, series, args.horizon, args.origins)}
+                results.append(row)
+                mape = f"{row['mape']:.1%}" if row["mape"] is not None else "n/a"
+                mase = f"{row['mase']:.2f}" if row["mase"] is not None else "n/a"
+                print(f"  {archetype:<10} {series_name:<8} {name:<15} MAPE {mape:>7}  MASE {mase:>5}  "
+                      f"{row['fit_us_mean']:9.1f} us/fit  {row['peak_kib']:7.1f} KiB")
+
+        ledgers = [make_ledger(archetype, 90, seed) for seed in seeds]
+        end_to_end[archetype] = {"point": time_predict_cash_flow(ledgers, 0),
+                                 "simulated": time_predict_cash_flow(ledgers, config.FORECAST_SIMULATIONS),
+                                 **predict_cash_flow_accuracy(archetype, seeds, 90, args.horizon)}
+        e2e = end_to_end[archetype]
+        print(f"  {archetype:<10} predict_cash_flow {e2e['point']['ms_mean']:.1f} ms, "
+              f"with {config.FORECAST_SIMULATIONS} simulations {e2e['simulated']['ms_mean']:.1f} ms; "
+              f"MAPE income {e2e['income_mape']:.1%}, expenses {e2e['expenses_mape']:.1%}")
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": results,
+        "predict_cash_flow": end_to_end,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if baseline is not None:
+        print_changes(results, baseline, args.baseline)
+
+if __name__ == "__main__":
+    main()
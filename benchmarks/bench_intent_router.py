@@ -0,0 +1,128 @@
+"""
+Timing check for intent_router against the sequential any() scans it replaced.
+
+Usage:
+    python -m benchmarks.bench_intent_router --repeat 2000
+"""
+import argparse
+import time
+from intent_router import route
+from tools.ticker_resolver import resolve_tickers
+
+CORPUS = [
+    "I earned 15000 from freelancing this week",
+    "Got paid 8,500 for the delivery shifts",
+    "received money from client 12000",
+    "Is this investment scheme a scam? They guarantee 30% monthly",
+    "someone says they will double my money in 2 months",
+    "Create goal Emergency Fund with target 100000",
+    "Allocate 5000 to Emergency Fund",
+    "I am saving for a bike",
+    "Is RELIANCE a good stock to buy?",
+    "is tata motors share good for long term",
+    "Is HDFC Top 100 a good mutual fund?",
+    "Show me top performers in the IT sector",
+    "Which is the best stock in banking sector",
+    "Check TCS stock price",
+    "check INFY share",
+    "Suggest some low risk investments",
+    "Where to invest 50000 for 3 years?",
+    "recommend mutual funds for medium risk",
+    "Generate report for this month",
+    "download report as pdf",
+    "Show my dashboard",
+    "Give me a summary of my finances",
+    "I spent 2500 on groceries",
+    "Paid for electricity bill 1800",
+    "bought a phone for 12000",
+    "What is my risk profile?",
+    "Set my risk level to high",
+    "Show my cash flow prediction",
+    "dynamic budget for next month",
+    "Analyze my spending habits",
+    "Do I have any behavior bias?",
+    "TCS vs INFY vs WIPRO",
+    "Compare HDFC Bank and ICICI Bank",
+    "What is an SIP and how does it work?",
+    "How can I reduce my monthly spending on food delivery and online shopping?",
+    "Hello, who are you?",
+    "Explain the difference between old and new tax regime for a gig worker with irregular income",
+    "maine aaj 3000 kamaye",
+    # Forwarded messages pasted in for a scam check are much longer than chat turns
+    "Dear investor, join our exclusive WhatsApp trading group run by SEBI certified experts. "
+    "Our members earn 5% daily returns with zero loss, your capital is fully protected. "
+    "Limited seats available, pay the joining fee of Rs 4999 today via UPI and start earning. "
+    "Thousands of happy members across India, click the link below to register now!",
+    "Hi, I am from the customer care team of your bank. Your KYC has expired and your account "
+    "will be blocked within 24 hours. Please share the OTP you receive to update the details "
+    "immediately, otherwise all transactions will be stopped and a penalty will be charged.",
+    "आज 500 रुपये खर्च किए",
+    "मेरा लक्ष्य 1 लाख बचाना है",
+]
+
+LONG_MESSAGE_CHARS = 150
+
+def legacy_route(message: str) -> str:
+    """The route_intent body from before the compiled router (stock_comparison rule included), kept as the baseline."""
+    original, message = message, message.lower()
+    if any(word in message for word in ['earned', 'got paid', 'income', 'salary', 'received money']):
+        return 'income'
+    elif any(word in message for word in ['scam', 'fraud', 'guarantee', 'double', 'risk-free', 'suspicious', 'ponzi']):
+        return 'fraud'
+    elif any(word in message for word in ['goal', 'target', 'save for', 'saving for', 'allocate']):
+        return 'goal'
+    elif any(word in message for word in [' vs ', ' vs.', 'versus', 'compare']) and len(resolve_tickers(original, limit=2)) >= 2:
+        return 'stock_comparison'
+    elif 'is' in message and 'good' in message and any(word in message for word in ['stock', 'share', 'company']):
+        return 'stock_analysis'
+    elif 'is' in message and 'good' in message and any(word in message for word in ['mutual fund', 'mf', 'fund']):
+        return 'mutual_fund_analysis'
+    elif any(word in message for word in ['sector', 'top performer', 'best stock', 'most profit', 'highest return']) and any(word in message for word in ['analyze', 'show', 'tell', 'which', 'find']):
+        return 'sector_analysis'
+    elif any(word in message for word in ['stock', 'share', 'equity', 'nse', 'bse']) and 'check' in message:
+        return 'stock'
+    elif any(word in message for word in ['suggest', 'recommend', 'investment', 'where to invest', 'should i invest']):
+        return 'investment_recommendation'
+    elif any(word in message for word in ['generate report', 'create report', 'download report', 'export report', 'pdf report', 'excel report', 'spreadsheet', 'spending report', 'investment report', 'comprehensive report']):
+        return 'report_generation'
+    elif any(word in message for word in ['dashboard', 'summary', 'overview']):
+        return 'dashboard'
+    elif any(word in message for word in ['expense', 'spent', 'paid for', 'bought']):
+        return 'expense'
+    elif any(word in message for word in ['risk', 'risk profile', 'risk level']):
+        return 'risk_profile'
+    elif any(word in message for word in ['dfg', 'cash flow', 'prediction', 'dynamic budget']):
+        return 'dfg_analysis'
+    elif any(word in message for word in ['bias', 'behavior', 'habits']):
+        return 'behavioral_analysis'
+    return 'general'
+
+def time_router(fn, corpus, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in corpus:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{len(CORPUS)} messages x {args.repeat} repeats, {sum(map(len, CORPUS)) / len(CORPUS):.0f} chars on average")
+    long_messages = [m for m in CORPUS if len(m) > LONG_MESSAGE_CHARS]
+    for label, corpus in [("all messages", CORPUS), (f"over {LONG_MESSAGE_CHARS} chars", long_messages)]:
+        legacy_us = time_router(legacy_route, corpus, args.repeat)
+        compiled_us = time_router(route, corpus, args.repeat)
+        print(f"{label}:")
+        print(f"  legacy any() scans: {legacy_us:7.2f} us/message")
+        print(f"  compiled router:    {compiled_us:7.2f} us/message ({legacy_us / compiled_us:.1f}x)")
+
+    changed = [(m, legacy_route(m), route(m)) for m in CORPUS if legacy_route(m) != route(m).intent]
+    if changed:
+        print(f"\n{len(changed)} messages route differently:")
+        for message, old, new in changed:
+            print(f"  {message!r}: {old} -> {new.intent} (rule {new.rule}, {', '.join(new.keywords)})")
+
+if __name__ == "__main__":
+    main()
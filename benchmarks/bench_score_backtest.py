@@ -0,0 +1,52 @@
+"""
+Timing check for tools.score_backtest on a synthetic universe.
+
+Usage:
+    python -m benchmarks.bench_score_backtest --tickers 500 --years 10
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from tools.score_backtest import run_backtest, format_report
+
+def synthetic_universe(n_tickers: int, years: int, seed: int = 7):
+    """Random-walk prices and quarterly fundamentals with a weak link to future returns."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=years * 252)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+
+    quality = rng.normal(size=n_tickers)
+    drift = 0.0002 + 0.0002 * quality
+    returns = drift + rng.normal(scale=0.018, size=(len(dates), n_tickers))
+    closes = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=tickers)
+
+    report_dates = dates[::63]
+    n = len(report_dates)
+    noise = lambda scale: rng.normal(scale=scale, size=(n, n_tickers))
+    fundamentals = pd.DataFrame({
+        'date': np.repeat(report_dates, n_tickers),
+        'ticker': np.tile(tickers, n),
+        'pe': (25 - 6 * quality + noise(8)).ravel(),
+        'roe': (15 + 5 * quality + noise(5)).ravel(),
+        'debt_equity': np.abs(1 - 0.4 * quality + noise(0.5)).ravel(),
+        'revenue_growth': (10 + 6 * quality + noise(8)).ravel(),
+        'earnings_growth': (10 + 8 * quality + noise(12)).ravel(),
+    })
+    return closes, fundamentals
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    closes, fundamentals = synthetic_universe(args.tickers, args.years)
+    start = time.perf_counter()
+    result = run_backtest(closes, fundamentals)
+    elapsed = time.perf_counter() - start
+    print(format_report(result))
+    print(f"\n{args.tickers} tickers x {args.years} years backtested in {elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
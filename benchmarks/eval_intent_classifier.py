@@ -0,0 +1,58 @@
+"""
+Accuracy and latency of the local intent classifier.
+
+Cross-validates on the seed examples plus labelled conversations, reports how many
+predictions clear the confidence threshold and how accurate those are, then times
+batched and one-at-a-time prediction.
+
+Usage:
+    python -m benchmarks.eval_intent_classifier --folds 3
+    python -m benchmarks.eval_intent_classifier --no-history   # seeds only, no database
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+from intent_classifier import build_model, load_training_data
+import config
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=config.INTENT_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--no-history", action="store_true", help="Use only the seed examples")
+    args = parser.parse_args()
+
+    conn = None
+    if not args.no_history:
+        from database import db_conn
+        conn = db_conn
+    messages, intents = load_training_data(conn)
+    labels = np.array(intents)
+    folds = min(args.folds, np.unique(labels, return_counts=True)[1].min())
+    print(f"{len(messages)} examples, {len(set(intents))} intents, {folds}-fold cross-validation\n")
+
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=0)
+    probabilities = cross_val_predict(build_model(), messages, labels, cv=cv, method="predict_proba")
+    classes = np.unique(labels)
+    predicted = classes[probabilities.argmax(axis=1)]
+    confident = probabilities.max(axis=1) >= args.threshold
+
+    print(classification_report(labels, predicted, zero_division=0))
+    print(f"Accuracy: {accuracy_score(labels, predicted):.3f}")
+    print(f"Confident at {args.threshold:.2f}: {confident.mean():.1%} of messages, "
+          f"accuracy {accuracy_score(labels[confident], predicted[confident]) if confident.any() else float('nan'):.3f}")
+
+    model = build_model().fit(messages, labels)
+    start = time.perf_counter()
+    model.predict_proba(messages)
+    batched_us = (time.perf_counter() - start) / len(messages) * 1e6
+    start = time.perf_counter()
+    for message in messages:
+        model.predict_proba([message])
+    single_us = (time.perf_counter() - start) / len(messages) * 1e6
+    print(f"\nLatency: {batched_us:.0f} us/message batched, {single_us:.0f} us/message one at a time")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Randomized checks for tools.amount_parser.
+
+Generates messages with a known amount written in a random Indian format (commas,
+k/lakh/cr units, ₹/Rs/rupees markers, Devanagari digits) inside random filler text,
+and checks the parser reads back exactly that amount. Random junk strings are also
+fed in to make sure nothing raises. Exits non-zero on any mismatch.
+
+Usage:
+    python -m benchmarks.fuzz_amount_parser --cases 20000 --seed 7
+"""
+import argparse
+import random
+import sys
+from tools.amount_parser import parse_amounts, parse_goal_command
+
+FILLER = ["I", "spent", "on", "groceries", "today", "paid", "for", "rent", "got", "bonus", "from",
+          "client", "maine", "kharch", "kiye", "aaj", "ka", "bill", "आज", "खर्च", "किए", "salary",
+          "via", "UPI", "to", "Ramesh", "week", "the", "cab", "fare"]
+UNITS = [("", 1), ("k", 1e3), (" k", 1e3), ("K", 1e3), (" thousand", 1e3), (" hazaar", 1e3),
+         (" lakh", 1e5), (" lakhs", 1e5), ("L", 1e5), (" lac", 1e5), (" लाख", 1e5),
+         (" cr", 1e7), (" crore", 1e7), ("Cr", 1e7), (" करोड़", 1e7)]
+PREFIXES = ["", "₹", "₹ ", "Rs ", "Rs.", "rs", "INR "]
+SUFFIXES = ["", " rupees", " rs", "/-", " रुपये"]
+DEVANAGARI = str.maketrans("0123456789", "०१२३४५६७८९")
+JUNK_ALPHABET = "0123456789.,₹%/:-kKlLcr abc लाख०१२\n\t$"
+
+def indian_grouping(n: int) -> str:
+    """1,00,000-style grouping (last three digits, then pairs)."""
+    s = str(n)
+    if len(s) <= 3:
+        return s
+    head, tail = s[:-3], s[-3:]
+    pairs = []
+    while len(head) > 2:
+        pairs.insert(0, head[-2:])
+        head = head[:-2]
+    return ",".join([head] + pairs + [tail])
+
+def random_amount(rng: random.Random):
+    """(text, expected value) for one randomly formatted amount."""
+    unit, multiplier = rng.choice(UNITS)
+    if multiplier == 1:
+        value = rng.randint(1, 9_999_999)
+        number = rng.choice([str(value), f"{value:,}", indian_grouping(value)])
+    else:
+        value = rng.choice([rng.randint(1, 999), rng.randint(1, 99) + rng.choice([0.5, 0.25, 0.75])])
+        number = f"{value:g}"
+    text = rng.choice(PREFIXES) + number + unit + rng.choice(SUFFIXES if multiplier == 1 else ["", " rupees"])
+    if rng.random() < 0.2:
+        text = text.translate(DEVANAGARI)
+    return text, value * multiplier
+
+def make_case(rng: random.Random):
+    amount_text, expected = random_amount(rng)
+    words = rng.sample(FILLER, rng.randint(0, 6))
+    words.insert(rng.randint(0, len(words)), amount_text)
+    return " ".join(words), expected
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    failures = []
+    for _ in range(args.cases):
+        message, expected = make_case(rng)
+        parsed = parse_amounts(message)
+        if len(parsed) != 1 or abs(parsed[0].value - expected) > 1e-6 * max(expected, 1):
+            failures.append((message, expected, [a.value for a in parsed]))
+
+    for _ in range(args.cases):
+        junk = "".join(rng.choice(JUNK_ALPHABET) for _ in range(rng.randint(0, 60)))
+        parse_amounts(junk)
+        parse_goal_command("add " + junk)
+        parse_goal_command("create goal " + junk)
+
+    print(f"{args.cases} formatted amounts, {len(failures)} mismatches; {args.cases} junk strings parsed without errors")
+    for message, expected, got in failures[:20]:
+        print(f"  {message!r}: expected {expected:g}, got {got}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Synthetic user ledgers for the forecasting benchmarks.
+
+Four earner archetypes, each a list of transactions in the shape
+``predict_cash_flow`` takes (income positive, expenses negative):
+
+- salaried: one salary credit around the 1st, rent on the 5th, steady daily spending
+- gig: small payouts on most working days, heavier on weekends
+- seasonal: income that swells and shrinks over the year (harvest, wedding season, tourism)
+- freelance: one to three large, irregularly timed invoices a month
+
+Usage:
+    python -m benchmarks.synthetic_ledgers --archetype gig --days 120
+"""
+import argparse
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+
+ARCHETYPES = ("salaried", "gig", "seasonal", "freelance")
+
+Ledger = List[Dict[str, Any]]
+
+def _spending(rng: np.random.Generator, start: date, days: int, daily: float) -> np.ndarray:
+    """Everyday expenses: most days something, weekends a bit more, occasional big bills."""
+    spend = rng.gamma(2.0, daily / 2.0, days) * (rng.random(days) < 0.8)
+    spend[(np.arange(days) + start.weekday()) % 7 >= 5] *= 1.4
+    spikes = rng.random(days) < 0.03
+    spend[spikes] += rng.gamma(2.0, daily * 5, spikes.sum())
+    return spend
+
+def _salaried(rng: np.random.Generator, start: date, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    salary = rng.uniform(25000, 90000)
+    income, expenses = np.zeros(days), _spending(rng, start, days, salary / 60)
+    for i in range(days):
+        day = start + timedelta(days=i)
+        # Paid on the 1st, or the 2nd when the 1st is a Sunday
+        if (day.day == 1 and day.weekday() != 6) or (day.day == 2 and day.weekday() == 0):
+            income[i] += salary * rng.normal(1, 0.02)
+        if day.day == 5:
+            expenses[i] += salary * 0.3
+    return income, expenses
+
+def _gig(rng: np.random.Generator, start: date, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    per_day = rng.uniform(600, 2000)
+    weekday = (np.arange(days) + start.weekday()) % 7
+    works = rng.random(days) < np.where(weekday >= 5, 0.85, 0.6)
+    income = works * rng.gamma(3.0, per_day / 3.0, days) * np.where(weekday >= 5, 1.3, 1.0)
+    return income, _spending(rng, start, days, per_day * 0.5)
+
+def _seasonal(rng: np.random.Generator, start: date, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    base = rng.uniform(800, 2500)
+    phase = rng.uniform(0, 2 * np.pi)
+    day_of_year = np.array([(start + timedelta(days=i)).timetuple().tm_yday for i in range(days)])
+    season = 1 + 0.8 * np.sin(2 * np.pi * day_of_year / 365 + phase)
+    income = (rng.random(days) < 0.5) * rng.gamma(2.0, base * season)
+    return income, _spending(rng, start, days, base * 0.6)
+
+def _freelance(rng: np.random.Generator, start: date, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    invoice = rng.uniform(20000, 150000)
+    income = np.zeros(days)
+    for month_start in range(0, days, 30):
+        for _ in range(int(rng.integers(1, 4))):
+            day = month_start + int(rng.integers(0, 30))
+            if day < days:
+                income[day] += rng.lognormal(np.log(invoice / 2), 0.6)
+    return income, _spending(rng, start, days, invoice / 70)
+
+_GENERATORS: Dict[str, Callable[[np.random.Generator, date, int], Tuple[np.ndarray, np.ndarray]]] = {
+    "salaried": _salaried,
+    "gig": _gig,
+    "seasonal": _seasonal,
+    "freelance": _freelance,
+}
+
+def daily_series(archetype: str, days: int, seed: int, end: date = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Daily income and expense totals (both non-negative), oldest first, ending at ``end``."""
+    start = (end or date.today()) - timedelta(days=days - 1)
+    income, expenses = _GENERATORS[archetype](np.random.default_rng(seed), start, days)
+    return np.round(income, 2), np.round(expenses, 2)
+
+def make_ledger(archetype: str, days: int, seed: int, end: date = None) -> Ledger:
+    """One transaction per non-zero income or expense day, signed the way ``predict_cash_flow`` expects."""
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    income, expenses = daily_series(archetype, days, seed, end)
+    ledger = []
+    for i in range(days):
+        day = (start + timedelta(days=i)).isoformat()
+        if income[i] > 0:
+            ledger.append({'date': day, 'amount': float(income[i]), 'currency': 'INR'})
+        if expenses[i] > 0:
+            ledger.append({'date': day, 'amount': -float(expenses[i]), 'currency': 'INR'})
+    return ledger
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archetype", choices=ARCHETYPES, default="gig")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    income, expenses = daily_series(args.archetype, args.days, args.seed)
+    print(f"{args.archetype}: {args.days} days, income ₹{income.sum():,.0f} on {np.count_nonzero(income)} days, "
+          f"expenses ₹{expenses.sum():,.0f} on {np.count_nonzero(expenses)} days")
+
+if __name__ == "__main__":
+    main()
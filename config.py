@@ -3,15 +3,77 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "karobuddy.db")
 
+# Local NSE/BSE listing used to resolve company names to tickers
+SYMBOL_LISTING_PATH = os.getenv("SYMBOL_LISTING_PATH", os.path.join(BASE_DIR, "data", "nse_bse_listing.csv"))
+# Set when the listing is only a subset of the exchanges: unknown capitalised words are then passed through as tickers
+SYMBOL_LISTING_PARTIAL = os.getenv("SYMBOL_LISTING_PARTIAL", "false").lower() == "true"
+
+# On-disk cache of daily price histories (also read offline by the backtest)
+MARKET_DATA_CACHE_DIR = os.getenv("MARKET_DATA_CACHE_DIR", os.path.join(BASE_DIR, "data", "market_cache"))
+MARKET_DATA_TTL_SECONDS = int(os.getenv("MARKET_DATA_TTL_SECONDS", "21600"))
+MARKET_DATA_MAX_WORKERS = int(os.getenv("MARKET_DATA_MAX_WORKERS", "8"))
+
+# Local intent classifier consulted when no keyword rule matches
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", os.path.join(BASE_DIR, "data", "intent_model.joblib"))
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.4"))
+
+# Cache of general LLM answers (exact text, then embedding similarity)
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+# Model tiers: simple questions go to the fast model, complex ones to the large one
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "claude-3-haiku-20240307")
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "claude-3-opus-20240229")
+
+# Admission control: concurrent requests per class, queue length as a multiple of it,
+# and a per-user token bucket (burst size, tokens refilled per second). The defaults
+# allow 20 chat messages back to back and one every 2 seconds after that.
+ADMISSION_LLM_CONCURRENCY = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "8"))
+ADMISSION_MARKET_DATA_CONCURRENCY = int(os.getenv("ADMISSION_MARKET_DATA_CONCURRENCY", "6"))
+ADMISSION_FORECAST_CONCURRENCY = int(os.getenv("ADMISSION_FORECAST_CONCURRENCY", "2"))
+ADMISSION_REPORT_CONCURRENCY = int(os.getenv("ADMISSION_REPORT_CONCURRENCY", "2"))
+ADMISSION_QUEUE_FACTOR = int(os.getenv("ADMISSION_QUEUE_FACTOR", "4"))
+ADMISSION_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", "10"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "20"))
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "0.5"))
+
+# Cash flow forecasts: cached ARIMA fits and recurring-stream detections are extended with new days
+# and fully redone this often
+FORECAST_REFIT_DAYS = int(os.getenv("FORECAST_REFIT_DAYS", "7"))
+# Backtesting budget for picking a forecaster; ARIMA is an opt-in slow candidate that is only
+# backtested when its fits (about 40 ms each, three per series) fit in the budget, e.g. 300 ms
+FORECAST_TIME_BUDGET_MS = float(os.getenv("FORECAST_TIME_BUDGET_MS", "20"))
+FORECAST_USE_ARIMA = os.getenv("FORECAST_USE_ARIMA", "0") == "1"
+# Bootstrap paths behind the P10/P50/P90 cash flow range (0 disables the simulation)
+FORECAST_SIMULATIONS = int(os.getenv("FORECAST_SIMULATIONS", "10000"))
+# Nightly batch forecasts (`python -m batch_forecast`): worker processes (0 = one per CPU), users per chunk
+BATCH_FORECAST_WORKERS = int(os.getenv("BATCH_FORECAST_WORKERS", "0"))
+BATCH_FORECAST_CHUNK_USERS = int(os.getenv("BATCH_FORECAST_CHUNK_USERS", "200"))
+
+# Span tracing (rotating JSONL; summarize with `python -m tracing`)
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(BASE_DIR, "data", "traces.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", "5"))
+TRACE_USER_BUCKETS = int(os.getenv("TRACE_USER_BUCKETS", "64"))
+
 # Bot Settings
 MAX_CONVERSATION_HISTORY = 10
-RESPONSE_TIMEOUT = 30
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "1500"))  # Prompt budget for past turns
+CONVERSATION_MEMORY_MAX_USERS = int(os.getenv("CONVERSATION_MEMORY_MAX_USERS", "5000"))
+CONVERSATION_MEMORY_IDLE_SECONDS = int(os.getenv("CONVERSATION_MEMORY_IDLE_SECONDS", "1800"))
+CONVERSATION_FOLLOWUP_SECONDS = int(os.getenv("CONVERSATION_FOLLOWUP_SECONDS", "600"))  # Follow-ups this soon skip the answer cache
+RESPONSE_TIMEOUT = float(os.getenv("RESPONSE_TIMEOUT", "30"))  # Seconds for a whole LLM answer, fallbacks included
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))  # Seconds between Telegram message edits
 
 def validate_config():
     """Validate that all required configuration is present."""
@@ -0,0 +1,154 @@
+"""
+Per-user conversation memory for the ``general`` LLM prompt.
+
+Each user gets a ring buffer of their last ``MAX_CONVERSATION_HISTORY`` turns,
+warm-loaded from the ``conversations`` table the first time they are seen. Turns
+that fall out of the buffer are folded into a short rolling summary of what the
+user asked earlier, and the history handed to the model is cut to a token budget
+(newest turns first). Idle users are evicted LRU-first so memory stays bounded
+however many users the bot has.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Tuple
+from database import db_conn
+import config
+
+CHARS_PER_TOKEN = 4  # Rough estimate for English/Hinglish text; Devanagari runs denser
+MAX_TURN_CHARS = 1200  # Long tool outputs (dashboards, reports) are clipped when stored
+SUMMARY_LINE_CHARS = 100
+MAX_SUMMARY_LINES = 8
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+class _UserMemory:
+    __slots__ = ("turns", "summary", "last_used")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=max_turns)
+        self.summary: Deque[str] = deque(maxlen=MAX_SUMMARY_LINES)
+        self.last_used = time.time()
+
+    def add(self, message: str, response: str):
+        if len(self.turns) == self.turns.maxlen:
+            self.summary.append(_clip(self.turns[0][0], SUMMARY_LINE_CHARS))
+        self.turns.append((_clip(message, MAX_TURN_CHARS), _clip(response, MAX_TURN_CHARS)))
+        self.last_used = time.time()
+
+class ConversationMemory:
+    """LRU-bounded map of telegram_id -> recent turns + rolling summary."""
+
+    def __init__(self, conn=None, max_turns: int = None, max_tokens: int = None,
+                 max_users: int = None, idle_seconds: int = None):
+        self.conn = conn if conn is not None else db_conn
+        self.max_turns = config.MAX_CONVERSATION_HISTORY if max_turns is None else max_turns
+        self.max_tokens = config.CONVERSATION_HISTORY_TOKENS if max_tokens is None else max_tokens
+        self.max_users = config.CONVERSATION_MEMORY_MAX_USERS if max_users is None else max_users
+        self.idle_seconds = config.CONVERSATION_MEMORY_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self._users: "OrderedDict[int, _UserMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, telegram_id: int) -> _UserMemory:
+        memory = _UserMemory(self.max_turns)
+        c = self.conn.cursor()
+        # Read one extra generation of turns so the summary starts out populated too
+        c.execute("""SELECT message, response FROM conversations
+                     WHERE telegram_id = ? ORDER BY id DESC LIMIT ?""",
+                  (telegram_id, self.max_turns + MAX_SUMMARY_LINES))
+        for message, response in reversed(c.fetchall()):
+            memory.add(message or "", response or "")
+        return memory
+
+    def _evict(self, now: float):
+        while self._users:
+            oldest_id, oldest = next(iter(self._users.items()))
+            if len(self._users) <= self.max_users and now - oldest.last_used < self.idle_seconds:
+                break
+            del self._users[oldest_id]
+
+    def _get(self, telegram_id: int) -> _UserMemory:
+        with self._lock:
+            memory = self._users.get(telegram_id)
+            if memory is not None:
+                self._users.move_to_end(telegram_id)
+                return memory
+        memory = self._load(telegram_id)
+        with self._lock:
+            # Another thread may have loaded the same user meanwhile; keep the first copy
+            memory = self._users.setdefault(telegram_id, memory)
+            self._users.move_to_end(telegram_id)
+            self._evict(time.time())
+        return memory
+
+    def append(self, telegram_id: int, message: str, response: str):
+        """Record a finished turn (call after it has been saved to the conversations table)."""
+        with self._lock:
+            memory = self._users.get(telegram_id)
+            if memory is not None:
+                self._users.move_to_end(telegram_id)
+                memory.add(message, response)
+                return
+        # Not in memory yet: the warm-load reads this turn back from the table
+        self._get(telegram_id)
+
+    def in_conversation(self, telegram_id: int) -> bool:
+        """True if the user had a turn within CONVERSATION_FOLLOWUP_SECONDS (a likely follow-up)."""
+        with self._lock:
+            memory = self._users.get(telegram_id)
+            if memory is None or not memory.turns:
+                return False
+            return time.time() - memory.last_used < config.CONVERSATION_FOLLOWUP_SECONDS
+
+    def history(self, telegram_id: int) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        The user's recent turns as prompt messages, newest kept first within the
+        token budget, plus a summary of the older questions that didn't fit.
+
+        :param telegram_id: The user's Telegram id.
+        :return: (summary text or "", list of ("human"|"ai", content) tuples oldest first).
+        """
+        memory = self._get(telegram_id)
+        with self._lock:
+            turns = list(memory.turns)
+            summary = list(memory.summary)
+            memory.last_used = time.time()
+
+        budget = self.max_tokens
+        kept: List[Tuple[str, str]] = []
+        for i in range(len(turns) - 1, -1, -1):
+            message, response = turns[i]
+            cost = estimate_tokens(message) + estimate_tokens(response)
+            if cost > budget:
+                # Fold what doesn't fit into the summary instead of dropping it silently
+                summary.extend(_clip(m, SUMMARY_LINE_CHARS) for m, _ in turns[:i + 1])
+                break
+            budget -= cost
+            kept.append((message, response))
+
+        summary_text = ""
+        if summary:
+            lines = "\n".join(f"- {line}" for line in summary[-MAX_SUMMARY_LINES:] if line)
+            if lines and estimate_tokens(lines) <= budget:
+                summary_text = lines
+        messages: List[Tuple[str, str]] = []
+        for message, response in reversed(kept):
+            if message and response:  # The API rejects empty turns
+                messages.append(("human", message))
+                messages.append(("ai", response))
+        return summary_text, messages
+
+    def forget(self, telegram_id: int):
+        with self._lock:
+            self._users.pop(telegram_id, None)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+# Create instance
+conversation_memory = ConversationMemory()
@@ -2,6 +2,7 @@ import sqlite3
 import chromadb
 from datetime import datetime
 from typing import Optional, List, Tuple
+from tracing import TracedConnection
 
 class DatabaseManager:
     """Manages SQLite and ChromaDB connections."""
@@ -19,7 +20,7 @@ class DatabaseManager:
     
     def _init_sqlite(self) -> sqlite3.Connection:
         """Initialize SQLite database with required tables."""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=TracedConnection)
         c = conn.cursor()
         
         # Users table
@@ -99,6 +100,27 @@ class DatabaseManager:
             created_at TEXT,
             FOREIGN KEY (user_id) REFERENCES users(telegram_id)
         )''')
+
+        # Running spend per budget bucket, kept current on every expense insert
+        c.execute('''CREATE TABLE IF NOT EXISTS budget_totals (
+            user_id INTEGER,
+            budget_period TEXT,
+            bucket TEXT,
+            spent REAL DEFAULT 0,
+            allocation REAL,
+            alert_level REAL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (user_id, budget_period, bucket),
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )''')
+
+        # Per-user history lookups (conversation memory warm-load)
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_conversations_user
+                     ON conversations (telegram_id, id)''')
+
+        # Per-user date-range scans (transaction history, nightly batch forecasts)
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+                     ON transactions (telegram_id, date)''')
         
         conn.commit()
         return conn
@@ -0,0 +1,210 @@
+"""
+Local intent classifier used when the keyword rules find nothing.
+
+A word + character n-gram TF-IDF, logistic regression model is trained from past
+conversations (``message`` / ``agent_used``) plus the seed examples below,
+persisted with joblib and loaded once per process. It only overrides the
+``general`` fallback, and only with a confident prediction, so the LLM is still
+used for genuine open questions.
+
+Usage:
+    python -m intent_classifier            # retrain from seeds + conversations and save
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline, make_union
+from intent_router import route
+import config
+
+# Intents the classifier may pick. Only read-only tools: income, expense, goal,
+# risk_profile, dfg_analysis and behavioral_analysis write to the database (a
+# transaction, a goal, the saved profile, a budget), so a guessed one would change
+# the user's data after a plain question. Those need a keyword rule to match.
+CLASSIFIER_INTENTS = {
+    "fraud", "stock_comparison", "stock_analysis", "mutual_fund_analysis",
+    "sector_analysis", "stock", "investment_recommendation", "report_generation",
+    "dashboard", "general",
+}
+MAX_HISTORY_EXAMPLES = 20000
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("someone on whatsapp promised 3x returns in a month", "fraud"),
+    ("a guy on telegram says pay 5000 and get 50000 back", "fraud"),
+    ("is this crypto trading app legit", "fraud"),
+    ("they are asking for my otp to release my winnings", "fraud"),
+    ("paisa dugna karne wali scheme sahi hai kya", "fraud"),
+    ("i got a call saying i won a lottery, they want a processing fee", "fraud"),
+    ("a friend wants me to join a chain scheme with monthly payouts", "fraud"),
+    ("is this stock tip group real, they charge 2999", "fraud"),
+    ("an app promises 2% daily interest on deposits", "fraud"),
+    ("they say my parcel is stuck in customs and want money", "fraud"),
+    ("should I trust this forex trading mentor on instagram", "fraud"),
+    ("my bank called and asked for my card pin", "fraud"),
+    ("which one is better tcs or infosys", "stock_comparison"),
+    ("hdfc bank or icici bank for long term", "stock_comparison"),
+    ("should I pick reliance over adani", "stock_comparison"),
+    ("maruti or tata motors which to buy", "stock_comparison"),
+    ("infosys against wipro on fundamentals", "stock_comparison"),
+    ("itc or hindustan unilever for dividends", "stock_comparison"),
+    ("between sbi and axis bank which is stronger", "stock_comparison"),
+    ("asian paints or berger paints", "stock_comparison"),
+    ("tell me about reliance fundamentals", "stock_analysis"),
+    ("how are tata motors numbers looking", "stock_analysis"),
+    ("should I buy infosys now", "stock_analysis"),
+    ("what do you think about itc shares long term", "stock_analysis"),
+    ("analyse hdfc bank for me", "stock_analysis"),
+    ("is maruti overvalued right now", "stock_analysis"),
+    ("zomato ke fundamentals kaise hain", "stock_analysis"),
+    ("give me a detailed view on asian paints", "stock_analysis"),
+    ("what is the outlook for bajaj finance", "stock_analysis"),
+    ("can I hold sbi for 5 years", "stock_analysis"),
+    ("how is parag parikh flexi cap doing", "mutual_fund_analysis"),
+    ("axis bluechip fund returns kaisa hai", "mutual_fund_analysis"),
+    ("is sbi small cap fund worth it", "mutual_fund_analysis"),
+    ("review my mirae asset large cap fund", "mutual_fund_analysis"),
+    ("how risky is quant small cap", "mutual_fund_analysis"),
+    ("is hdfc balanced advantage fund safe", "mutual_fund_analysis"),
+    ("nippon india index fund performance", "mutual_fund_analysis"),
+    ("should I continue my icici bluechip sip", "mutual_fund_analysis"),
+    ("how are pharma companies doing this week", "sector_analysis"),
+    ("top gainers in banking today", "sector_analysis"),
+    ("which it companies went up the most", "sector_analysis"),
+    ("how is the auto industry performing", "sector_analysis"),
+    ("best performing metal companies this week", "sector_analysis"),
+    ("which fmcg names gained recently", "sector_analysis"),
+    ("how is the realty space doing", "sector_analysis"),
+    ("energy stocks performance this week", "sector_analysis"),
+    ("price of tcs", "stock"),
+    ("what is reliance trading at", "stock"),
+    ("infy share price today", "stock"),
+    ("current price of hdfc bank", "stock"),
+    ("quote for itc", "stock"),
+    ("how much is one share of maruti", "stock"),
+    ("wipro abhi kitne ka hai", "stock"),
+    ("latest price sbi", "stock"),
+    ("where should I put my money", "investment_recommendation"),
+    ("I have 20000 lying idle what do I do with it", "investment_recommendation"),
+    ("paise kahan lagaun", "investment_recommendation"),
+    ("best mutual funds for me", "investment_recommendation"),
+    ("what should I buy with my bonus", "investment_recommendation"),
+    ("give me some good funds for 5 years", "investment_recommendation"),
+    ("I want to start investing, where do I begin", "investment_recommendation"),
+    ("kuch achhe stocks batao", "investment_recommendation"),
+    ("which funds should a beginner pick", "investment_recommendation"),
+    ("how do I grow 1 lakh in 3 years", "investment_recommendation"),
+    ("send me my monthly statement", "report_generation"),
+    ("I need an excel of my transactions", "report_generation"),
+    ("make a pdf of my finances", "report_generation"),
+    ("export my data", "report_generation"),
+    ("email me a sheet of my spending", "report_generation"),
+    ("I want a document of this month's money", "report_generation"),
+    ("give me a downloadable statement", "report_generation"),
+    ("prepare my yearly finance file", "report_generation"),
+    ("how am I doing this month", "dashboard"),
+    ("what's my balance", "dashboard"),
+    ("how much did I make and spend this month", "dashboard"),
+    ("mera hisaab dikhao", "dashboard"),
+    ("give me a quick snapshot of my money", "dashboard"),
+    ("what is my net savings so far", "dashboard"),
+    ("how much money do I have left", "dashboard"),
+    ("status of my finances", "dashboard"),
+    ("what is sip", "general"),
+    ("how does compound interest work", "general"),
+    ("explain ppf vs elss", "general"),
+    ("what is the new tax regime", "general"),
+    ("how much should I keep as emergency money", "general"),
+    ("hello", "general"),
+    ("thanks!", "general"),
+    ("who are you", "general"),
+    ("what is an index fund", "general"),
+    ("how do I file itr as a freelancer", "general"),
+    ("namaste", "general"),
+    ("credit card bill kaise kam karu", "general"),
+    ("good morning", "general"),
+    ("what is inflation", "general"),
+    ("how does a credit score work", "general"),
+    ("ok", "general"),
+    ("what can you do", "general"),
+    ("explain nav", "general"),
+    ("what is term insurance", "general"),
+    ("difference between fd and rd", "general"),
+    ("is gold a good hedge in general", "general"),
+    ("bye", "general"),
+]
+
+_model = None
+_model_lock = threading.Lock()
+
+def load_training_data(conn=None) -> Tuple[List[str], List[str]]:
+    """Seed examples plus the most recent labelled conversations, deduplicated by message."""
+    examples: Dict[str, str] = {}
+    if conn is not None:
+        c = conn.cursor()
+        c.execute("""SELECT message, agent_used FROM conversations
+                     WHERE message IS NOT NULL AND agent_used IS NOT NULL
+                     ORDER BY id DESC LIMIT ?""", (MAX_HISTORY_EXAMPLES,))
+        for message, intent in c.fetchall():
+            # Only trust labels the keyword rules reproduce: 'general' in history just means
+            # nothing matched, and earlier classifier picks would otherwise feed back in
+            if intent in CLASSIFIER_INTENTS and intent != "general" and route(message).intent == intent:
+                examples.setdefault(message.strip().lower(), intent)
+    for message, intent in SEED_EXAMPLES:
+        examples[message.lower()] = intent
+    return list(examples), list(examples.values())
+
+def build_model():
+    """Word and character n-gram TF-IDF features into a multinomial logistic regression."""
+    return make_pipeline(
+        make_union(
+            TfidfVectorizer(analyzer="word", ngram_range=(1, 2), sublinear_tf=True),
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True),
+        ),
+        LogisticRegression(max_iter=1000, C=10.0),
+    )
+
+def train_classifier(conn=None, path: Optional[str] = None):
+    """Train on seeds + conversations and persist the fitted pipeline."""
+    messages, intents = load_training_data(conn)
+    model = build_model().fit(messages, intents)
+    path = path or config.INTENT_MODEL_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump({"model": model, "examples": len(messages), "trained_at": datetime.now().isoformat()}, path)
+    return model
+
+def get_intent_classifier():
+    """Load the persisted model once per process, training a seed-only model if none exists."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                path = config.INTENT_MODEL_PATH
+                if os.path.exists(path):
+                    _model = joblib.load(path)["model"]
+                else:
+                    _model = train_classifier(path=path)
+    return _model
+
+def classify_intent(message: str, threshold: Optional[float] = None) -> Optional[Tuple[str, float]]:
+    """
+    Most likely intent and its probability, or None when the model is not confident
+    enough or predicts ``general``.
+    """
+    threshold = config.INTENT_CLASSIFIER_THRESHOLD if threshold is None else threshold
+    model = get_intent_classifier()
+    probabilities = model.predict_proba([message.lower()])[0]
+    best = probabilities.argmax()
+    intent = model.classes_[best]
+    # A model saved before CLASSIFIER_INTENTS was narrowed may still predict a dropped intent
+    if intent == "general" or intent not in CLASSIFIER_INTENTS or probabilities[best] < threshold:
+        return None
+    return intent, float(probabilities[best])
+
+if __name__ == "__main__":
+    from database import db_conn
+    trained = train_classifier(db_conn)
+    print(f"Saved intent classifier to {config.INTENT_MODEL_PATH} ({len(trained.classes_)} intents)")
@@ -0,0 +1,215 @@
+"""
+Keyword intent router.
+
+Every keyword of every rule (with simple inflections) is compiled into one
+precompiled regex, factored as a character trie and anchored on word boundaries,
+so a single ``findall`` pass collects every keyword hit and "is" no longer matches
+inside "this". Rules are then checked in priority order and the first one whose
+keyword groups are all hit wins, which keeps routing deterministic and lets
+callers see which rule fired. Hindi keywords are matched in both Devanagari and common Hinglish
+spellings.
+"""
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from tools.ticker_resolver import resolve_tickers
+
+# Letters, digits and Devanagari (including vowel signs, which \w does not cover)
+_WORD_CHAR = r"[\w\u0900-\u097F]"
+_TOKEN_RE = re.compile(rf"{_WORD_CHAR}+")
+# Plurals and simple inflections ("scams", "doubled", "checking") count as hits
+_SUFFIXES = ("s", "es", "d", "ed", "ing")
+
+class Rule(NamedTuple):
+    name: str
+    intent: str
+    groups: Sequence[Sequence[str]]  # Every group needs at least one keyword hit
+    predicate: Optional[Callable[[str], bool]] = None  # Extra check on the original message
+
+class RouteResult(NamedTuple):
+    intent: str
+    rule: str
+    keywords: Tuple[str, ...]
+
+def _mentions_two_tickers(message: str) -> bool:
+    return len(resolve_tickers(message, limit=2)) >= 2
+
+# Priority order: the first matching rule wins
+RULES: List[Rule] = [
+    Rule("income", "income", [
+        ["earned", "got paid", "income", "salary", "received money",
+         "kamaya", "kamaye", "kamai", "tankhwah", "कमाई", "कमाया", "कमाए", "सैलरी", "तनख्वाह", "वेतन"],
+    ]),
+    Rule("fraud", "fraud", [
+        ["scam", "fraud", "guarantee", "double", "risk-free", "suspicious", "ponzi",
+         "dhokha", "धोखा", "फ्रॉड", "घोटाला"],
+    ]),
+    Rule("goal", "goal", [
+        ["goal", "target", "save for", "saving for", "allocate", "lakshya", "लक्ष्य"],
+    ]),
+    Rule("stock_comparison", "stock_comparison", [
+        ["vs", "versus", "compare"],
+    ], _mentions_two_tickers),
+    Rule("stock_analysis", "stock_analysis", [
+        ["is"], ["good"], ["stock", "share", "company"],
+    ]),
+    Rule("mutual_fund_analysis", "mutual_fund_analysis", [
+        ["is"], ["good"], ["mutual fund", "mf", "fund"],
+    ]),
+    Rule("sector_analysis", "sector_analysis", [
+        ["sector", "top performer", "best stock", "most profit", "highest return"],
+        ["analyze", "show", "tell", "which", "find"],
+    ]),
+    Rule("stock_check", "stock", [
+        ["stock", "share", "equity", "nse", "bse"], ["check"],
+    ]),
+    Rule("investment_recommendation", "investment_recommendation", [
+        ["suggest", "suggestion", "recommend", "recommendation", "investment", "where to invest",
+         "should i invest", "nivesh", "निवेश"],
+    ]),
+    Rule("report_generation", "report_generation", [
+        ["generate report", "create report", "download report", "export report", "pdf report",
+         "excel report", "spreadsheet", "spending report", "investment report", "comprehensive report"],
+    ]),
+    Rule("dashboard", "dashboard", [
+        ["dashboard", "summary", "overview"],
+    ]),
+    Rule("expense", "expense", [
+        ["expense", "spent", "paid for", "bought", "kharcha", "kharche", "kharch", "खर्च", "खर्चा", "खर्चे"],
+    ]),
+    Rule("risk_profile", "risk_profile", [
+        ["risk", "risk profile", "risk level"],
+    ]),
+    Rule("dfg_analysis", "dfg_analysis", [
+        ["dfg", "cash flow", "prediction", "dynamic budget"],
+    ]),
+    Rule("behavioral_analysis", "behavioral_analysis", [
+        ["bias", "behavior", "behaviour", "habit"],
+    ]),
+]
+
+DEFAULT_RESULT = RouteResult("general", "default", ())
+
+def _words(keyword: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(keyword.lower()))
+
+def _inflections(keyword: str) -> List[str]:
+    forms = [keyword] + [keyword + suffix for suffix in _SUFFIXES]
+    if keyword.endswith("e"):
+        forms.append(keyword[:-1] + "ing")
+    return forms
+
+def _contains(phrase: Tuple[str, ...], part: Tuple[str, ...]) -> bool:
+    return any(phrase[i:i + len(part)] == part for i in range(len(phrase) - len(part) + 1))
+
+def _trie_pattern(forms: List[str]) -> str:
+    """
+    Alternation of all forms factored into a character trie, so the regex engine
+    follows one branch per character instead of trying every keyword in turn.
+    Greedy optional tails make the longest form win at each position.
+    """
+    trie: Dict = {}
+    for form in forms:
+        node = trie
+        for ch in form:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [(r"[\s-]+" if ch == " " else re.escape(ch)) + build(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+def _compile(rules: List[Rule]) -> Tuple["re.Pattern", Dict[str, Tuple[str, int]], List[int]]:
+    """
+    Build the keyword regex and map every inflected form of every keyword to the
+    keyword and a bitmask of the (rule, group) pairs it satisfies. A phrase also
+    credits the shorter keywords inside it, so "best stock" still counts as "stock"
+    even though the regex consumes the whole phrase.
+    """
+    owners: Dict[Tuple[str, ...], int] = {}
+    names: Dict[Tuple[str, ...], str] = {}
+    required = []
+    bit = 0
+    for rule in rules:
+        req = 0
+        for group in rule.groups:
+            for keyword in group:
+                words = _words(keyword)
+                owners[words] = owners.get(words, 0) | (1 << bit)
+                names.setdefault(words, keyword)
+            req |= 1 << bit
+            bit += 1
+        required.append(req)
+
+    forms: Dict[str, Tuple[str, int]] = {}
+    for words in owners:
+        mask = 0
+        for other, other_mask in owners.items():
+            if _contains(words, other):
+                mask |= other_mask
+        for form in _inflections(" ".join(words)):
+            forms.setdefault(form, (names[words], mask))
+
+    pattern = re.compile(rf"(?<!{_WORD_CHAR})({_trie_pattern(list(forms))})(?!{_WORD_CHAR})")
+    return pattern, forms, required
+
+_PATTERN, _FORMS, _REQUIRED = _compile(RULES)
+
+@lru_cache(maxsize=4096)
+def _candidate_rules(hits: int) -> Tuple[int, ...]:
+    """Indices of the rules whose keyword groups are all covered, in priority order."""
+    return tuple(r for r, req in enumerate(_REQUIRED) if hits & req == req)
+
+def route(message: str) -> RouteResult:
+    """Return the intent for a message, the rule that fired and the keywords it matched."""
+    found = _PATTERN.findall(message.lower())
+    if not found:
+        return DEFAULT_RESULT
+
+    hits = 0
+    for i, form in enumerate(found):
+        if form not in _FORMS:  # Phrase typed with extra spaces or a hyphen
+            found[i] = form = " ".join(_TOKEN_RE.findall(form))
+        hits |= _FORMS[form][1]
+    for r in _candidate_rules(hits):
+        rule = RULES[r]
+        if rule.predicate is None or rule.predicate(message):
+            req = _REQUIRED[r]
+            fired = tuple(dict.fromkeys(_FORMS[form][0] for form in found if _FORMS[form][1] & req))
+            return RouteResult(rule.intent, rule.name, fired)
+    return DEFAULT_RESULT
+
+# Clause boundaries for multi-intent messages: sentence ends, semicolons, newlines and
+# joining words ("I earned 20000 and check TCS stock", "kharcha 500 aur goal dikhao")
+_CLAUSE_SPLIT_RE = re.compile(
+    r"\s*(?:[;\n]+|[.!?]+(?=\s)|,?\s+(?:and|also|then|plus|aur|और)\s+|\s+&\s+)\s*",
+    re.IGNORECASE,
+)
+
+def split_clauses(message: str) -> List[str]:
+    """Split a message into clauses that can be routed on their own."""
+    return [c for c in _CLAUSE_SPLIT_RE.split(message.strip()) if c and _TOKEN_RE.search(c)]
+
+def route_clauses(message: str) -> List[Tuple[str, str]]:
+    """
+    Route every clause of a message separately and return [(intent, clause), ...]
+    when the message really holds several requests, otherwise [].
+
+    Splitting only happens when every clause hits a rule of its own and no two clauses
+    share an intent, so "Create goal Car and Bike with target 100000", "Compare HDFC Bank
+    and ICICI Bank" or "what is SIP and how does it work" stay single requests.
+    """
+    clauses = split_clauses(message)
+    if len(clauses) < 2:
+        return []
+    routed = [(route(clause).intent, clause) for clause in clauses]
+    intents = [intent for intent, _ in routed]
+    if "general" in intents or len(set(intents)) < len(intents):
+        return []
+    return routed
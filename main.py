@@ -1,6 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
 from agent_graph import run_agent_graph
+from telegram_streaming import TelegramReplyStreamer
 from database import db_manager
 from translations import get_text, get_language_keyboard
 import config
@@ -588,8 +589,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(result, reply_markup=InlineKeyboardMarkup(keyboard))
     
     else:
-        # General conversation - let the agent decide
-        result, file_paths = await run_agent_graph(user_id, message, "general")
+        # General conversation - let the agent decide, streaming LLM answers as they arrive
+        streamer = TelegramReplyStreamer(update.message)
+        result, file_paths = await run_agent_graph(user_id, message, "general", on_token=streamer.on_token)
         
         # Send any files if generated
         if file_paths:
@@ -612,7 +614,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     logger.error(f"Error sending file {file_path}: {e}")
         
         keyboard = [[InlineKeyboardButton(get_text("main_menu", lang), callback_data='main_menu')]]
-        await update.message.reply_text(result, reply_markup=InlineKeyboardMarkup(keyboard))
+        await streamer.finish(result, reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors."""
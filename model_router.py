@@ -0,0 +1,119 @@
+"""
+Model tiering and latency budgets for LLM calls.
+
+Short, simple questions go to the fast model and only complex ones to the large
+model. Every call shares one deadline (``config.RESPONSE_TIMEOUT``): if the chosen
+model fails or runs out of time, the fast model gets whatever budget is left, and
+past that the user gets a canned answer instead of a hung chat.
+"""
+import logging
+import re
+import time
+from typing import Callable, List, NamedTuple, Optional
+from langchain_anthropic import ChatAnthropic
+from tracing import span
+import config
+
+logger = logging.getLogger(__name__)
+
+COMPLEX_MESSAGE_CHARS = 240
+MIN_ATTEMPT_SECONDS = 2.0  # Don't start a fallback call with less budget than this
+COMPLEX_RE = re.compile(
+    r"\b(?:explain|compare|difference|versus|plan|planning|strategy|pros|cons|why|calculate|"
+    r"tax|taxes|retire|retirement|portfolio|step by step|in detail)\b",
+    re.IGNORECASE,
+)
+CANNED_REPLY = ("⏳ Sorry, I'm taking too long to answer that right now. "
+                "Please try again in a moment, or ask a shorter question.")
+
+class LLMReply(NamedTuple):
+    text: str
+    model: str
+    complete: bool  # False for canned or cut-off answers, which should not be cached
+
+_models = {
+    tier: ChatAnthropic(
+        model=name,
+        anthropic_api_key=config.ANTHROPIC_API_KEY,
+        temperature=0.7,
+        max_retries=0,  # Falling back to the next tier is the retry
+    )
+    for tier, name in (("fast", config.LLM_FAST_MODEL), ("large", config.LLM_LARGE_MODEL))
+}
+
+def choose_tier(message: str) -> str:
+    """'large' for long, multi-question or analytical prompts, otherwise 'fast'."""
+    if len(message) > COMPLEX_MESSAGE_CHARS or message.count("?") > 1 or COMPLEX_RE.search(message):
+        return "large"
+    return "fast"
+
+def _prompt_chars(messages) -> int:
+    return sum(len(m.content) for m in messages if isinstance(m.content, str))
+
+def _attempt(tier: str, messages, deadline: float, on_token) -> LLMReply:
+    model = _models[tier]
+    remaining = deadline - time.perf_counter()
+    if on_token is None:
+        text = model.invoke(messages, timeout=remaining).content
+        return LLMReply(text, model.model, True)
+
+    parts: List[str] = []
+    try:
+        for chunk in model.stream(messages, timeout=remaining):
+            if isinstance(chunk.content, str) and chunk.content:
+                parts.append(chunk.content)
+                on_token(chunk.content)
+            if time.perf_counter() > deadline:
+                break
+        else:
+            return LLMReply("".join(parts), model.model, True)
+    except Exception:
+        if not parts:
+            raise
+    # Part of the answer is already on screen, so finish it rather than start over
+    return LLMReply("".join(parts).rstrip() + " …", model.model, False)
+
+def complete(messages, message: str, on_token: Optional[Callable[[str], None]] = None,
+             timeout: float = None) -> LLMReply:
+    """
+    Answer formatted prompt messages within the response deadline.
+
+    :param messages: Formatted chat messages for the model.
+    :param message: The user's raw message, used to pick the tier.
+    :param on_token: Optional callback receiving streamed text chunks.
+    :param timeout: Total budget in seconds, defaults to config.RESPONSE_TIMEOUT.
+    :return: The reply text, the model that produced it and whether it is complete.
+    """
+    start = time.perf_counter()
+    deadline = start + (config.RESPONSE_TIMEOUT if timeout is None else timeout)
+    tiers = ["large", "fast"] if choose_tier(message) == "large" else ["fast"]
+    prompt_chars = _prompt_chars(messages)
+
+    for i, tier in enumerate(tiers):
+        if i > 0 and deadline - time.perf_counter() < MIN_ATTEMPT_SECONDS:
+            break
+        attempt_start = time.perf_counter()
+        first_token = []
+        callback = None
+        if on_token is not None:
+            def callback(chunk, first_token=first_token):
+                if not first_token:
+                    first_token.append(time.perf_counter() - attempt_start)
+                on_token(chunk)
+        try:
+            with span(f"llm.{tier}", model=_models[tier].model, prompt_chars=prompt_chars):
+                reply = _attempt(tier, messages, deadline, callback)
+        except Exception as e:
+            logger.warning("LLM %s failed after %.0f ms (prompt %d chars): %s", _models[tier].model,
+                           (time.perf_counter() - attempt_start) * 1000, prompt_chars, e)
+            continue
+        logger.info("LLM %s: prompt %d chars, reply %d chars, first token %s, total %.0f ms%s",
+                    reply.model, prompt_chars, len(reply.text),
+                    f"{first_token[0] * 1000:.0f} ms" if first_token else "n/a",
+                    (time.perf_counter() - attempt_start) * 1000, "" if reply.complete else " (cut off)")
+        return reply
+
+    logger.warning("No model answered within %.0f ms, sending canned reply", (time.perf_counter() - start) * 1000)
+    if on_token is not None:
+        on_token(CANNED_REPLY)
+    return LLMReply(CANNED_REPLY, "canned", False)
@@ -0,0 +1,187 @@
+"""
+Response cache for the ``general`` LLM intent.
+
+Answers are looked up first by normalized text (a dict hit, microseconds) and then
+by embedding similarity in a ChromaDB collection, so "What is SIP?" and "what's an
+SIP" share one model call. Entries expire after a TTL, are partitioned by language
+and are never created for messages that carry user-specific data such as amounts
+or "my ..." questions. Hit rates are logged every STATS_LOG_EVERY_LOOKUPS lookups.
+
+Mid-conversation, only messages that lean on the earlier turns ("and for 5 years?",
+"explain that") skip the cache; a self-contained question is answered from it
+even then, without the history the LLM would have seen.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from database import chroma_client
+import config
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "response_cache"
+PURGE_EVERY_STORES = 100
+STATS_LOG_EVERY_LOOKUPS = 200
+CONTEXT_FREE_MIN_WORDS = 3
+_DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+_NON_WORD_RE = re.compile(r"[^\w\u0900-\u097F]+")
+# Amounts, dates, contact details and possessives make an answer user-specific
+_PERSONAL_RE = re.compile(
+    r"\d|₹|@|https?://|\b(?:my|mine|myself|mera|meri|mere|mujhe|maine|hamara|hamari)\b"
+    r"|(?:मेरा|मेरी|मेरे|मुझे|मैंने)",
+    re.IGNORECASE,
+)
+# Openers and pronouns that point back at earlier turns
+_CONTEXT_RE = re.compile(
+    r"^(?:and|but|so|also|then|what about|how about|why|more|tell me more|elaborate|go on|continue|aur|toh?|phir)\b"
+    r"|\b(?:it|its|that|this|those|these|they|them|above|previous|same|else|instead|"
+    r"iska|iski|uska|uski|ye|yeh|woh?|isme|usme)\b",
+    re.IGNORECASE,
+)
+
+def normalize(text: str) -> str:
+    """Lowercase, NFKC-fold and strip punctuation so trivial variants share a key."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+def is_context_dependent(message: str) -> bool:
+    """True for follow-ups that only make sense with the earlier turns, e.g. "why?" or "and for 5 years"."""
+    normalized = normalize(message)
+    return len(normalized.split()) < CONTEXT_FREE_MIN_WORDS or bool(_CONTEXT_RE.search(normalized))
+
+def detect_language(message: str, preferred: str = "en") -> str:
+    """Devanagari text is Hindi; otherwise fall back to the user's chosen language."""
+    return "hi" if _DEVANAGARI_RE.search(message) else (preferred or "en")
+
+class ResponseCache:
+    """Exact + semantic cache of LLM answers with TTL, LRU bound and hit counters."""
+
+    def __init__(self, ttl_seconds: int = None, similarity: float = None, max_entries: int = None):
+        self.ttl_seconds = config.RESPONSE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.similarity = config.RESPONSE_CACHE_SIMILARITY if similarity is None else similarity
+        self.max_entries = config.RESPONSE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        # entry id -> (expires_at, response); the id is derived from (language, normalized text)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._collection = None
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._lookup_seconds = 0.0
+
+    @staticmethod
+    def _entry_id(language: str, normalized: str) -> str:
+        return hashlib.sha1(f"{language}:{normalized}".encode("utf-8")).hexdigest()
+
+    def _get_collection(self):
+        if self._collection is None:
+            self._collection = chroma_client.get_or_create_collection(
+                COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+            )
+        return self._collection
+
+    @staticmethod
+    def is_cacheable(message: str) -> bool:
+        return bool(normalize(message)) and not _PERSONAL_RE.search(message)
+
+    def _live_response(self, entry_id: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[entry_id]
+                return None
+            self._entries.move_to_end(entry_id)
+            return entry[1]
+
+    def _semantic_match(self, normalized: str, language: str, now: float) -> Optional[str]:
+        try:
+            results = self._get_collection().query(
+                query_texts=[normalized],
+                n_results=1,
+                where={"$and": [{"language": language}, {"expires_at": {"$gt": now}}]},
+            )
+        except Exception:
+            return None
+        if not results['ids'] or not results['ids'][0]:
+            return None
+        # Cosine space: distance = 1 - similarity
+        if 1.0 - results['distances'][0][0] < self.similarity:
+            return None
+        return results['ids'][0][0]
+
+    def lookup(self, message: str, language: str = "en") -> Optional[str]:
+        """Cached answer for the message, or None on a miss or an uncacheable message."""
+        if not self.is_cacheable(message):
+            self._counts["skipped"] += 1
+            return None
+
+        start = time.perf_counter()
+        now = time.time()
+        normalized = normalize(message)
+        response = self._live_response(self._entry_id(language, normalized), now)
+        if response is not None:
+            self._counts["exact_hits"] += 1
+        else:
+            match_id = self._semantic_match(normalized, language, now)
+            response = self._live_response(match_id, now) if match_id else None
+            self._counts["semantic_hits" if response is not None else "misses"] += 1
+        self._lookup_seconds += time.perf_counter() - start
+        if sum(self._counts[k] for k in ("exact_hits", "semantic_hits", "misses")) % STATS_LOG_EVERY_LOOKUPS == 0:
+            stats = self.stats()
+            logger.info("Response cache: %.0f%% hit rate over %d lookups (%d exact, %d semantic), "
+                        "%d entries, %.1f ms per lookup", stats["hit_rate"] * 100,
+                        stats.get("exact_hits", 0) + stats.get("semantic_hits", 0) + stats.get("misses", 0),
+                        stats.get("exact_hits", 0), stats.get("semantic_hits", 0), stats["entries"],
+                        stats["mean_lookup_ms"])
+        return response
+
+    def store(self, message: str, language: str, response: str, telegram_id: int = None):
+        """Remember an answer unless the message or the answer is specific to one user."""
+        if not response or not self.is_cacheable(message):
+            return
+        if telegram_id is not None and str(telegram_id) in response:
+            return
+
+        normalized = normalize(message)
+        entry_id = self._entry_id(language, normalized)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._entries[entry_id] = (expires_at, response)
+            self._entries.move_to_end(entry_id)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        try:
+            collection = self._get_collection()
+            collection.upsert(
+                ids=[entry_id],
+                documents=[normalized],
+                metadatas=[{"language": language, "expires_at": expires_at}],
+            )
+            if evicted:
+                collection.delete(ids=evicted)
+            if self._counts["stores"] % PURGE_EVERY_STORES == 0:
+                collection.delete(where={"expires_at": {"$lte": time.time()}})
+        except Exception:
+            pass  # The exact-text layer still works without the vector index
+        self._counts["stores"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters, hit rate over cacheable lookups and mean lookup time."""
+        counts = dict(self._counts)
+        lookups = sum(counts.get(k, 0) for k in ("exact_hits", "semantic_hits", "misses"))
+        hits = counts.get("exact_hits", 0) + counts.get("semantic_hits", 0)
+        return {
+            **counts,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "mean_lookup_ms": self._lookup_seconds / lookups * 1000 if lookups else 0.0,
+        }
+
+# Create instance
+response_cache = ResponseCache()
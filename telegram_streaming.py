@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from telegram import InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+import config
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+CURSOR = " ▌"
+FINAL_EDIT_ATTEMPTS = 2
+
+class TelegramReplyStreamer:
+    """
+    Shows a streamed LLM reply in Telegram: the first chunk is sent as a new message,
+    later chunks are applied by editing it at most once per STREAM_EDIT_INTERVAL
+    seconds to stay inside Telegram's edit rate limits.
+
+    ``on_token`` is safe to call from the worker thread running the agent graph.
+    """
+
+    def __init__(self, reply_to: Message, interval: float = None):
+        self.reply_to = reply_to
+        self.interval = config.STREAM_EDIT_INTERVAL if interval is None else interval
+        self.text = ""
+        self.sent: Optional[Message] = None
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._started = time.perf_counter()
+        self._last_edit = 0.0
+        self._task = self._loop.create_task(self._consume())
+
+    def on_token(self, chunk: str):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, chunk)
+
+    async def _consume(self):
+        done = False
+        while not done:
+            chunk = await self._queue.get()
+            if chunk is None:
+                break
+            self.text += chunk
+            # Fold in everything that arrived while the last edit was in flight
+            while not self._queue.empty():
+                chunk = self._queue.get_nowait()
+                if chunk is None:
+                    done = True
+                    break
+                self.text += chunk
+            await self._render()
+
+    async def _render(self):
+        now = time.perf_counter()
+        preview = self.text[:TELEGRAM_MESSAGE_LIMIT - len(CURSOR)] + CURSOR
+        try:
+            if self.sent is None:
+                self.sent = await self.reply_to.reply_text(preview)
+                self._last_edit = now
+                logger.info("Streamed reply visible after %.0f ms", (now - self._started) * 1000)
+            elif now - self._last_edit >= self.interval:
+                await self.sent.edit_text(preview)
+                self._last_edit = now
+        except RetryAfter as e:
+            self._last_edit = now + e.retry_after
+        except TelegramError as e:
+            logger.warning(f"Streaming edit failed: {e}")
+
+    async def finish(self, text: str, reply_markup: InlineKeyboardMarkup = None):
+        """Stop streaming and leave the complete reply (with its keyboard) in place."""
+        self._queue.put_nowait(None)
+        await self._task
+        if self.sent is not None:
+            for attempt in range(FINAL_EDIT_ATTEMPTS):
+                try:
+                    await self.sent.edit_text(text, reply_markup=reply_markup)
+                    return
+                except RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except BadRequest as e:
+                    if "not modified" in str(e).lower():
+                        # The streamed text already is the reply; only the keyboard is missing
+                        await self._attach_markup(reply_markup)
+                        return
+                    logger.warning(f"Final streaming edit failed: {e}")
+                    break
+                except TelegramError as e:
+                    logger.warning(f"Final streaming edit failed (attempt {attempt + 1}): {e}")
+            # Sending the reply anew; don't leave the streamed copy ending in the cursor
+            try:
+                await self.sent.edit_text(self.text[:TELEGRAM_MESSAGE_LIMIT])
+            except TelegramError as e:
+                logger.warning(f"Could not remove the streaming cursor: {e}")
+        await self.reply_to.reply_text(text, reply_markup=reply_markup)
+
+    async def _attach_markup(self, reply_markup: Optional[InlineKeyboardMarkup]):
+        if reply_markup is None:
+            return
+        try:
+            await self.sent.edit_reply_markup(reply_markup=reply_markup)
+        except TelegramError as e:
+            logger.warning(f"Attaching the keyboard to the streamed reply failed: {e}")
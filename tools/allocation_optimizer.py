@@ -0,0 +1,185 @@
+import re
+import numpy as np
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from tools.portfolio_risk import basket_risk
+
+# Annualized volatility targets per risk profile
+TARGET_VOLATILITY = {"low": 0.06, "medium": 0.12, "high": 0.20}
+
+# Long-only caps per asset so no single holding dominates; five stocks or three funds must fill the portfolio
+STOCK_WEIGHT_CAP = 0.30
+FUND_WEIGHT_CAP = 0.35
+
+# Proxy risk for assets without price history (mutual funds, or stocks when offline)
+FUND_VOLATILITY = {"very low": 0.01, "low": 0.04, "medium": 0.14, "high": 0.22}
+PROXY_STOCK_VOLATILITY = 0.25
+PROXY_STOCK_CORRELATION = 0.5
+EQUITY_FUND_CORRELATION = 0.85
+EQUITY_FUND_TO_STOCK_CORRELATION = 0.7
+DEBT_CORRELATION = 0.1
+EQUITY_EXPECTED_RETURN = 0.13
+
+PG_MAX_ITERATIONS = 500
+PG_TOLERANCE = 1e-9
+
+_universe_cache: Dict[Tuple[str, Optional[str], str], Dict[str, Any]] = {}
+
+def project_capped_simplex(v: np.ndarray, caps: np.ndarray, iterations: int = 60, total: float = 1.0) -> np.ndarray:
+    """Euclidean projection of v onto {w : 0 <= w <= caps, sum(w) = total}, by bisection on the shift."""
+    lo, hi = v.min() - 1.0, v.max()
+    for _ in range(iterations):
+        tau = (lo + hi) / 2
+        if np.clip(v - tau, 0.0, caps).sum() > total:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(v - (lo + hi) / 2, 0.0, caps)
+
+def min_variance_weights(cov: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """Long-only, capped minimum-variance weights via projected gradient descent."""
+    n = len(cov)
+    step = 1.0 / (2.0 * np.linalg.eigvalsh(cov)[-1])
+    w = project_capped_simplex(np.full(n, 1.0 / n), caps)
+    for _ in range(PG_MAX_ITERATIONS):
+        w_next = project_capped_simplex(w - step * 2.0 * cov @ w, caps)
+        if np.abs(w_next - w).max() < PG_TOLERANCE:
+            return w_next
+        w = w_next
+    return w
+
+def max_return_weights(expected_returns: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """Fill the highest expected returns up to their caps until fully invested."""
+    w = np.zeros(len(expected_returns))
+    order = np.argsort(-expected_returns)
+    remaining = 1.0
+    for i in order:
+        w[i] = min(caps[i], remaining)
+        remaining -= w[i]
+        if remaining <= 0:
+            break
+    return w
+
+def target_volatility_weights(cov: np.ndarray, expected_returns: np.ndarray, caps: np.ndarray,
+                              target_vol: float) -> np.ndarray:
+    """
+    Highest-return mix of the minimum-variance and maximum-return portfolios whose
+    volatility does not exceed the target. When even the minimum-variance portfolio is
+    above the target, that portfolio is returned and the caller reports the miss.
+
+    Both endpoints satisfy the long-only and cap constraints, so every blend does too, and portfolio variance along the blend is a quadratic in the blend factor
+    that can be solved in closed form.
+    """
+    w_mv = min_variance_weights(cov, caps)
+    w_mr = max_return_weights(expected_returns, caps)
+    target_var = target_vol ** 2
+    if w_mv @ cov @ w_mv >= target_var:
+        return w_mv
+    if w_mr @ cov @ w_mr <= target_var:
+        return w_mr
+
+    d = w_mr - w_mv
+    a, b, c = d @ cov @ d, 2 * (w_mv @ cov @ d), w_mv @ cov @ w_mv - target_var
+    if a <= 1e-12:
+        alpha = -c / b if b else 0.0
+    else:
+        alpha = (-b + np.sqrt(max(b * b - 4 * a * c, 0.0))) / (2 * a)
+    return w_mv + float(np.clip(alpha, 0.0, 1.0)) * d
+
+def _parse_return_range(text: str) -> float:
+    """Midpoint of a range like '10-12%' as a fraction."""
+    numbers = [float(n) for n in re.findall(r'\d+(?:\.\d+)?', text or "")]
+    return sum(numbers) / len(numbers) / 100 if numbers else EQUITY_EXPECTED_RETURN
+
+def build_universe(stocks: List[Dict], funds: List[Dict], as_of: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Covariance, expected returns and caps for recommended stocks and funds.
+
+    The stock block comes from measured return history when available; funds and
+    stocks without history use proxy volatilities by risk label.
+    """
+    n_s, n_f = len(stocks), len(funds)
+    tickers = [s['ticker'] for s in stocks]
+    fund_vol = np.array([FUND_VOLATILITY.get(f['risk'].lower(), 0.14) for f in funds])
+    fund_is_equity = fund_vol >= FUND_VOLATILITY["medium"]
+
+    stock_cov = None
+    measured = not tickers
+    if tickers:
+        risk = basket_risk(tickers, as_of=as_of)
+        if "error" not in risk and not risk["missing"]:
+            stock_cov = risk["covariance"].loc[tickers, tickers].to_numpy()
+            measured = True
+    if stock_cov is None:
+        corr = np.full((n_s, n_s), PROXY_STOCK_CORRELATION)
+        np.fill_diagonal(corr, 1.0)
+        stock_cov = corr * PROXY_STOCK_VOLATILITY ** 2
+    stock_vol = np.sqrt(np.diag(stock_cov))
+
+    both_equity = np.outer(fund_is_equity, fund_is_equity)
+    fund_corr = np.where(both_equity, EQUITY_FUND_CORRELATION, DEBT_CORRELATION)
+    np.fill_diagonal(fund_corr, 1.0)
+    cross_corr = np.where(fund_is_equity, EQUITY_FUND_TO_STOCK_CORRELATION, DEBT_CORRELATION)[None, :]
+
+    cov = np.zeros((n_s + n_f, n_s + n_f))
+    cov[:n_s, :n_s] = stock_cov
+    cov[n_s:, n_s:] = fund_corr * np.outer(fund_vol, fund_vol)
+    cov[:n_s, n_s:] = cross_corr * np.outer(stock_vol, fund_vol)
+    cov[n_s:, :n_s] = cov[:n_s, n_s:].T
+
+    return {
+        "labels": [f"{s['name']} ({s['ticker']})" for s in stocks] + [f['name'] for f in funds],
+        "covariance": cov,
+        "expected_returns": np.concatenate([
+            np.full(n_s, EQUITY_EXPECTED_RETURN),
+            [_parse_return_range(f.get('returns', '')) for f in funds],
+        ]),
+        "caps": np.concatenate([np.full(n_s, STOCK_WEIGHT_CAP), np.full(n_f, FUND_WEIGHT_CAP)]),
+        # False when the stock block fell back to proxy risk (no price history, or offline)
+        "measured": measured,
+    }
+
+def optimize_allocation(risk_level: str, stocks: List[Dict], funds: List[Dict],
+                        amount: float, investment_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Split an investment amount across the recommended holdings of the requested type.
+
+    A "stock" request only uses the stocks and a mutual fund request only the funds; with
+    no type both are mixed. The universe and its solved weights are cached per risk level,
+    type and day when built from measured price history, so a repeat request only scales
+    the weights by the amount.
+    """
+    if investment_type == "stock":
+        funds = []
+    elif investment_type in ("mutual_fund", "mutualfund"):
+        stocks = []
+    key = (risk_level, investment_type, date.today().isoformat())
+    universe = _universe_cache.get(key)
+    if universe is None:
+        universe = build_universe(stocks, funds, as_of=key[2])
+        cov, mu, caps = universe["covariance"], universe["expected_returns"], universe["caps"]
+        if caps.sum() < 1.0:
+            return {"error": "Per-asset caps are too tight to invest the full amount."}
+        universe["weights"] = target_volatility_weights(cov, mu, caps, TARGET_VOLATILITY[risk_level])
+        for stale in [k for k in _universe_cache if k[2] != key[2]]:
+            del _universe_cache[stale]
+        # Proxy-built universes are not kept, so a failed price fetch is retried next request
+        if universe["measured"]:
+            _universe_cache[key] = universe
+
+    cov, mu, weights = universe["covariance"], universe["expected_returns"], universe["weights"]
+    target = TARGET_VOLATILITY[risk_level]
+    volatility = float(np.sqrt(weights @ cov @ weights))
+
+    allocations = [
+        {"name": label, "weight": float(w), "amount": round(float(w) * amount, 2)}
+        for label, w in zip(universe["labels"], weights) if w > 1e-4
+    ]
+    allocations.sort(key=lambda a: a["weight"], reverse=True)
+    return {
+        "allocations": allocations,
+        "expected_volatility": volatility,
+        "expected_return": float(weights @ mu),
+        "target_volatility": target,
+        "target_met": volatility <= target + 1e-6,
+    }
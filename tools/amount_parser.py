@@ -0,0 +1,133 @@
+"""
+Money amounts and goal commands parsed out of chat messages and statement lines.
+
+One precompiled pattern scans the text in a single pass and understands the ways
+people here write money: "₹25,000", "Rs. 1,00,000", "25k", "2.5 lakh", "2.5L",
+"1 cr", "3 hazaar" and Devanagari digits/units ("५०० रुपये", "२ लाख"). Numbers that
+are part of words, percentages or other numbers are skipped.
+"""
+import re
+from typing import List, NamedTuple, Optional
+
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+_DEVANAGARI_DIGIT_RE = re.compile("[०-९]")
+
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3, "hazar": 1e3, "hazaar": 1e3, "हजार": 1e3, "हज़ार": 1e3,
+    "l": 1e5, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5, "लाख": 1e5,
+    "cr": 1e7, "crore": 1e7, "crores": 1e7, "करोड़": 1e7, "करोड": 1e7,
+    "mn": 1e6, "million": 1e6,
+}
+_CURRENCIES = {"₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR", "rupee": "INR", "rupees": "INR",
+               "रुपये": "INR", "रुपए": "INR", "रु": "INR", "रु.": "INR", "/-": "INR",
+               "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD"}
+
+# Word multipliers may follow a space ("2.5 lakh"); the bare "l" only when attached ("2.5L")
+_AMOUNT_RE = re.compile(
+    r"(?<![\w.,/:])(?:(?P<pre>₹|\$|rs\.?|inr|usd|रु\.?)\s*)?"
+    r"(?P<num>\d+(?:,\d+)*(?:\.\d+)?)(?!\d|[.,/:]\d)"
+    r"(?:\s*(?P<unit>lakhs?|lacs?|crores?|cr|thousand|hazaa?r|million|mn|k|हज़ार|हजार|लाख|करोड़|करोड)|(?P<l>l))?"
+    r"(?!\s*%)"
+    r"(?:\s*(?P<post>rupees?|rs\.?|₹|/-|inr|dollars?|usd|रुपये|रुपए))?"
+    r"(?![a-z\u0900-\u097F])",
+    re.IGNORECASE,
+)
+_GOAL_CREATE_RE = re.compile(r"\b(?:create|new|set|start)\s+(?:a\s+)?(?:new\s+)?goal\b\s*(?:called|named|for|:)?\s*(?P<rest>.*)",
+                             re.IGNORECASE | re.DOTALL)
+_GOAL_ALLOCATE_RE = re.compile(r"\b(?:allocate|add|put|transfer)\s+(?P<rest>.*)", re.IGNORECASE | re.DOTALL)
+_GOAL_NAME_AFTER_AMOUNT_RE = re.compile(r"^\s*(?:to|for|in|into|towards)\s+(?:my\s+|the\s+)?(?:goal\s+)?(?P<name>.+?)\s*[.!?]*$",
+                                        re.IGNORECASE | re.DOTALL)
+# The target is the amount right after one of these ("Trip to Goa 2025 with target 50000")
+_GOAL_TARGET_CUE_RE = re.compile(r"\b(?:target|of|worth)(?:\s+amount)?\s*(?:is\s+|[:=-]\s*)?$", re.IGNORECASE)
+# Filler words left around a goal name once the amount is cut out ("... with target", "of ... for a")
+_GOAL_NAME_FILLER = {"with", "of", "for", "worth", "target", "amount", "at", "to", "a", "an", "my", "the", ":", "-"}
+
+class Amount(NamedTuple):
+    value: float
+    currency: str  # "INR" unless the text says otherwise
+    explicit_currency: bool  # A symbol or word such as ₹, Rs or rupees was present
+    start: int
+    end: int
+
+class GoalCommand(NamedTuple):
+    action: str  # 'create' or 'allocate'
+    goal_name: Optional[str]
+    amount: Optional[float]
+    currency: str = "INR"
+
+def _to_amount(m: "re.Match") -> Amount:
+    value = float(m.group("num").replace(",", ""))
+    unit = m.group("unit") or m.group("l")
+    if unit:
+        value *= MULTIPLIERS[unit.lower()]
+    marker = m.group("pre") or m.group("post")
+    currency = _CURRENCIES.get(marker.lower(), "INR") if marker else "INR"
+    return Amount(value, currency, marker is not None, m.start(), m.end())
+
+def _ascii_digits(text: str) -> str:
+    # translate() is slow, so only pay for it when there is something to translate.
+    # It maps one char to one char, so match offsets still line up with ``text``.
+    return text.translate(_DEVANAGARI_DIGITS) if _DEVANAGARI_DIGIT_RE.search(text) else text
+
+def parse_amounts(text: str) -> List[Amount]:
+    """Every money amount in the text, left to right, with offsets into ``text``."""
+    return [_to_amount(m) for m in _AMOUNT_RE.finditer(_ascii_digits(text))]
+
+def first_money(text: str, minimum: float = None) -> Optional[Amount]:
+    """The first amount (at least ``minimum`` if given), with its currency, or None."""
+    if minimum is None:
+        m = _AMOUNT_RE.search(_ascii_digits(text))
+        return _to_amount(m) if m else None
+    for amount in parse_amounts(text):
+        if amount.value >= minimum:
+            return amount
+    return None
+
+def first_amount(text: str, minimum: float = None) -> Optional[float]:
+    """Value of the first amount (at least ``minimum`` if given), or None."""
+    amount = first_money(text, minimum)
+    return amount.value if amount else None
+
+def foreign_currency_reply(currency: str) -> str:
+    """Reply for an amount in a currency other than rupees, which the ledger can't store as such."""
+    return (f"💱 I keep your records in rupees, so I didn't save that {currency} amount. "
+            f"Please send it again in ₹ (e.g. 'Spent ₹4,000 on groceries').")
+
+def _clean_goal_name(name: str) -> Optional[str]:
+    words = name.strip(" \t\n\"'.,!?:-").split()
+    while words and words[0].lower() in _GOAL_NAME_FILLER:
+        words.pop(0)
+    while words and words[-1].lower().rstrip(":") in _GOAL_NAME_FILLER:
+        words.pop()
+    return " ".join(words).strip(" \"'.,!?:-") or None
+
+def parse_goal_command(text: str) -> Optional[GoalCommand]:
+    """
+    Goal creation ("Create goal Bike with target 80k", "new goal of 2 lakh for a bike")
+    or allocation ("Allocate ₹5,000 to Emergency Fund", "add 2k in bike fund").
+
+    :param text: The user's message.
+    :return: The parsed command, with None for parts the message didn't give; None if neither form matches.
+    """
+    match = _GOAL_CREATE_RE.search(text)
+    if match:
+        rest = match.group("rest")
+        amounts = parse_amounts(rest)
+        if not amounts:
+            return GoalCommand("create", _clean_goal_name(rest), None)
+        # Prefer the amount named as the target, so a year or number in the goal name isn't taken for it
+        amount = next((a for a in amounts if _GOAL_TARGET_CUE_RE.search(rest[:a.start])), amounts[0])
+        name = _clean_goal_name(rest[:amount.start]) or _clean_goal_name(rest[amount.end:])
+        return GoalCommand("create", name, amount.value, amount.currency)
+
+    match = _GOAL_ALLOCATE_RE.search(text)
+    if match:
+        rest = match.group("rest")
+        amounts = parse_amounts(rest)
+        if not amounts:
+            return GoalCommand("allocate", None, None)
+        amount = amounts[0]
+        name_match = _GOAL_NAME_AFTER_AMOUNT_RE.match(rest[amount.end:])
+        return GoalCommand("allocate", name_match.group("name").strip() if name_match else None, amount.value,
+                           amount.currency)
+    return None
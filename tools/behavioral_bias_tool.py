@@ -1,5 +1,9 @@
-import pandas as pd
-from typing import List, Dict, Any, Optional
+import re
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Union
+from tools.ledger import Ledger, as_ledger
+from tracing import traced
 
 # Constants
 MARKET_DOWNTURN_THRESHOLD = -3.0
@@ -7,90 +11,92 @@ FOMO_QUANTILE_THRESHOLD = 0.90
 CONCENTRATION_RATIO_THRESHOLD = 0.5
 CONCENTRATION_MIN_ASSETS = 5
 
-def analyze_user_activity(transactions: List[Dict[str, Any]], market_data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+SELL_PATTERN = re.compile(r"sell|sold", re.IGNORECASE)
+BUY_PATTERN = re.compile(r"buy|invest|purchase", re.IGNORECASE)
+ASSET_PATTERN = re.compile(r"stock|asset", re.IGNORECASE)
+
+@traced("dfg.analyze_user_activity")
+def analyze_user_activity(transactions: Union[Ledger, List[Dict[str, Any]]],
+                          market_data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """
     Analyzes user transactions to identify potential behavioral biases.
 
-    :param transactions: A list of transaction dictionaries.
+    :param transactions: The user's Ledger, or a list of transaction dictionaries with signed amounts.
     :param market_data: A dictionary with market performance data (e.g., {'market_change_pct': -5.0}).
     :return: A list of detected biases.
     """
-    if not transactions:
+    ledger = as_ledger(transactions)
+    if not len(ledger):
         return []
 
-    df = pd.DataFrame(transactions)
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-    
+    # Descriptions repeat a lot (recurring bills, the same stock), so each pattern runs once per distinct one
+    descriptions, description_index = np.unique(ledger.description, return_inverse=True)
+
     detected_biases = []
 
-    detected_biases.extend(_detect_panic_selling(df, market_data))
-    detected_biases.extend(_detect_fomo_buying(df))
-    detected_biases.extend(_detect_concentration_risk(df))
+    detected_biases.extend(_detect_panic_selling(ledger, descriptions, description_index, market_data))
+    detected_biases.extend(_detect_fomo_buying(ledger, descriptions, description_index))
+    detected_biases.extend(_detect_concentration_risk(ledger, descriptions, description_index))
 
     return detected_biases
 
-def _detect_panic_selling(df: pd.DataFrame, market_data: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _matches(pattern: re.Pattern, descriptions: np.ndarray, description_index: np.ndarray) -> np.ndarray:
+    """Row mask of the descriptions ``pattern`` finds a match in."""
+    hits = np.fromiter((pattern.search(d) is not None for d in descriptions), dtype=bool, count=len(descriptions))
+    return hits[description_index]
+
+def _bias_records(ledger: Ledger, mask: np.ndarray, bias_type: str, descriptions: List[str]) -> List[Dict[str, Any]]:
+    """One bias record per masked row, timestamps and ids taken from the columns in one pass."""
+    timestamps = np.datetime_as_string(ledger.day[mask].astype("datetime64[s]"))
+    # Records without an id are stored as -1 in the Ledger
+    return [{"bias_type": bias_type, "event_timestamp": timestamp, "description": description,
+             "related_transaction_id": transaction_id if transaction_id != -1 else None}
+            for timestamp, description, transaction_id in zip(timestamps.tolist(), descriptions, ledger.ids[mask].tolist())]
+
+def _detect_panic_selling(ledger: Ledger, descriptions: np.ndarray, description_index: np.ndarray,
+                          market_data: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Detects panic selling during market downturns."""
-    biases = []
-    if market_data and market_data.get('market_change_pct', 0) < MARKET_DOWNTURN_THRESHOLD:
-        # Market is in a significant downturn
-        # Logic Change: Assuming selling an asset results in positive cash flow (income)
-        recent_sells = df[
-            (df['amount'] > 0) & # It's a sell/income
-            (df['description'].str.contains('sell|sold', case=False, na=False))
-        ]
-        if not recent_sells.empty:
-            for _, row in recent_sells.iterrows():
-                biases.append({
-                    "bias_type": "PANIC_SELLING",
-                    "event_timestamp": row['date'].isoformat() if 'date' in row else None,
-                    "description": f"Potential panic sell detected: Sold assets during a market downturn of {market_data['market_change_pct']}%.",
-                    "related_transaction_id": row.get('id')
-                })
-    return biases
-
-def _detect_fomo_buying(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    if not market_data or market_data.get('market_change_pct', 0) >= MARKET_DOWNTURN_THRESHOLD:
+        return []
+    # Market is in a significant downturn
+    # Logic Change: Assuming selling an asset results in positive cash flow (income)
+    recent_sells = (ledger.amount > 0) & _matches(SELL_PATTERN, descriptions, description_index)
+    message = (f"Potential panic sell detected: Sold assets during a market downturn of "
+               f"{market_data['market_change_pct']}%.")
+    return _bias_records(ledger, recent_sells, "PANIC_SELLING", [message] * int(recent_sells.sum()))
+
+def _detect_fomo_buying(ledger: Ledger, descriptions: np.ndarray, description_index: np.ndarray) -> List[Dict[str, Any]]:
     """Detects FOMO buying (large investments)."""
-    biases = []
     # This is a simplified version. A real implementation would need asset price history.
     # We'll simulate it by looking for large investment buys.
-    
+
     # Filter for spending (negative amounts)
-    spending_df = df[df['amount'] < 0]
-    
-    if spending_df.empty:
+    spending = ledger.amount < 0
+    if not spending.any():
         return []
 
-    investment_buys = spending_df[
-        (spending_df['description'].str.contains('buy|invest|purchase', case=False, na=False)) &
-        (spending_df['amount'].abs() > spending_df['amount'].abs().quantile(FOMO_QUANTILE_THRESHOLD)) # In the top 10% of transaction amounts
-    ]
-    
-    if not investment_buys.empty:
-        for _, row in investment_buys.iterrows():
-            biases.append({
-                "bias_type": "FOMO_BUYING",
-                "event_timestamp": row['date'].isoformat() if 'date' in row else None,
-                "description": f"Potential FOMO buy detected: Unusually large investment of {row['amount']}. Monitor if this was chasing high returns.",
-                "related_transaction_id": row.get('id')
-            })
-    return biases
-
-def _detect_concentration_risk(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    spent = np.abs(ledger.amount)
+    threshold = np.quantile(spent[spending], FOMO_QUANTILE_THRESHOLD)  # In the top 10% of transaction amounts
+    investment_buys = spending & (spent > threshold) & _matches(BUY_PATTERN, descriptions, description_index)
+    messages = [f"Potential FOMO buy detected: Unusually large investment of {amount}. "
+                f"Monitor if this was chasing high returns." for amount in ledger.amount[investment_buys].tolist()]
+    return _bias_records(ledger, investment_buys, "FOMO_BUYING", messages)
+
+def _detect_concentration_risk(ledger: Ledger, descriptions: np.ndarray,
+                               description_index: np.ndarray) -> List[Dict[str, Any]]:
     """Detects concentration risk in portfolio."""
-    biases = []
     # Analyze the user's portfolio if available (mocked here by transaction descriptions)
-    asset_counts = df[df['description'].str.contains('stock|asset', case=False, na=False)]['description'].value_counts()
-    total_assets = asset_counts.sum()
-    
-    if total_assets > 0:
-        most_common_asset_count = asset_counts.iloc[0]
-        if (most_common_asset_count / total_assets) > CONCENTRATION_RATIO_THRESHOLD and total_assets > CONCENTRATION_MIN_ASSETS: # More than 50% in one asset
-             biases.append({
-                "bias_type": "CONCENTRATION_RISK",
-                "event_timestamp": pd.Timestamp.now().isoformat(),
-                "description": f"Potential Concentration Risk: Over {int(CONCENTRATION_RATIO_THRESHOLD*100)}% of recent transactions are related to a single asset type.",
-                "related_transaction_id": None
-            })
-    return biases
\ No newline at end of file
+    asset_rows = _matches(ASSET_PATTERN, descriptions, description_index)
+    total_assets = int(asset_rows.sum())
+    if total_assets == 0:
+        return []
+
+    most_common_asset_count = np.bincount(description_index[asset_rows]).max()
+    if (most_common_asset_count / total_assets) > CONCENTRATION_RATIO_THRESHOLD and total_assets > CONCENTRATION_MIN_ASSETS: # More than 50% in one asset
+        return [{
+            "bias_type": "CONCENTRATION_RISK",
+            "event_timestamp": datetime.now().isoformat(),
+            "description": f"Potential Concentration Risk: Over {int(CONCENTRATION_RATIO_THRESHOLD*100)}% of recent transactions are related to a single asset type.",
+            "related_transaction_id": None
+        }]
+    return []
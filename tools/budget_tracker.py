@@ -0,0 +1,171 @@
+"""
+Running totals of spending against the latest dynamic budget.
+
+Every expense insert calls ``budget_tracker.record_expense`` before the
+commit. It adds the amount to the (user, month, bucket) row of
+``budget_totals`` with a single increment that returns the new total, and
+returns a warning when the needs or wants bucket has just crossed 80% or 100%
+of its allocation.
+
+SQLite holds the totals, so the Telegram bot and the web app, which run as
+separate processes, add to the same rows instead of overwriting each other.
+The caller's expense insert already holds the write lock, so the increment,
+the threshold check and the alert-level update all happen in that one
+transaction. A month's rows are seeded from that month's transactions the
+first time it is touched; each process only remembers which months it has
+already seen.
+"""
+import ast
+import json
+import re
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+BUCKETS = ("needs", "wants")
+ALERT_LEVELS = (0.8, 1.0)  # Fractions of a bucket's allocation, lowest first
+
+# Categories offered by the web dashboard; anything else is classified from its description
+NEEDS_CATEGORIES = frozenset({"Food & Dining", "Transportation", "Bills & Utilities", "Healthcare",
+                              "Education", "Rent"})
+WANTS_CATEGORIES = frozenset({"Shopping", "Entertainment"})
+NEEDS_PATTERN = re.compile(
+    r"\b(rent|grocer(?:y|ies)|kirana|vegetables?|milk|electricity|water|gas|bill|emi|loan|fees?|school|"
+    r"medicine|medical|doctor|hospital|pharmacy|petrol|diesel|fuel|bus|metro|train|insurance|किराया|किराने)",
+    re.IGNORECASE)
+
+TRACKER_MAX_ENTRIES = 20000
+
+PeriodKey = Tuple[int, str]
+
+def bucket_for(category: Optional[str], description: Optional[str] = None) -> str:
+    """'needs' or 'wants' for an expense; unrecognised spending counts as a want."""
+    if category in NEEDS_CATEGORIES:
+        return "needs"
+    if category in WANTS_CATEGORIES:
+        return "wants"
+    return "needs" if description and NEEDS_PATTERN.search(description) else "wants"
+
+def parse_budget(raw: str) -> Dict:
+    """A saved ``recommended_allocations_json`` value; older rows hold a Python repr instead of JSON."""
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        try:
+            return ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return {}
+
+class BudgetTracker:
+    """Per-user, per-month spending totals by budget bucket, with threshold alerts."""
+
+    def __init__(self, max_entries: int = TRACKER_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._seeded: "OrderedDict[PeriodKey, None]" = OrderedDict()  # Months known to have their rows
+        self._lock = threading.Lock()
+        self.counts = Counter()  # hit / seed
+
+    def _ensure_rows(self, c, telegram_id: int, period: str, exclude_id: Optional[int] = None):
+        """Create the month's bucket rows if no process has yet, from what is already logged."""
+        key = (telegram_id, period)
+        with self._lock:
+            if key in self._seeded:
+                self._seeded.move_to_end(key)
+                self.counts["hit"] += 1
+                return
+
+        spent = dict.fromkeys(BUCKETS, 0.0)
+        c.execute("""SELECT amount, category, description FROM transactions
+                     WHERE telegram_id=? AND type='expense' AND substr(date, 1, 7)=? AND id IS NOT ?""",
+                  (telegram_id, period, exclude_id))
+        for amount, category, description in c.fetchall():
+            spent[bucket_for(category, description)] += abs(amount or 0)
+        c.execute("""SELECT recommended_allocations_json FROM dynamic_budgets
+                     WHERE user_id=? ORDER BY created_at DESC LIMIT 1""", (telegram_id,))
+        row = c.fetchone()
+        budget = parse_budget(row[0]) if row else {}
+        now = datetime.now().isoformat()
+        # Past crossings were never announced; only warn about the next one.
+        # OR IGNORE: rows another process created first are already counting.
+        c.executemany("""INSERT OR IGNORE INTO budget_totals
+                         (user_id, budget_period, bucket, spent, allocation, alert_level, updated_at)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                      [(telegram_id, period, b, spent[b], budget.get(f"{b}_allocation"),
+                        _level(spent[b], budget.get(f"{b}_allocation")), now) for b in BUCKETS])
+        with self._lock:
+            self.counts["seed"] += 1
+            self._seeded[key] = None
+            while len(self._seeded) > self.max_entries:
+                self._seeded.popitem(last=False)
+
+    def record_expense(self, conn, telegram_id: int, amount: float, category: Optional[str] = None,
+                       description: Optional[str] = None, day: Optional[str] = None,
+                       transaction_id: Optional[int] = None) -> Optional[str]:
+        """
+        Add an expense to its bucket's running total. Call it after the expense insert; the caller commits.
+
+        :param conn: SQLite connection the expense was inserted on.
+        :param telegram_id: The user.
+        :param amount: Expense amount (stored positive).
+        :param category: Transaction category.
+        :param description: Transaction description, used when the category says nothing.
+        :param day: ISO date of the expense; defaults to today.
+        :param transaction_id: Id of the row just inserted, so seeding a new month does not count it twice.
+        :return: A warning when the bucket crossed an alert level, else None.
+        """
+        period = (day or date.today().isoformat())[:7]
+        bucket = bucket_for(category, description)
+        c = conn.cursor()
+        self._ensure_rows(c, telegram_id, period, transaction_id)
+        now = datetime.now().isoformat()
+        c.execute("""INSERT INTO budget_totals (user_id, budget_period, bucket, spent, alert_level, updated_at)
+                     VALUES (?, ?, ?, ?, 0, ?)
+                     ON CONFLICT(user_id, budget_period, bucket)
+                     DO UPDATE SET spent = spent + excluded.spent, updated_at = excluded.updated_at
+                     RETURNING spent, allocation, alert_level""",
+                  (telegram_id, period, bucket, abs(amount), now))
+        spent, allocation, alerted = c.fetchone()
+        level = _level(spent, allocation)
+        if level <= (alerted or 0.0):
+            return None
+        c.execute("""UPDATE budget_totals SET alert_level=?
+                     WHERE user_id=? AND budget_period=? AND bucket=?""", (level, telegram_id, period, bucket))
+        if level >= 1.0:
+            return (f"🚨 You've used {spent / allocation:.0%} of your {bucket} budget this month "
+                    f"(₹{spent:,.0f} of ₹{allocation:,.0f}).")
+        return (f"⚠️ Heads up: {spent / allocation:.0%} of your {bucket} budget is spent "
+                f"(₹{spent:,.0f} of ₹{allocation:,.0f}). ₹{allocation - spent:,.0f} left this month.")
+
+    def set_allocations(self, conn, telegram_id: int, budget: Dict, period: Optional[str] = None):
+        """
+        Point the month's buckets at a newly generated budget. Call it after the budget insert; the caller commits.
+
+        Alerts restart from the new allocations, so a bigger budget can warn again later.
+        """
+        period = period or date.today().isoformat()[:7]
+        c = conn.cursor()
+        self._ensure_rows(c, telegram_id, period)
+        now = datetime.now().isoformat()
+        for bucket in BUCKETS:
+            allocation = budget.get(f"{bucket}_allocation")
+            c.execute("""UPDATE budget_totals SET allocation=?, updated_at=?
+                         WHERE user_id=? AND budget_period=? AND bucket=?
+                         RETURNING spent""", (allocation, now, telegram_id, period, bucket))
+            row = c.fetchone()
+            c.execute("""UPDATE budget_totals SET alert_level=?
+                         WHERE user_id=? AND budget_period=? AND bucket=?""",
+                      (_level(row[0] if row else 0.0, allocation), telegram_id, period, bucket))
+
+def _level(spent: float, allocation: Optional[float]) -> float:
+    """Highest alert level ``spent`` has reached, 0.0 for none (or no allocation)."""
+    if not allocation or allocation <= 0:
+        return 0.0
+    reached = 0.0
+    for level in ALERT_LEVELS:
+        if spent >= allocation * level:
+            reached = level
+    return reached
+
+# Create instance
+budget_tracker = BudgetTracker()
@@ -1,59 +1,131 @@
+import hashlib
+from datetime import timedelta
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from statsmodels.tsa.arima.model import ARIMA
 import warnings
+from tools.fast_forecast import FORECASTERS, select_model, simulate_net_cash_flow
+from tools.ledger import Ledger, as_ledger
+from tools.recurring_streams import expected_flows, recurring_streams, stream_members
+from tracing import traced
+import config
 
 # Suppress warnings from statsmodels
 warnings.filterwarnings("ignore")
 
-def predict_cash_flow(transactions: List[Dict[str, Any]], time_horizon_days: int = 30) -> Dict[str, Any]:
+ARIMA_ORDER = (1, 1, 1)
+ARIMA_FIT_SECONDS = 0.04  # Typical ARIMA(1,1,1) fit on a few months of days, before one has been timed
+FIT_CACHE_MAX_ENTRIES = 20000  # Two entries (income, expense) per user
+FORECAST_CACHE_MAX_ENTRIES = 20000
+
+class _FitCacheEntry:
+    """Fitted ARIMA parameters for one user's series and the data they were last applied to."""
+    __slots__ = ("series_hash", "start", "values", "params", "fitted_through", "forecasts")
+
+    def __init__(self, series: pd.Series, params: np.ndarray, fitted_through: pd.Timestamp):
+        self.series_hash = _series_hash(series)
+        self.start = series.index[0]
+        self.values = series.to_numpy(dtype=float)
+        self.params = params
+        self.fitted_through = fitted_through
+        self.forecasts: Dict[int, float] = {}
+
+_fit_cache: "OrderedDict[Tuple[Any, str], _FitCacheEntry]" = OrderedDict()
+# Chosen model and total per (series hash, steps, ARIMA on), so an identical series skips the backtest too
+_forecast_cache: "OrderedDict[Tuple[str, int, bool], Tuple[float, str]]" = OrderedDict()
+_fit_cache_lock = threading.Lock()
+fit_cache_counts = Counter()  # forecast_hit / hit / append / refit / fit
+
+@traced("dfg.predict_cash_flow")
+def predict_cash_flow(transactions: Union[Ledger, List[Dict[str, Any]]], time_horizon_days: int = 30,
+                      user_id: Optional[int] = None, simulations: Optional[int] = None) -> Dict[str, Any]:
     """
-    Predicts future cash flow based on historical transactions using ARIMA with a fallback to robust averaging.
+    Predicts future cash flow based on historical transactions. Recurring streams are placed on their
+    expected dates; the rest is forecast with the best backtesting model, with a fallback to robust averaging.
 
-    :param transactions: A list of transaction dictionaries, each with 'date' and 'amount'.
+    :param transactions: The user's Ledger, or a list of transaction dictionaries with 'date' and signed 'amount'.
     :param time_horizon_days: The number of days into the future to predict.
+    :param user_id: When given, fitted models and detected streams are cached for this user and reused on later calls.
+    :param simulations: Bootstrap paths whose percentiles and downside risk are added under
+        "simulation"; defaults to FORECAST_SIMULATIONS, 0 skips the simulation.
     :return: A dictionary with predicted income, expenses, and volatility score.
     """
-    if not transactions:
+    currency = 'INR'
+    if not isinstance(transactions, Ledger):
+        if not transactions or 'date' not in transactions[0]:
+            return _create_empty_prediction()
+        currency = transactions[0].get('currency', 'USD')
+    # Goal allocations move money into savings; they are neither income nor spending
+    ledger = as_ledger(transactions)
+    ledger = ledger.select(ledger.is_cash_flow)
+    if not len(ledger):
         return _create_empty_prediction()
+    days, amounts = ledger.day, ledger.amount
 
-    df = pd.DataFrame(transactions)
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-    else:
-        return _create_empty_prediction()
+    # Recurring streams (paydays, rent, weekly payouts) are placed on their expected dates;
+    # only the remaining transactions are forecast as daily series
+    streams = recurring_streams(days, amounts, user_id)
+    recurring = stream_members(days, amounts, streams) if streams else np.zeros(len(days), dtype=bool)
+    horizon_start = days[-1].astype(object) + timedelta(days=1)
+    flows = expected_flows(streams, horizon_start, time_horizon_days)
+    recurring_income = sum(f['amount'] for f in flows if f['kind'] == 'income')
+    recurring_expenses = sum(f['amount'] for f in flows if f['kind'] == 'expense')
 
-    currency = transactions[0].get('currency', 'USD')
-    
-    # Prepare daily series for ARIMA
-    df_daily = df.set_index('date')
-    income_series = df_daily[df_daily['amount'] > 0]['amount'].resample('D').sum().fillna(0)
-    expense_series = df_daily[df_daily['amount'] < 0]['amount'].abs().resample('D').sum().fillna(0)
+    # Prepare daily series for forecasting
+    residual_income = ~recurring & (amounts > 0)
+    residual_expense = ~recurring & (amounts < 0)
+    income_series = _daily_series(days[residual_income], amounts[residual_income])
+    expense_series = _daily_series(days[residual_expense], -amounts[residual_expense])
+
+    # Calculate predictions with the best backtesting model, or fallback
+    predicted_income, income_model = _predict_series(income_series, time_horizon_days,
+                                                     (user_id, 'income') if user_id is not None else None)
+    predicted_expenses, expense_model = _predict_series(expense_series, time_horizon_days,
+                                                        (user_id, 'expense') if user_id is not None else None)
 
-    # Calculate predictions using ARIMA or fallback
-    predicted_income = _predict_with_arima(income_series, time_horizon_days)
-    predicted_expenses = _predict_with_arima(expense_series, time_horizon_days)
+    # Everything on that side is recurring: nothing else to forecast
+    if predicted_income is None and income_series.empty and (amounts > 0).any():
+        predicted_income, income_model = 0.0, None
+    if predicted_expenses is None and expense_series.empty and (amounts < 0).any():
+        predicted_expenses, expense_model = 0.0, None
 
-    # Fallback if ARIMA fails or returns None (e.g. not enough data)
+    # Fallback if forecasting fails or returns None (e.g. no data)
     if predicted_income is None or predicted_expenses is None:
-        days_in_data = _calculate_days_in_data(df)
-        total_income, total_expenses = _calculate_totals(df)
+        days_in_data = _calculate_days_in_data(days)
+        total_income, total_expenses = _calculate_totals(amounts[~recurring])
         fallback_income, fallback_expenses = _calculate_average_predictions(
             total_income, total_expenses, days_in_data, time_horizon_days
         )
         predicted_income = predicted_income if predicted_income is not None else fallback_income
         predicted_expenses = predicted_expenses if predicted_expenses is not None else fallback_expenses
-    
+
+    predicted_income += recurring_income
+    predicted_expenses += recurring_expenses
     net_cash_flow = predicted_income - predicted_expenses
-    volatility_score = _calculate_volatility(df)
+    net_series = _daily_series(days, amounts)
+    # Daily gross flow, not net: with signed amounts the net mean sits near zero and the ratio blows up.
+    # Stored amounts were always positive, so this keeps the scale the DFG replies describe.
+    volatility_score = _calculate_volatility(_daily_series(days, np.abs(amounts)))
 
-    return {
-        "predicted_income": round(predicted_income, 2),
-        "predicted_expenses": round(predicted_expenses, 2),
-        "net_cash_flow": round(net_cash_flow, 2),
-        "volatility_score": round(volatility_score, 2),
-        "currency": currency
+    prediction = {
+        "predicted_income": round(float(predicted_income), 2),
+        "predicted_expenses": round(float(predicted_expenses), 2),
+        "net_cash_flow": round(float(net_cash_flow), 2),
+        "volatility_score": round(float(volatility_score), 2),
+        "currency": currency,
+        "forecast_models": {"income": income_model, "expenses": expense_model},
+        "recurring_streams": [stream.to_dict(horizon_start - timedelta(days=1)) for stream in streams],
+        "expected_flows": flows
     }
+    simulations = config.FORECAST_SIMULATIONS if simulations is None else simulations
+    if simulations > 0:
+        # Paths start from the net of the history window, the same baseline the DFG chart uses
+        prediction["simulation"] = simulate_net_cash_flow(net_series.to_numpy(), time_horizon_days, simulations,
+                                                          starting_balance=float(net_series.sum()), seed=user_id)
+    return prediction
 
 def _create_empty_prediction() -> Dict[str, Any]:
     """Creates a default empty prediction dictionary."""
@@ -65,17 +137,24 @@ def _create_empty_prediction() -> Dict[str, Any]:
         "currency": "USD"
     }
 
-def _calculate_days_in_data(df: pd.DataFrame) -> int:
+def _daily_series(days: np.ndarray, values: np.ndarray) -> pd.Series:
+    """Daily sums from the first to the last day present, zero on days without transactions."""
+    if len(days) == 0:
+        return pd.Series(dtype=float)
+    offsets = (days - days.min()).astype(np.int64)
+    totals = np.bincount(offsets, weights=values)
+    return pd.Series(totals, index=pd.date_range(pd.Timestamp(days.min()), periods=len(totals), freq='D'))
+
+def _calculate_days_in_data(days: np.ndarray) -> int:
     """Calculates the number of days spanned by the data."""
-    if df.empty:
+    if len(days) == 0:
         return 1
-    days = (df['date'].max() - df['date'].min()).days
-    return days + 1 # Inclusive of the start and end day
+    return int((days.max() - days.min()).astype(np.int64)) + 1 # Inclusive of the start and end day
 
-def _calculate_totals(df: pd.DataFrame) -> Tuple[float, float]:
+def _calculate_totals(amounts: np.ndarray) -> Tuple[float, float]:
     """Calculates total income and expenses."""
-    total_income = df[df['amount'] > 0]['amount'].sum()
-    total_expenses = df[df['amount'] < 0]['amount'].abs().sum()
+    total_income = amounts[amounts > 0].sum()
+    total_expenses = -amounts[amounts < 0].sum()
     return float(total_income), float(total_expenses)
 
 def _calculate_average_predictions(total_income: float, total_expenses: float, days_in_data: int, time_horizon_days: int) -> Tuple[float, float]:
@@ -87,36 +166,129 @@ def _calculate_average_predictions(total_income: float, total_expenses: float, d
     predicted_expenses = avg_daily_expenses * time_horizon_days
     return predicted_income, predicted_expenses
 
-def _predict_with_arima(series: pd.Series, steps: int) -> Optional[float]:
+def _series_hash(series: pd.Series) -> str:
+    digest = hashlib.sha1(series.to_numpy(dtype=float).tobytes())
+    digest.update(str(series.index[0]).encode())
+    return digest.hexdigest()
+
+def _extends(entry: _FitCacheEntry, series: pd.Series) -> bool:
+    """
+    True if ``series`` is the cached series with new days appended. The cached last
+    day may since have changed (more transactions that day) and the window may have
+    rolled forward at the start; every other overlapping day must be unchanged.
+    """
+    old = pd.Series(entry.values, index=pd.date_range(entry.start, periods=len(entry.values), freq='D'))
+    if series.index[-1] < old.index[-1]:
+        return False
+    common = old.index[:-1].intersection(series.index)
+    return len(common) >= 10 and np.array_equal(old[common].to_numpy(), series[common].to_numpy(dtype=float))
+
+def _arima_daily_forecast(y: np.ndarray, steps: int) -> np.ndarray:
+    """Uncached ARIMA forecaster in the fast_forecast signature, used for backtesting."""
+    return np.asarray(ARIMA(y, order=ARIMA_ORDER).fit().forecast(steps=steps))
+
+def _predict_series(series: pd.Series, steps: int,
+                    cache_key: Optional[Tuple[Any, str]] = None) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Forecast total for one daily series and the model that produced it.
+
+    The NumPy forecasters are backtested within FORECAST_TIME_BUDGET_MS; ARIMA joins
+    them as a slow candidate only when FORECAST_USE_ARIMA is set, and its final fit
+    goes through the per-user fit cache. The result is memoized by series hash, so
+    an identical request returns before any backtesting.
+    """
+    if series.empty:
+        return None, None
+    key = (_series_hash(series), steps, config.FORECAST_USE_ARIMA)
+    with _fit_cache_lock:
+        cached = _forecast_cache.get(key)
+        if cached is not None:
+            _forecast_cache.move_to_end(key)
+    if cached is not None:
+        fit_cache_counts["forecast_hit"] += 1
+        return cached
+
+    y = series.to_numpy(dtype=float)
+    extra = {"arima": _arima_daily_forecast} if config.FORECAST_USE_ARIMA else None
+    try:
+        model, _ = select_model(y, steps, config.FORECAST_TIME_BUDGET_MS / 1000, extra, {"arima": ARIMA_FIT_SECONDS})
+    except Exception:
+        return None, None
+    prediction = None
+    if model == "arima":
+        prediction = _predict_with_arima(series, steps, cache_key)
+        if prediction is None:
+            model = "ses"
+    if prediction is None:
+        prediction = max(0.0, float(FORECASTERS[model](y, steps).sum()))
+
+    with _fit_cache_lock:
+        _forecast_cache[key] = (prediction, model)
+        while len(_forecast_cache) > FORECAST_CACHE_MAX_ENTRIES:
+            _forecast_cache.popitem(last=False)
+    return prediction, model
+
+def _predict_with_arima(series: pd.Series, steps: int, cache_key: Optional[Tuple[Any, str]] = None) -> Optional[float]:
     """
     Predicts future sum using ARIMA model.
     Returns None if not enough data or model fails.
+
+    With a ``cache_key`` the fitted parameters are kept: an identical series returns
+    the stored forecast, and a series that only gained new days is run through the
+    Kalman filter with the cached parameters instead of being refitted. A full
+    refit happens once the cached fit is FORECAST_REFIT_DAYS old.
     """
     # Need at least a few data points for ARIMA
     if len(series) < 10:
         return None
+
+    entry = None
+    if cache_key is not None:
+        with _fit_cache_lock:
+            entry = _fit_cache.get(cache_key)
+            if entry is not None:
+                _fit_cache.move_to_end(cache_key)
+        if entry is not None and entry.series_hash == _series_hash(series) and steps in entry.forecasts:
+            fit_cache_counts["hit"] += 1
+            return entry.forecasts[steps]
         
     try:
         # Simple ARIMA(1,1,1) as a generic starting point
         # For production, auto_arima or grid search would be better but slower
-        model = ARIMA(series, order=(1, 1, 1))
-        model_fit = model.fit()
+        model = ARIMA(series, order=ARIMA_ORDER)
+        if entry is not None and _extends(entry, series) and \
+                (series.index[-1] - entry.fitted_through).days < config.FORECAST_REFIT_DAYS:
+            model_fit = model.filter(entry.params)
+            fitted_through = entry.fitted_through
+            fit_cache_counts["append"] += 1
+        else:
+            # Warm-start a refit from the previous parameters
+            model_fit = model.fit(start_params=entry.params if entry is not None else None)
+            fitted_through = series.index[-1]
+            fit_cache_counts["refit" if entry is not None else "fit"] += 1
         forecast = model_fit.forecast(steps=steps)
-        return max(0.0, float(forecast.sum())) # Ensure no negative predictions for income/expense sums
+        prediction = max(0.0, float(forecast.sum())) # Ensure no negative predictions for income/expense sums
     except Exception:
         return None
 
-def _calculate_volatility(df: pd.DataFrame) -> float:
-    """Calculates volatility score based on daily net flow."""
-    df_indexed = df.set_index('date')
-    daily_net_flow = df_indexed['amount'].resample('D').sum()
-    
-    mean_daily_flow = daily_net_flow.mean()
-    std_daily_flow = daily_net_flow.std()
+    if cache_key is not None:
+        new_entry = _FitCacheEntry(series, np.asarray(model_fit.params), fitted_through)
+        new_entry.forecasts[steps] = prediction
+        with _fit_cache_lock:
+            _fit_cache[cache_key] = new_entry
+            _fit_cache.move_to_end(cache_key)
+            while len(_fit_cache) > FIT_CACHE_MAX_ENTRIES:
+                _fit_cache.popitem(last=False)
+    return prediction
+
+def _calculate_volatility(daily_flow: pd.Series) -> float:
+    """Calculates volatility score (coefficient of variation) of a daily flow series."""
+    mean_daily_flow = daily_flow.mean()
+    std_daily_flow = daily_flow.std()
 
     if mean_daily_flow != 0:
         volatility_score = std_daily_flow / mean_daily_flow
     else:
         volatility_score = 0
         
-    return abs(volatility_score) if pd.notna(volatility_score) else 0.0
\ No newline at end of file
+    return abs(volatility_score) if pd.notna(volatility_score) else 0.0
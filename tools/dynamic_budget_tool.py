@@ -1,22 +1,93 @@
-def generate_dynamic_budget(cash_flow_prediction: dict, user_goals: dict = None) -> dict:
+from datetime import date
+from typing import Any, Dict, List, Optional, Union
+from tracing import traced
+
+DAYS_PER_MONTH = 30.44
+
+# Default budget allocation percentages (50/30/20 rule)
+DEFAULT_ALLOCATIONS = {"needs": 0.50, "wants": 0.30, "savings": 0.20}
+
+def load_active_goals(telegram_id: int, conn=None, today: date = None) -> List[Dict[str, Any]]:
+    """
+    The user's unfinished goals, earliest deadline first, in one query.
+
+    :param telegram_id: The user.
+    :param conn: SQLite connection; defaults to the shared ``db_conn``.
+    :param today: Date the months to each deadline are counted from.
+    :return: Dicts with goal_name, remaining, deadline (ISO date or None) and months_left.
+    """
+    if conn is None:
+        from database import db_conn as conn
+    today = today or date.today()
+    c = conn.cursor()
+    c.execute("""SELECT goal_name, target_amount - current_amount, deadline FROM goals
+                 WHERE telegram_id=? AND status='active' AND target_amount > current_amount
+                 ORDER BY deadline IS NULL, deadline""", (telegram_id,))
+    goals = []
+    for name, remaining, deadline in c.fetchall():
+        months_left = None
+        if deadline:
+            try:
+                days_left = (date.fromisoformat(str(deadline)[:10]) - today).days
+                # A goal due this month (or overdue) needs all of its remaining amount now
+                months_left = max(days_left / DAYS_PER_MONTH, 1.0)
+            except ValueError:
+                pass
+        goals.append({"goal_name": name, "remaining": float(remaining),
+                      "deadline": str(deadline)[:10] if deadline else None, "months_left": months_left})
+    return goals
+
+def plan_goal_savings(goals: List[Dict[str, Any]], capacity: float,
+                      default_months: float = 12.0) -> List[Dict[str, Any]]:
+    """
+    Split a month's savings capacity across goals, earliest deadline first.
+
+    Each goal needs its remaining amount spread evenly over the months to its
+    deadline. Goals are funded in deadline order until the capacity runs out, so
+    a shortfall lands on the goals with the most time to catch up.
+
+    :param goals: Output of ``load_active_goals``; goals without a deadline go last.
+    :param capacity: Amount available for goals this month.
+    :param default_months: Months assumed for goals without a deadline.
+    :return: Per-goal dicts with required_monthly, allocation, on_track and months_to_complete.
+    """
+    ordered = sorted(goals, key=lambda g: (g.get("months_left") is None, g.get("months_left") or 0))
+    left = max(capacity, 0.0)
+    plan = []
+    for goal in ordered:
+        months = goal.get("months_left") or default_months
+        required = goal["remaining"] / months
+        allocation = min(required, left)
+        left -= allocation
+        plan.append({
+            "goal_name": goal["goal_name"],
+            "deadline": goal.get("deadline"),
+            "remaining": round(goal["remaining"], 2),
+            "required_monthly": round(required, 2),
+            "allocation": round(allocation, 2),
+            "on_track": allocation >= required - 0.005,
+            # At this month's allocation; None when nothing is left for the goal
+            "months_to_complete": round(goal["remaining"] / allocation, 1) if allocation > 0 else None,
+        })
+    return plan
+
+@traced("dfg.generate_dynamic_budget")
+def generate_dynamic_budget(cash_flow_prediction: dict,
+                            user_goals: Union[List[Dict[str, Any]], Dict[str, float], None] = None) -> dict:
     """
     Generates a dynamic budget based on predicted cash flow.
 
     :param cash_flow_prediction: The output from the cash_flow_tool.
-    :param user_goals: A dictionary of user's financial goals (e.g., {'savings_goal': 500}).
-    :return: A dictionary with recommended budget allocations.
+    :param user_goals: Active goals from ``load_active_goals``, or a dictionary with a single
+        monthly ``savings_goal`` (e.g., {'savings_goal': 500}).
+    :return: A dictionary with recommended budget allocations, plus per-goal allocations when goals are given.
     """
     predicted_income = cash_flow_prediction.get("predicted_income", 0)
-    
+
     if predicted_income == 0:
         return {"error": "Cannot generate budget with zero predicted income."}
 
-    # Default budget allocation percentages (50/30/20 rule)
-    allocations = {
-        "needs": 0.50,
-        "wants": 0.30,
-        "savings": 0.20
-    }
+    allocations = dict(DEFAULT_ALLOCATIONS)
 
     # Adjust allocations based on volatility
     volatility_score = cash_flow_prediction.get("volatility_score", 0)
@@ -25,25 +96,45 @@ def generate_dynamic_budget(cash_flow_prediction: dict, user_goals: dict = None)
         allocations["savings"] += 0.10
         allocations["wants"] -= 0.10
 
-    # Prioritize user goals if provided
-    if user_goals and "savings_goal" in user_goals:
+    goals = user_goals if isinstance(user_goals, list) else []
+    required_savings = 0.0
+    if isinstance(user_goals, dict) and "savings_goal" in user_goals:
         required_savings = user_goals["savings_goal"]
-        if required_savings > predicted_income * allocations["savings"]:
-            # If goal is higher than allocated savings, try to pull from 'wants'
-            savings_percentage = required_savings / predicted_income
-            if savings_percentage <= (allocations["savings"] + allocations["wants"]):
-                allocations["savings"] = savings_percentage
-                allocations["wants"] = 1.0 - allocations["savings"] - allocations["needs"]
-            else:
-                # Goal is too aggressive for current income prediction
-                pass # For now, we don't change the 'needs' category
+
+    # Goals can take savings and, when needed, 'wants'; 'needs' is never cut
+    capacity = predicted_income * (allocations["savings"] + allocations["wants"])
+    goal_plan = plan_goal_savings(goals, capacity) if goals else []
+    if goal_plan:
+        required_savings = sum(g["allocation"] for g in goal_plan)
+
+    # Prioritize user goals if provided
+    if required_savings > predicted_income * allocations["savings"]:
+        # If goal is higher than allocated savings, try to pull from 'wants'
+        savings_percentage = required_savings / predicted_income
+        if savings_percentage <= (allocations["savings"] + allocations["wants"]):
+            allocations["savings"] = savings_percentage
+            allocations["wants"] = 1.0 - allocations["savings"] - allocations["needs"]
+        else:
+            # Goal is too aggressive for current income prediction
+            pass # For now, we don't change the 'needs' category
+
+    notes = "Based on the 50/30/20 rule, adjusted for income volatility."
+    if goal_plan:
+        behind = [g["goal_name"] for g in goal_plan if not g["on_track"]]
+        if behind:
+            notes += f" Savings can't cover every goal deadline; behind: {', '.join(behind)}."
+        else:
+            notes += " Savings cover every goal's deadline."
 
     recommended_budget = {
         "needs_allocation": round(predicted_income * allocations["needs"], 2),
         "wants_allocation": round(predicted_income * allocations["wants"], 2),
         "savings_allocation": round(predicted_income * allocations["savings"], 2),
         "currency": cash_flow_prediction.get("currency", "USD"),
-        "notes": "Based on the 50/30/20 rule, adjusted for income volatility."
+        "notes": notes
     }
+    if goal_plan:
+        recommended_budget["goal_allocations"] = goal_plan
+        recommended_budget["goal_savings_needed"] = round(sum(g["required_monthly"] for g in goal_plan), 2)
 
-    return recommended_budget
\ No newline at end of file
+    return recommended_budget
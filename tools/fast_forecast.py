@@ -0,0 +1,193 @@
+"""
+Pure-NumPy daily forecasters and a backtest-driven model selector.
+
+Each forecaster maps a daily series (oldest first) to a per-day forecast for the
+next ``steps`` days in microseconds, so they can all be backtested on every
+request. ``select_model`` scores the candidates on rolling-origin holdouts by
+the error of the horizon total (what the DFG shows); slower candidates such as
+ARIMA can be added by the caller and are skipped when their expected cost does
+not fit in what is left of the time budget.
+
+``simulate_net_cash_flow`` adds a probabilistic view: a block bootstrap of the
+daily net series, run as one (simulations x horizon) array.
+"""
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+SES_ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.8)
+CROSTON_ALPHA = 0.1
+SEASON_DAYS = 7
+MIN_TRAIN_DAYS = 14
+BACKTEST_ORIGINS = 3
+SIMULATION_BLOCK_DAYS = 7  # Resampled blocks keep a week's payday/weekend pattern together
+FAN_PERCENTILES = (10, 50, 90)
+
+Forecaster = Callable[[np.ndarray, int], np.ndarray]
+
+# Last measured seconds per backtest fit of each extra candidate, by name
+_fit_seconds: Dict[str, float] = {}
+
+class ForecastResult(NamedTuple):
+    total: float  # Sum of the per-day forecast over the horizon, never negative
+    model: str
+    backtest_error: Optional[float]  # Mean scaled error of the chosen model; None if not backtested
+
+def mean_forecast(y: np.ndarray, steps: int) -> np.ndarray:
+    """Average daily value carried forward (the old averaging fallback)."""
+    return np.full(steps, y.mean() if len(y) else 0.0)
+
+def ses_forecast(y: np.ndarray, steps: int) -> np.ndarray:
+    """
+    Simple exponential smoothing, with alpha picked from SES_ALPHAS by in-sample
+    one-step-ahead squared error.
+    """
+    if len(y) == 0:
+        return np.zeros(steps)
+    # The recursion is sequential; on Python floats it is several times faster than per-element NumPy ops
+    values = y.tolist()
+    best_sse, best_level = None, values[0]
+    for alpha in SES_ALPHAS:
+        level, sse = values[0], 0.0
+        for value in values[1:]:
+            error = value - level
+            sse += error * error
+            level += alpha * error
+        if best_sse is None or sse < best_sse:
+            best_sse, best_level = sse, level
+    return np.full(steps, best_level)
+
+def croston_forecast(y: np.ndarray, steps: int, alpha: float = CROSTON_ALPHA) -> np.ndarray:
+    """
+    Croston's method (with the Syntetos-Boylan bias correction) for intermittent
+    series such as gig income: smooths payment sizes and the gaps between them
+    separately and forecasts their ratio per day.
+    """
+    nonzero = np.flatnonzero(y)
+    if len(nonzero) == 0:
+        return np.zeros(steps)
+    sizes = y[nonzero].tolist()
+    intervals = np.diff(nonzero, prepend=-1).tolist()
+    size, interval = sizes[0], float(intervals[0])
+    for s, p in zip(sizes[1:], intervals[1:]):
+        size += alpha * (s - size)
+        interval += alpha * (p - interval)
+    return np.full(steps, (1 - alpha / 2) * size / interval)
+
+def seasonal_naive_forecast(y: np.ndarray, steps: int, season: int = SEASON_DAYS) -> np.ndarray:
+    """Repeat the last full week (weekly pay cycles, weekend spending)."""
+    if len(y) < season:
+        return mean_forecast(y, steps)
+    return np.resize(y[-season:], steps)
+
+FORECASTERS: Dict[str, Forecaster] = {
+    "mean": mean_forecast,
+    "ses": ses_forecast,
+    "croston": croston_forecast,
+    "seasonal_naive": seasonal_naive_forecast,
+}
+
+def _backtest_error(forecaster: Forecaster, y: np.ndarray, horizon: int, origins: List[int]) -> float:
+    """Mean absolute error of the horizon total, scaled by the series' average total."""
+    scale = y.mean() * horizon
+    errors = [abs(forecaster(y[:o], horizon).sum() - y[o:o + horizon].sum()) for o in origins]
+    return float(np.mean(errors) / scale) if scale > 0 else float(np.mean(errors))
+
+def select_model(y, steps: int, budget_seconds: float = 0.02,
+                 extra_candidates: Dict[str, Forecaster] = None,
+                 expected_seconds: Dict[str, float] = None) -> Tuple[str, Optional[float]]:
+    """
+    Pick the candidate whose horizon totals backtest best.
+
+    :param y: Daily values, oldest first.
+    :param steps: Days to forecast.
+    :param budget_seconds: Time allowed for backtesting. The fast models always run;
+        an ``extra_candidates`` entry is skipped when its expected cost (one fit per
+        backtest origin) exceeds the budget left.
+    :param extra_candidates: Slower forecasters to consider after the NumPy ones.
+    :param expected_seconds: Seconds per fit of an extra candidate, used until one has been timed here.
+    :return: The chosen model's name and its backtest error (None when the series is too short to backtest).
+    """
+    start = time.perf_counter()
+    y = np.asarray(y, dtype=float)
+    if len(y) < MIN_TRAIN_DAYS + 2:
+        return "mean", None
+
+    # Rolling origins over the most recent data, each leaving a holdout of up to `steps` days
+    horizon = min(steps, len(y) - MIN_TRAIN_DAYS)
+    spacing = max(1, horizon // 2)
+    origins = list(range(len(y) - horizon, MIN_TRAIN_DAYS - 1, -spacing))[:BACKTEST_ORIGINS]
+
+    scores: Dict[str, float] = {}
+    for name, forecaster in FORECASTERS.items():
+        try:
+            scores[name] = _backtest_error(forecaster, y, horizon, origins)
+        except Exception:
+            continue
+    for name, forecaster in (extra_candidates or {}).items():
+        per_fit = _fit_seconds.get(name, (expected_seconds or {}).get(name, 0.0))
+        if time.perf_counter() - start + per_fit * len(origins) > budget_seconds:
+            continue
+        fit_start = time.perf_counter()
+        try:
+            scores[name] = _backtest_error(forecaster, y, horizon, origins)
+        except Exception:
+            pass
+        _fit_seconds[name] = (time.perf_counter() - fit_start) / len(origins)
+    best = min(scores, key=scores.get)
+    return best, scores[best]
+
+def select_forecast(y, steps: int, budget_seconds: float = 0.02) -> ForecastResult:
+    """Forecast ``steps`` days with whichever NumPy model backtests best."""
+    y = np.asarray(y, dtype=float)
+    model, error = select_model(y, steps, budget_seconds)
+    total = float(FORECASTERS[model](y, steps).sum())
+    return ForecastResult(max(0.0, total), model, error)
+
+def simulate_net_cash_flow(net_daily, steps: int, simulations: int = 10000,
+                           block_days: int = SIMULATION_BLOCK_DAYS, starting_balance: float = 0.0,
+                           seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Monte Carlo net cash flow from a moving-block bootstrap of past days.
+
+    Every path strings together randomly chosen runs of ``block_days`` consecutive
+    historical days (income and expenses together, as one net value per day), so
+    lumpy paydays and their correlation with spending are kept. All paths are drawn
+    and accumulated at once as a (simulations x steps) array.
+
+    :param net_daily: Daily net amounts (income minus expenses), oldest first.
+    :param steps: Days to simulate.
+    :param simulations: Number of paths.
+    :param block_days: Length of each resampled block.
+    :param starting_balance: Balance the paths start from when checking for a negative balance.
+    :param seed: Seed for reproducible paths.
+    :return: P10/P50/P90 of the horizon's net cash flow, the probability that the balance goes
+        negative at some point, the expected shortfall (average lowest balance below zero over the
+        paths that go negative), and per-day P10/P50/P90 of the cumulative net for a fan chart.
+        All values are plain floats.
+    """
+    y = np.asarray(net_daily, dtype=float)
+    if len(y) == 0 or steps <= 0 or simulations <= 0:
+        return {}
+    block = max(1, min(block_days, len(y)))
+    rng = np.random.default_rng(seed)
+
+    n_blocks = -(-steps // block)
+    starts = rng.integers(0, len(y) - block + 1, size=(simulations, n_blocks))
+    days = (starts[:, :, None] + np.arange(block)).reshape(simulations, -1)[:, :steps]
+    cumulative = np.cumsum(y[days], axis=1)
+
+    lowest = starting_balance + cumulative.min(axis=1)
+    negative = lowest < 0
+    net = cumulative[:, -1]
+    p10, p50, p90 = np.percentile(net, FAN_PERCENTILES)
+    bands = np.percentile(cumulative, FAN_PERCENTILES, axis=0)
+    return {
+        "simulations": int(simulations),
+        "net_p10": round(float(p10), 2),
+        "net_p50": round(float(p50), 2),
+        "net_p90": round(float(p90), 2),
+        "prob_negative_balance": round(float(negative.mean()), 4),
+        "expected_shortfall": round(float(-lowest[negative].mean()), 2) if negative.any() else 0.0,
+        "fan": {f"p{q}": np.round(band, 2).tolist() for q, band in zip(FAN_PERCENTILES, bands)},
+    }
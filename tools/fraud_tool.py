@@ -1,6 +1,7 @@
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from database import chroma_client
+from tracing import traced
 
 class FraudInput(BaseModel):
     message: str = Field(description="Investment opportunity or message to check")
@@ -10,6 +11,7 @@ class FraudDetectorTool(BaseTool):
     description: str = "Detects if a message contains scam patterns using semantic similarity"
     args_schema: type[BaseModel] = FraudInput
     
+    @traced("tool.fraud_detector")
     def _run(self, message: str) -> str:
         """Detect fraud patterns in a message."""
         try:
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from database import db_conn
 from datetime import datetime, timedelta
 from typing import Optional
+from tracing import traced
 
 class GoalInput(BaseModel):
     telegram_id: int = Field(description="User's telegram ID")
@@ -17,6 +18,7 @@ class GoalManagementTool(BaseTool):
     description: str = "Manages financial goals - create, track, allocate funds, and monitor progress"
     args_schema: type[BaseModel] = GoalInput
     
+    @traced("tool.goal_manager")
     def _run(self, telegram_id: int, action: str, goal_name: str = None, 
              target_amount: float = None, deadline: str = None, 
              allocation_amount: float = None) -> str:
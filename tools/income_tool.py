@@ -1,8 +1,9 @@
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from database import db_conn
-import re
 from datetime import datetime
+from tools.amount_parser import first_money, foreign_currency_reply
+from tracing import traced
 
 class IncomeInput(BaseModel):
     telegram_id: int = Field(description="User's telegram ID")
@@ -13,14 +14,16 @@ class IncomeAnalyzerTool(BaseTool):
     description: str = "Analyzes income and suggests how much to save based on volatility"
     args_schema: type[BaseModel] = IncomeInput
     
+    @traced("tool.income_analyzer")
     def _run(self, telegram_id: int, message: str) -> str:
         """Analyze income and provide savings recommendations."""
         # Extract amount from message
-        amounts = re.findall(r'₹?\s*(\d+(?:,\d+)*(?:\.\d+)?)', message.replace(',', ''))
-        if not amounts:
-            return "I couldn't find an amount. Please tell me like: 'I earned ₹25000' or 'Got paid 25000'"
-        
-        amount = float(amounts[0])
+        money = first_money(message)
+        if money is None:
+            return "I couldn't find an amount. Please tell me like: 'I earned ₹25000' or 'Got paid 25k'"
+        if money.currency != "INR":
+            return foreign_currency_reply(money.currency)
+        amount = money.value
         
         # Get last 30 days income
         c = db_conn.cursor()
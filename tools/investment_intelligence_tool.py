@@ -1,12 +1,26 @@
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Dict, Any
+import numpy as np
 import yfinance as yf
 from datetime import datetime, timedelta
+from tools.scoring_rules import explain_score, score_bucket, score_fundamentals, fundamentals_from_info, average_growth, BUCKET_LABELS
+from tools.market_data import get_price_history, get_ticker_info, fetch_many
+from tracing import span, traced
+
+MAX_COMPARE_TICKERS = 5
+
+# Recommendation text per score bucket (see scoring_rules.BUCKET_LABELS)
+RECOMMENDATIONS = [
+    ("🔴 **AVOID/SELL**", "Not recommended at current levels", "High Risk"),
+    ("🟠 **HOLD**", "Wait for better entry point", "Medium to High Risk"),
+    ("🟡 **BUY/ACCUMULATE**", "Good for long-term investment", "Medium Risk"),
+    ("🟢 **STRONG BUY**", "Excellent opportunity to invest", "Low to Medium Risk"),
+]
 
 class InvestmentInput(BaseModel):
     query: str = Field(description="Investment query - stock ticker, mutual fund name, or sector")
-    analysis_type: str = Field(description="Type: stock_analysis, mutual_fund_analysis, sector_analysis, or top_performers")
+    analysis_type: str = Field(description="Type: stock_analysis, stock_comparison, mutual_fund_analysis, sector_analysis, or top_performers")
 
 class InvestmentIntelligenceTool(BaseTool):
     name: str = "investment_intelligence"
@@ -18,12 +32,14 @@ class InvestmentIntelligenceTool(BaseTool):
         try:
             # Try NSE first
             stock = yf.Ticker(f"{ticker}.NS")
-            info = stock.info
+            with span("http.yfinance.info"):
+                info = stock.info
             
             # If NSE fails, try BSE
             if not info or 'regularMarketPrice' not in info:
                 stock = yf.Ticker(f"{ticker}.BO")
-                info = stock.info
+                with span("http.yfinance.info"):
+                    info = stock.info
             
             if not info or 'regularMarketPrice' not in info:
                 return f"❌ Unable to fetch data for {ticker}. Please verify the ticker symbol."
@@ -59,7 +75,7 @@ class InvestmentIntelligenceTool(BaseTool):
             industry = info.get('industry', 'Unknown')
             
             # Get historical data for trend analysis
-            hist = stock.history(period="1y")
+            hist = get_price_history(stock.ticker, period="1y")
             if not hist.empty:
                 year_high = hist['High'].max()
                 year_low = hist['Low'].min()
@@ -69,83 +85,13 @@ class InvestmentIntelligenceTool(BaseTool):
                 year_high = year_low = current_price
                 price_from_high = price_from_low = 0
             
-            # Scoring system (out of 100)
-            score = 0
-            analysis_points = []
-            
-            # 1. Valuation (25 points)
-            if 0 < pe_ratio < 15:
-                score += 25
-                analysis_points.append("✅ Excellent valuation - Trading at attractive P/E")
-            elif 15 <= pe_ratio < 25:
-                score += 18
-                analysis_points.append("🟡 Fair valuation - Reasonably priced")
-            elif 25 <= pe_ratio < 35:
-                score += 10
-                analysis_points.append("⚠️ Slightly expensive - P/E above market average")
-            elif pe_ratio >= 35:
-                score += 0
-                analysis_points.append("🔴 Overvalued - Very high P/E ratio")
-            else:
-                analysis_points.append("⚠️ P/E data not available")
-            
-            # 2. Profitability (25 points)
-            if roe > 20:
-                score += 25
-                analysis_points.append("✅ Excellent profitability - ROE > 20%")
-            elif roe > 15:
-                score += 18
-                analysis_points.append("🟡 Good profitability - Healthy ROE")
-            elif roe > 10:
-                score += 10
-                analysis_points.append("⚠️ Moderate profitability - Average ROE")
-            else:
-                analysis_points.append("🔴 Weak profitability - Low ROE")
-            
-            # 3. Financial Health (25 points)
-            if debt_equity < 0.5:
-                score += 25
-                analysis_points.append("✅ Strong balance sheet - Very low debt")
-            elif debt_equity < 1.0:
-                score += 18
-                analysis_points.append("🟡 Healthy finances - Manageable debt")
-            elif debt_equity < 2.0:
-                score += 10
-                analysis_points.append("⚠️ Moderate debt levels - Monitor closely")
-            else:
-                analysis_points.append("🔴 High debt burden - Financial risk")
-            
-            # 4. Growth (25 points)
-            avg_growth = (revenue_growth + earnings_growth) / 2 if (revenue_growth and earnings_growth) else 0
-            if avg_growth > 20:
-                score += 25
-                analysis_points.append("✅ Strong growth momentum - Expanding rapidly")
-            elif avg_growth > 10:
-                score += 18
-                analysis_points.append("🟡 Steady growth - Consistent expansion")
-            elif avg_growth > 0:
-                score += 10
-                analysis_points.append("⚠️ Slow growth - Limited expansion")
-            else:
-                analysis_points.append("🔴 Declining growth - Concerning trend")
+            # Scoring system (out of 100), shared with the backtest harness
+            score, analysis_points = explain_score(
+                pe_ratio, roe, debt_equity, revenue_growth, earnings_growth
+            )
             
             # Generate recommendation
-            if score >= 80:
-                recommendation = "🟢 **STRONG BUY**"
-                action = "Excellent opportunity to invest"
-                risk_level = "Low to Medium Risk"
-            elif score >= 60:
-                recommendation = "🟡 **BUY/ACCUMULATE**"
-                action = "Good for long-term investment"
-                risk_level = "Medium Risk"
-            elif score >= 40:
-                recommendation = "🟠 **HOLD**"
-                action = "Wait for better entry point"
-                risk_level = "Medium to High Risk"
-            else:
-                recommendation = "🔴 **AVOID/SELL**"
-                action = "Not recommended at current levels"
-                risk_level = "High Risk"
+            recommendation, action, risk_level = RECOMMENDATIONS[int(score_bucket(score))]
             
             # Build comprehensive response
             analysis_date = datetime.now().strftime('%d %B %Y, %I:%M %p')
@@ -231,6 +177,75 @@ Analysis Date: {analysis_date}"""
         except Exception as e:
             return f"⚠️ Error analyzing stock: {str(e)}\n\nPlease verify the ticker symbol and try again."
     
+    def _fetch_comparison_data(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Quote, fundamentals and 1-year history for one ticker (runs on a worker thread)."""
+        symbol, info = get_ticker_info(ticker)
+        if not symbol:
+            return None
+        price = info.get('regularMarketPrice', info.get('currentPrice', 0)) or 0
+        hist = get_price_history(symbol, period="1y")
+        year_return = None
+        if not hist.empty and hist['Close'].iloc[0]:
+            year_return = (hist['Close'].iloc[-1] / hist['Close'].iloc[0] - 1) * 100
+        return {
+            "ticker": ticker.upper(),
+            "name": info.get('shortName', info.get('longName', ticker.upper())),
+            "price": price,
+            "year_return": year_return,
+            **fundamentals_from_info(info),
+        }
+    
+    def _compare_stocks(self, tickers: List[str]) -> str:
+        """Score several stocks with the shared rules and show them side by side."""
+        try:
+            tickers = list(dict.fromkeys(t.upper() for t in tickers))[:MAX_COMPARE_TICKERS]
+            if len(tickers) < 2:
+                return "Please name at least two stocks to compare.\n\nExample: 'Compare TCS vs INFY vs WIPRO'"
+            
+            results = fetch_many(self._fetch_comparison_data, tickers)
+            rows = [r for r in results if r]
+            failed = [t for t, r in zip(tickers, results) if not r]
+            if not rows:
+                return f"❌ Unable to fetch data for {', '.join(tickers)}. Please verify the ticker symbols."
+            
+            fields = {key: np.array([r[key] for r in rows], dtype=float)
+                      for key in ["pe", "roe", "debt_equity", "revenue_growth", "earnings_growth"]}
+            scores = score_fundamentals(**fields)
+            buckets = score_bucket(scores)
+            growth = average_growth(fields["revenue_growth"], fields["earnings_growth"])
+            
+            lines = [f"{'Stock':<11}{'Price':>9}{'1Y':>7}{'P/E':>6}{'ROE':>6}{'D/E':>6}{'Grw':>6}{'Score':>6}"]
+            for i, r in enumerate(rows):
+                year = f"{r['year_return']:+.0f}%" if r['year_return'] is not None else "n/a"
+                lines.append(
+                    f"{r['ticker'][:10]:<11}{r['price']:>9,.0f}{year:>7}{r['pe']:>6.1f}"
+                    f"{r['roe']:>5.0f}%{r['debt_equity']:>6.2f}{growth[i]:>+5.0f}%{int(scores[i]):>6}"
+                )
+            
+            verdicts = "\n".join(
+                f"• **{r['name']}** ({r['ticker']}): {BUCKET_LABELS[int(buckets[i])]}"
+                for i, r in enumerate(rows)
+            )
+            best = rows[int(np.argmax(scores))]
+            
+            response = f"""⚖️ **STOCK COMPARISON**
+
+```
+{chr(10).join(lines)}
+```
+
+{verdicts}
+
+🏆 **Highest score:** {best['name']} ({best['ticker']})"""
+            if failed:
+                response += f"\n\n❌ No data for: {', '.join(failed)}"
+            response += "\n\n💡 Use: \"Is TCS a good stock?\" for the full analysis of one company"
+            response += "\n\n⚠️ Scores use the same rules as the single-stock analysis. Not financial advice."
+            return response
+        
+        except Exception as e:
+            return f"⚠️ Error comparing stocks: {str(e)}"
+    
     def _analyze_mutual_fund(self, fund_name: str) -> str:
         """Provide mutual fund analysis and recommendation."""
         # This is a template - in production, integrate with MF API
@@ -314,8 +329,10 @@ Example: "Analyze gold sector stocks" or "Show me IT sector top performers" """
             for ticker in stocks:
                 try:
                     stock = yf.Ticker(ticker)
-                    hist = stock.history(period=period)
-                    info = stock.info
+                    with span("http.yfinance.history"):
+                        hist = stock.history(period=period)
+                    with span("http.yfinance.info"):
+                        info = stock.info
                     
                     if not hist.empty and len(hist) > 1:
                         start_price = hist['Close'].iloc[0]
@@ -393,11 +410,14 @@ Analysis Date: {datetime.now().strftime('%d %B %Y, %I:%M %p')}"""
         except Exception as e:
             return f"⚠️ Error analyzing sector: {str(e)}"
     
+    @traced("tool.investment_intelligence")
     def _run(self, query: str, analysis_type: str) -> str:
         """Main execution method."""
         try:
             if analysis_type == "stock_analysis":
                 return self._analyze_stock_comprehensive(query)
+            elif analysis_type == "stock_comparison":
+                return self._compare_stocks([t for t in query.replace(',', ' ').split() if t])
             elif analysis_type == "mutual_fund_analysis":
                 return self._analyze_mutual_fund(query)
             elif analysis_type == "sector_analysis":
@@ -405,7 +425,7 @@ Analysis Date: {datetime.now().strftime('%d %B %Y, %I:%M %p')}"""
             elif analysis_type == "top_performers":
                 return self._analyze_sector_stocks(query, period="1wk")
             else:
-                return "❌ Invalid analysis type. Use 'stock_analysis', 'mutual_fund_analysis', 'sector_analysis', or 'top_performers'"
+                return "❌ Invalid analysis type. Use 'stock_analysis', 'stock_comparison', 'mutual_fund_analysis', 'sector_analysis', or 'top_performers'"
         except Exception as e:
             return f"⚠️ Error in investment analysis: {str(e)}"
 
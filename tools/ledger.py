@@ -0,0 +1,161 @@
+"""
+Canonical signed view of a user's transactions for the DFG analytics.
+
+``transactions.amount`` is stored positive and the direction lives in the
+``type`` column. ``get_ledger`` turns a user's recent rows into NumPy columns
+with the sign applied (income positive, expenses and goal allocations
+negative), the type and category as small integer codes, and the dates as
+datetime64[D], sorted oldest first.
+
+Ledgers are cached per user and window. Each call checks the user's version
+(row count, highest id and amount total, one indexed aggregate query) and only
+reloads the rows when it has changed or the day has rolled over.
+"""
+import threading
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+TYPE_INCOME = 0
+TYPE_EXPENSE = 1
+TYPE_GOAL_ALLOCATION = 2
+TYPE_OTHER = 3
+TYPE_CODES = {"income": TYPE_INCOME, "expense": TYPE_EXPENSE, "goal_allocation": TYPE_GOAL_ALLOCATION}
+TYPE_NAMES = ("income", "expense", "goal_allocation", "other")
+TYPE_SIGNS = np.array([1.0, -1.0, -1.0, 1.0])  # Indexed by type code
+
+LEDGER_CACHE_MAX_ENTRIES = 5000
+
+class Ledger:
+    """
+    Column arrays for one user's transactions, oldest first. The arrays are read-only
+    because cached ledgers are shared between callers.
+    """
+    __slots__ = ("ids", "day", "amount", "type_code", "category_code", "categories", "description")
+
+    def __init__(self, ids: np.ndarray, day: np.ndarray, amount: np.ndarray, type_code: np.ndarray,
+                 category_code: np.ndarray, categories: Tuple[str, ...], description: np.ndarray):
+        self.ids = ids  # int64 transaction ids (-1 when built from plain records)
+        self.day = day  # datetime64[D]
+        self.amount = amount  # float64, income positive, outflows negative
+        self.type_code = type_code  # int8, see TYPE_CODES
+        self.category_code = category_code  # int16 index into ``categories``
+        self.categories = categories
+        self.description = description  # object array of str ('' when missing)
+        for column in (ids, day, amount, type_code, category_code, description):
+            column.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def is_income(self) -> np.ndarray:
+        return self.type_code == TYPE_INCOME
+
+    @property
+    def is_expense(self) -> np.ndarray:
+        return self.type_code == TYPE_EXPENSE
+
+    @property
+    def is_cash_flow(self) -> np.ndarray:
+        """Income and expenses; goal allocations are transfers to savings, not spending."""
+        return self.type_code <= TYPE_EXPENSE
+
+    def select(self, mask: np.ndarray) -> "Ledger":
+        """The rows where ``mask`` is True."""
+        return Ledger(self.ids[mask], self.day[mask], self.amount[mask], self.type_code[mask],
+                      self.category_code[mask], self.categories, self.description[mask])
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple]) -> "Ledger":
+        """
+        Build from ``(id, amount, type, category, description, date)`` rows, the column
+        order of ``DatabaseManager.get_transactions``.
+        """
+        if not rows:
+            return _EMPTY
+        ids, amounts, types, categories, descriptions, dates = zip(*rows)
+        return cls._build(ids, amounts, types, categories, descriptions, dates)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Dict[str, Any]]) -> "Ledger":
+        """
+        Build from dicts with 'date' and 'amount' (and optionally 'type', 'category',
+        'description', 'id'). Without a 'type', the amount's sign gives the direction.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return _EMPTY
+        amounts = [float(t.get('amount') or 0) for t in transactions]
+        types = [t.get('type') or ("income" if a > 0 else "expense") for t, a in zip(transactions, amounts)]
+        return cls._build([t.get('id', -1) for t in transactions], amounts, types,
+                          [t.get('category') for t in transactions], [t.get('description') for t in transactions],
+                          [t['date'] for t in transactions])
+
+    @classmethod
+    def _build(cls, ids, amounts, types, categories, descriptions, dates) -> "Ledger":
+        day = np.array([str(d)[:10] for d in dates], dtype="datetime64[D]")
+        ids = np.array([-1 if i is None else i for i in ids], dtype=np.int64)
+        order = np.lexsort((ids, day))
+        type_code = np.array([TYPE_CODES.get(t, TYPE_OTHER) for t in types], dtype=np.int8)
+        amount = np.abs(np.array(amounts, dtype=float)) * TYPE_SIGNS[type_code]
+        category_names, category_code = np.unique(np.array([c or "" for c in categories], dtype=object),
+                                                  return_inverse=True)
+        description = np.array([d or "" for d in descriptions], dtype=object)
+        return cls(ids[order], day[order], amount[order], type_code[order], category_code.astype(np.int16)[order],
+                   tuple(category_names), description[order])
+
+_EMPTY = Ledger(np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[D]"), np.empty(0), np.empty(0, dtype=np.int8),
+                np.empty(0, dtype=np.int16), (), np.empty(0, dtype=object))
+
+def as_ledger(transactions) -> Ledger:
+    """Pass a Ledger through; convert a list of transaction dicts."""
+    return transactions if isinstance(transactions, Ledger) else Ledger.from_transactions(transactions or [])
+
+_ledger_cache: "OrderedDict[Tuple[int, int], Tuple[Tuple, date, Ledger]]" = OrderedDict()
+_ledger_cache_lock = threading.Lock()
+ledger_cache_counts = Counter()  # hit / load
+
+def ledger_version(telegram_id: int, conn=None) -> Tuple:
+    """(row count, highest id, amount total) of the user's transactions; any insert, delete or amount edit changes it."""
+    if conn is None:
+        # Imported here so the batch job and benchmarks can use Ledger without opening the app's databases
+        from database import db_conn as conn
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*), MAX(id), TOTAL(amount) FROM transactions WHERE telegram_id=?", (telegram_id,))
+    return tuple(c.fetchone())
+
+def get_ledger(telegram_id: int, days: int = 90, conn=None) -> Ledger:
+    """
+    The user's transactions from the last ``days`` days as a signed, columnar ledger.
+
+    :param telegram_id: The user.
+    :param days: Window length, matching ``DatabaseManager.get_transactions``.
+    :param conn: SQLite connection; defaults to the shared ``db_conn``.
+    :return: A cached Ledger, reloaded only when the user's transactions changed.
+    """
+    if conn is None:
+        from database import db_conn as conn
+    key = (telegram_id, days)
+    version = ledger_version(telegram_id, conn)
+    today = date.today()
+    with _ledger_cache_lock:
+        cached = _ledger_cache.get(key)
+        if cached is not None and cached[0] == version and cached[1] == today:
+            _ledger_cache.move_to_end(key)
+            ledger_cache_counts["hit"] += 1
+            return cached[2]
+
+    c = conn.cursor()
+    c.execute("""SELECT id, amount, type, category, description, date
+                 FROM transactions
+                 WHERE telegram_id=? AND date > date('now', '-' || ? || ' days')""", (telegram_id, days))
+    ledger = Ledger.from_rows(c.fetchall())
+    ledger_cache_counts["load"] += 1
+    with _ledger_cache_lock:
+        _ledger_cache[key] = (version, today, ledger)
+        _ledger_cache.move_to_end(key)
+        while len(_ledger_cache) > LEDGER_CACHE_MAX_ENTRIES:
+            _ledger_cache.popitem(last=False)
+    return ledger
@@ -0,0 +1,137 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import yfinance as yf
+from tracing import bind_context, span
+import config
+
+_memory_cache: Dict[Tuple[str, str], Tuple[float, pd.DataFrame]] = {}
+_info_cache: Dict[str, Tuple[float, Tuple[str, Dict]]] = {}
+_cache_lock = threading.Lock()
+
+def yahoo_symbol(ticker: str) -> str:
+    """Add the NSE suffix to bare symbols; indices (^NSEI) and suffixed symbols pass through."""
+    ticker = ticker.strip().upper()
+    if ticker.startswith('^') or '.' in ticker:
+        return ticker
+    return f"{ticker}.NS"
+
+def _cache_file(symbol: str, period: str) -> str:
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', symbol)
+    return os.path.join(config.MARKET_DATA_CACHE_DIR, f"{safe}_{period}.csv")
+
+def _read_cache_file(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, index_col=0, parse_dates=True)
+
+def get_price_history(ticker: str, period: str = "1y", max_age_seconds: int = None) -> pd.DataFrame:
+    """
+    Daily OHLCV history for a ticker, served from memory, then disk, then yfinance.
+
+    Histories are stored with a timezone-naive date index so they line up across
+    tickers and survive the CSV round trip. Returns an empty frame if nothing could
+    be fetched; that result is not cached, so the next call tries again.
+    """
+    symbol = yahoo_symbol(ticker)
+    max_age = config.MARKET_DATA_TTL_SECONDS if max_age_seconds is None else max_age_seconds
+    key = (symbol, period)
+    now = time.time()
+
+    with _cache_lock:
+        cached = _memory_cache.get(key)
+    if cached and now - cached[0] < max_age:
+        return cached[1]
+
+    path = _cache_file(symbol, period)
+    if os.path.exists(path) and now - os.path.getmtime(path) < max_age:
+        hist = _read_cache_file(path)
+    else:
+        try:
+            with span("http.yfinance.history", symbol=symbol):
+                hist = yf.Ticker(symbol).history(period=period)
+        except Exception:
+            hist = pd.DataFrame()
+        if hist.empty and os.path.exists(path):
+            # Stale data beats no data when the remote call fails
+            hist = _read_cache_file(path)
+        elif not hist.empty:
+            if hist.index.tz is not None:
+                hist.index = hist.index.tz_localize(None)
+            os.makedirs(config.MARKET_DATA_CACHE_DIR, exist_ok=True)
+            hist.to_csv(path)
+
+    # An empty frame is a failed fetch; keeping it would blank the ticker for the whole TTL
+    if not hist.empty:
+        with _cache_lock:
+            _memory_cache[key] = (now, hist)
+    return hist
+
+def load_cached_closes(tickers: List[str], period: str = "10y") -> pd.DataFrame:
+    """
+    Closing prices for several tickers as a (dates x tickers) frame, read from the
+    on-disk cache only. Tickers without a cached history are left out, so this is
+    safe to call offline.
+    """
+    closes = {}
+    for ticker in tickers:
+        path = _cache_file(yahoo_symbol(ticker), period)
+        if os.path.exists(path):
+            closes[ticker] = _read_cache_file(path)['Close']
+    if not closes:
+        return pd.DataFrame()
+    return pd.DataFrame(closes).sort_index()
+
+def get_ticker_info(ticker: str, max_age_seconds: int = None) -> Tuple[Optional[str], Dict]:
+    """
+    yfinance ``info`` for a bare symbol, trying NSE first and then BSE.
+
+    Returns the Yahoo symbol that answered and its info dict, or (None, {}) when
+    neither exchange has a live quote. Successful lookups are kept in memory.
+    """
+    ticker = ticker.strip().upper()
+    max_age = config.MARKET_DATA_TTL_SECONDS if max_age_seconds is None else max_age_seconds
+    now = time.time()
+
+    with _cache_lock:
+        cached = _info_cache.get(ticker)
+    if cached and now - cached[0] < max_age:
+        return cached[1]
+
+    candidates = [ticker] if '.' in ticker or ticker.startswith('^') else [f"{ticker}.NS", f"{ticker}.BO"]
+    for symbol in candidates:
+        try:
+            with span("http.yfinance.info", symbol=symbol):
+                info = yf.Ticker(symbol).info
+        except Exception:
+            continue
+        if info and 'regularMarketPrice' in info:
+            with _cache_lock:
+                _info_cache[ticker] = (now, (symbol, info))
+            return symbol, info
+    return None, {}
+
+def fetch_many(fetch: Callable[[str], Any], tickers: List[str], max_workers: int = None) -> List[Any]:
+    """
+    Run a per-ticker fetch for several tickers on a bounded thread pool.
+
+    Results come back in the order of ``tickers``, so total latency is close to the
+    slowest single fetch rather than the sum. A fetch that raises yields None.
+    """
+    if not tickers:
+        return []
+    workers = min(max_workers or config.MARKET_DATA_MAX_WORKERS, len(tickers))
+
+    @bind_context
+    def safe_fetch(ticker):
+        try:
+            return fetch(ticker)
+        except Exception:
+            return None
+
+    if workers <= 1:
+        return [safe_fetch(t) for t in tickers]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(safe_fetch, tickers))
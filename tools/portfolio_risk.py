@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+from tools.market_data import get_price_history
+
+BENCHMARK_SYMBOL = "^NSEI"  # NIFTY 50
+TRADING_DAYS = 252
+VAR_CONFIDENCE = 0.95
+MIN_OBSERVATIONS = 30
+RISK_CACHE_SIZE = 256
+
+_risk_cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+
+def get_return_matrix(tickers: List[str], period: str = "1y") -> pd.DataFrame:
+    """Daily simple returns for each ticker, aligned on common trading days."""
+    closes = {}
+    for ticker in tickers:
+        hist = get_price_history(ticker, period=period)
+        if not hist.empty:
+            closes[ticker] = hist['Close']
+    if not closes:
+        return pd.DataFrame()
+    return pd.DataFrame(closes).sort_index().pct_change(fill_method=None).iloc[1:]
+
+def max_drawdown(returns: np.ndarray) -> np.ndarray:
+    """Largest peak-to-trough loss of compounded returns, per column."""
+    wealth = np.cumprod(1.0 + returns, axis=0)
+    peaks = np.maximum.accumulate(wealth, axis=0)
+    return -(wealth / peaks - 1.0).min(axis=0)
+
+def compute_risk_metrics(returns: np.ndarray, weights: np.ndarray,
+                         benchmark: Optional[np.ndarray] = None,
+                         confidence: float = VAR_CONFIDENCE) -> Dict[str, Any]:
+    """
+    Risk statistics for a (days x assets) return matrix and portfolio weights.
+
+    VaR figures are one-day losses expressed as positive fractions of portfolio value.
+    """
+    portfolio = returns @ weights
+    demeaned = returns - returns.mean(axis=0)
+    covariance = demeaned.T @ demeaned / (len(returns) - 1)
+    asset_vol = np.sqrt(np.diag(covariance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = covariance / np.outer(asset_vol, asset_vol)
+
+    mu, sigma = portfolio.mean(), portfolio.std(ddof=1)
+    z = NormalDist().inv_cdf(1 - confidence)
+    metrics = {
+        "asset_volatility": asset_vol * np.sqrt(TRADING_DAYS),
+        "asset_max_drawdown": max_drawdown(returns),
+        "correlation": correlation,
+        "covariance": covariance * TRADING_DAYS,
+        "volatility": float(sigma * np.sqrt(TRADING_DAYS)),
+        "historical_var": float(-np.quantile(portfolio, 1 - confidence)),
+        "parametric_var": float(-(mu + z * sigma)),
+        "max_drawdown": float(max_drawdown(portfolio[:, None])[0]),
+        "asset_beta": None,
+        "beta": None,
+    }
+
+    if benchmark is not None:
+        m = benchmark - benchmark.mean()
+        market_var = m @ m
+        if market_var > 0:
+            metrics["asset_beta"] = demeaned.T @ m / market_var
+            metrics["beta"] = float((portfolio - mu) @ m / market_var)
+    return metrics
+
+def _basket_risk(tickers: Tuple[str, ...], weights: Tuple[float, ...], period: str,
+                 as_of: str) -> Dict[str, Any]:
+    returns = get_return_matrix(list(tickers) + [BENCHMARK_SYMBOL], period)
+    available = [t for t in tickers if t in returns.columns]
+    missing = [t for t in tickers if t not in returns.columns]
+    if not available:
+        return {"error": "No price history available for this basket.", "missing": missing}
+
+    has_benchmark = BENCHMARK_SYMBOL in returns.columns
+    columns = available + ([BENCHMARK_SYMBOL] if has_benchmark else [])
+    aligned = returns[columns].dropna()
+    if len(aligned) < MIN_OBSERVATIONS:
+        return {"error": "Not enough overlapping price history for this basket.", "missing": missing}
+
+    w = np.array([weights[tickers.index(t)] for t in available], dtype=float)
+    w = w / w.sum()
+    asset_returns = aligned[available].to_numpy()
+    benchmark = aligned[BENCHMARK_SYMBOL].to_numpy() if has_benchmark else None
+    metrics = compute_risk_metrics(asset_returns, w, benchmark)
+
+    assets = {}
+    for i, ticker in enumerate(available):
+        assets[ticker] = {
+            "weight": float(w[i]),
+            "volatility": float(metrics["asset_volatility"][i]),
+            "max_drawdown": float(metrics["asset_max_drawdown"][i]),
+            "beta": float(metrics["asset_beta"][i]) if metrics["asset_beta"] is not None else None,
+        }
+
+    return {
+        "tickers": available,
+        "missing": missing,
+        "as_of": as_of,
+        "observations": len(aligned),
+        "assets": assets,
+        "portfolio": {
+            "volatility": metrics["volatility"],
+            "beta": metrics["beta"],
+            "historical_var": metrics["historical_var"],
+            "parametric_var": metrics["parametric_var"],
+            "max_drawdown": metrics["max_drawdown"],
+        },
+        "correlation": pd.DataFrame(metrics["correlation"], index=available, columns=available),
+        "covariance": pd.DataFrame(metrics["covariance"], index=available, columns=available),
+    }
+
+def basket_risk(tickers: List[str], weights: Optional[List[float]] = None,
+                period: str = "1y", as_of: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Volatility, beta vs NIFTY, VaR, max drawdown and correlations for a basket.
+
+    Results are memoized per (basket, weights, period, date); the returned dict is
+    shared between callers and must not be modified.
+
+    :param tickers: Ticker symbols (bare NSE symbols or yfinance symbols).
+    :param weights: Portfolio weights or values in the same order; equal weight if omitted.
+    :param period: History window to compute over.
+    :param as_of: Date key for the memo, defaults to today.
+    """
+    weights = weights or [1.0] * len(tickers)
+    pairs = sorted(zip(tickers, weights))
+    key = (tuple(t for t, _ in pairs), tuple(float(w) for _, w in pairs),
+           period, as_of or date.today().isoformat())
+    if key in _risk_cache:
+        _risk_cache.move_to_end(key)
+        return _risk_cache[key]
+
+    risk = _basket_risk(*key)
+    # Failures are not memoized so a transient fetch error is retried next time
+    if "error" not in risk:
+        _risk_cache[key] = risk
+        if len(_risk_cache) > RISK_CACHE_SIZE:
+            _risk_cache.popitem(last=False)
+    return risk
+
+def holdings_risk(holdings: Dict[str, float], period: str = "1y") -> Dict[str, Any]:
+    """Risk of a user's holdings given as {ticker: current value}."""
+    return basket_risk(list(holdings), list(holdings.values()), period)
+
+def format_risk_summary(risk: Dict[str, Any]) -> str:
+    """Short text block for chat replies."""
+    if "error" in risk:
+        return ""
+    p = risk["portfolio"]
+    beta = f"{p['beta']:.2f}" if p["beta"] is not None else "n/a"
+    return f"""**📉 Measured Risk ({risk['observations']} trading days):**
+• Annualized Volatility: {p['volatility'] * 100:.1f}%
+• Beta vs NIFTY 50: {beta}
+• 1-Day VaR (95%): {p['historical_var'] * 100:.2f}% historical, {p['parametric_var'] * 100:.2f}% parametric
+• Max Drawdown: {p['max_drawdown'] * 100:.1f}%"""
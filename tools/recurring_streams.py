@@ -0,0 +1,309 @@
+"""
+Recurring income and expense detection (paydays, rent, weekly payouts).
+
+Transactions of one sign are clustered by amount (sorted, a new cluster starting
+wherever an amount is more than AMOUNT_TOLERANCE above the cluster's smallest), and each cluster's dates are
+checked for a calendar anchor: the same day of the month, or the same weekday
+every one or two weeks. Occurrences off the anchor are dropped, and a cluster
+only becomes a stream when most of it sits on the anchor and the gaps between
+those dates match the period. Income that varies in size but lands on the same
+weekday (weekly platform payouts) is picked up by a separate weekday check.
+Each stream remembers the days it was detected on (and later matched), and
+exactly those days are left out of the residual series that is forecast.
+
+Detection is cached per user. A later call whose ledger only adds newer days
+advances the known streams with the new transactions instead of re-detecting;
+a full detection runs when the history changes or FORECAST_REFIT_DAYS pass.
+"""
+import calendar
+import copy
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import config
+
+AMOUNT_TOLERANCE = 0.2  # Relative spread allowed within one fixed-amount stream
+DAY_TOLERANCE = {"weekly": 1, "biweekly": 2, "monthly": 3}  # How far an occurrence may drift from its expected date
+PERIOD_DAYS = {"weekly": 7, "biweekly": 14, "monthly": 30}
+MIN_OCCURRENCES = {"weekly": 4, "biweekly": 3, "monthly": 3}
+MIN_ANCHORED_SHARE = 0.6  # Share of a cluster's occurrences that must fall on the anchor
+MIN_INTERVAL_FIT = 0.75  # Share of gaps between anchored occurrences that must match the period
+MIN_FLOW_SHARE = 0.15  # A fixed-amount stream must carry this share of its side's total; chance alignments rarely do
+MIN_PAYOUT_SHARE = 0.5  # Same for varying same-weekday payouts, relative to the income not already claimed
+MAX_MISSED = 2  # Expected occurrences that may pass without a match before a stream is dropped
+STREAM_CACHE_MAX_ENTRIES = 10000
+
+class RecurringStream:
+    """One detected stream and where it expects the next occurrence."""
+    __slots__ = ("kind", "period", "anchor", "amount", "fixed_amount", "occurrences", "last_date",
+                 "missed", "confidence", "member_days")
+
+    def __init__(self, kind: str, period: str, anchor: int, amount: float, fixed_amount: bool,
+                 occurrences: int, last_date: date, confidence: float, member_days: np.ndarray):
+        self.kind = kind  # 'income' or 'expense'
+        self.period = period  # 'weekly', 'biweekly' or 'monthly'
+        self.anchor = anchor  # Weekday (0 = Monday) or day of the month
+        self.amount = amount
+        self.fixed_amount = fixed_amount  # False for same-weekday payouts of varying size
+        self.occurrences = occurrences
+        self.last_date = last_date
+        self.missed = 0
+        self.confidence = confidence
+        self.member_days = member_days  # datetime64[D] days whose flows of this sign belong to the stream
+
+    def next_date(self, after: date) -> date:
+        """The first expected occurrence strictly after ``after``."""
+        if self.period == "monthly":
+            year, month = after.year, after.month
+            candidate = _month_day(year, month, self.anchor)
+            if candidate <= after:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                candidate = _month_day(year, month, self.anchor)
+            return candidate
+        step = PERIOD_DAYS[self.period]
+        candidate = self.last_date + timedelta(days=step)
+        while candidate <= after:
+            candidate += timedelta(days=step)
+        return candidate
+
+    def occurrences_between(self, start: date, end: date) -> List[date]:
+        """Expected dates in [start, end)."""
+        dates, current = [], self.next_date(start - timedelta(days=1))
+        while current < end:
+            dates.append(current)
+            current = self.next_date(current)
+        return dates
+
+    def matches(self, day: date, amount: float) -> bool:
+        """True if a transaction of this sign looks like an occurrence of the stream."""
+        if self.fixed_amount and abs(abs(amount) - self.amount) > AMOUNT_TOLERANCE * self.amount:
+            return False
+        if self.period == "monthly":
+            return _day_of_month_distance(day, self.anchor) <= DAY_TOLERANCE["monthly"]
+        if not self.fixed_amount or self.period == "weekly":
+            return day.weekday() == self.anchor
+        return abs(((day - self.last_date).days + 7) % 14 - 7) <= DAY_TOLERANCE["biweekly"]
+
+    def to_dict(self, after: date) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "period": self.period,
+            "anchor": int(self.anchor),
+            "amount": round(float(self.amount), 2),
+            "occurrences": int(self.occurrences),
+            "last_date": self.last_date.isoformat(),
+            "next_date": self.next_date(after).isoformat(),
+            "confidence": round(float(self.confidence), 2),
+        }
+
+def _month_day(year: int, month: int, day: int) -> date:
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+def _day_of_month_distance(day: date, anchor: int) -> int:
+    """Days between ``day`` and the anchor day of its own or a neighbouring month."""
+    month_length = calendar.monthrange(day.year, day.month)[1]
+    distance = abs(day.day - min(anchor, month_length))
+    return min(distance, month_length - distance)
+
+def _to_dates(days: np.ndarray) -> List[date]:
+    return days.astype("datetime64[D]").astype(object).tolist()
+
+def _daily_totals(days: np.ndarray, amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """One row per day with the day's total (paydays split into several credits count once)."""
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    return unique_days, np.bincount(inverse, weights=amounts)
+
+def _fit_anchor(days: np.ndarray, amounts: np.ndarray) -> Optional[Tuple[str, int, np.ndarray, float]]:
+    """Best (period, anchor, anchored mask, interval fit) for a cluster of occurrence days, if any."""
+    dates = _to_dates(days)
+    best = None
+
+    day_of_month = np.array([d.day for d in dates])
+    anchor = int(np.median(day_of_month))
+    anchored = np.array([_day_of_month_distance(d, anchor) <= DAY_TOLERANCE["monthly"] for d in dates])
+    candidates = [("monthly", anchor, anchored)]
+
+    weekdays = np.array([d.weekday() for d in dates])
+    weekday = int(np.bincount(weekdays, minlength=7).argmax())
+    on_weekday = weekdays == weekday
+    candidates += [("weekly", weekday, on_weekday), ("biweekly", weekday, on_weekday)]
+
+    for period, anchor, mask in candidates:
+        n = int(mask.sum())
+        if n < MIN_OCCURRENCES[period] or n < MIN_ANCHORED_SHARE * len(days):
+            continue
+        gaps = np.diff(days[mask]).astype(int)
+        if period == "monthly":
+            fit = np.mean((gaps >= 28 - DAY_TOLERANCE["monthly"]) & (gaps <= 31 + DAY_TOLERANCE["monthly"]))
+        else:
+            fit = np.mean(np.abs(gaps - PERIOD_DAYS[period]) <= DAY_TOLERANCE[period])
+        if fit >= MIN_INTERVAL_FIT and (best is None or fit > best[3]):
+            best = (period, anchor, mask, float(fit))
+    return best
+
+def _detect_kind(kind: str, days: np.ndarray, amounts: np.ndarray) -> List[RecurringStream]:
+    if len(days) == 0:
+        return []
+    day_index, totals = _daily_totals(days, amounts)
+    streams = []
+
+    # Fixed-amount streams: cluster days by their total, then look for a calendar anchor.
+    # A cluster spans at most AMOUNT_TOLERANCE above its smallest member, so a spread of
+    # varying amounts can't chain into one "fixed" cluster through close neighbours.
+    order = np.argsort(totals)
+    sorted_totals = totals[order].tolist()
+    breaks, first = [], 0
+    for i in range(1, len(sorted_totals)):
+        if sorted_totals[i] > sorted_totals[first] * (1 + AMOUNT_TOLERANCE):
+            breaks.append(i)
+            first = i
+    claimed = np.zeros(len(day_index), dtype=bool)
+    for members in np.split(order, breaks):
+        if len(members) < 2:
+            continue
+        members = np.sort(members)
+        fit = _fit_anchor(day_index[members], totals[members])
+        if fit is None:
+            continue
+        period, anchor, mask, interval_fit = fit
+        anchored = members[mask]
+        if totals[anchored].sum() < MIN_FLOW_SHARE * totals.sum():
+            continue
+        claimed[anchored] = True
+        streams.append(RecurringStream(
+            kind, period, anchor, float(np.median(totals[anchored])), True, len(anchored),
+            _to_dates(day_index[anchored[-1:]])[0],
+            interval_fit * min(1.0, len(anchored) / 4), day_index[anchored]))
+
+    # Varying payouts on a fixed weekday: most of the remaining days land on one weekday, almost every week
+    if kind == "income" and not any(s.period == "weekly" for s in streams):
+        rest = ~claimed
+        fit = _fit_anchor(day_index[rest], totals[rest]) if rest.sum() >= MIN_OCCURRENCES["weekly"] else None
+        if fit is not None and fit[0] in ("weekly", "biweekly") and \
+                totals[rest][fit[2]].sum() >= MIN_PAYOUT_SHARE * totals[rest].sum():
+            period, anchor, mask, interval_fit = fit
+            payout_days = day_index[rest][mask]
+            streams.append(RecurringStream(
+                kind, period, anchor, float(np.median(totals[rest][mask])), False, len(payout_days),
+                _to_dates(payout_days[-1:])[0], interval_fit * min(1.0, len(payout_days) / 6), payout_days))
+    return streams
+
+def detect_streams(days: np.ndarray, amounts: np.ndarray) -> List[RecurringStream]:
+    """
+    Find recurring income and expense streams in a ledger.
+
+    :param days: Transaction dates as datetime64[D], oldest first.
+    :param amounts: Signed amounts (income positive, expenses negative).
+    :return: The detected streams, income first.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    amounts = np.asarray(amounts, dtype=float)
+    if len(days) == 0:
+        return []
+    income, expense = amounts > 0, amounts < 0
+    streams = _detect_kind("income", days[income], amounts[income]) + \
+        _detect_kind("expense", days[expense], -amounts[expense])
+    # Drop streams that have stopped (e.g. a previous employer's salary)
+    _advance(streams, days[:0], amounts[:0], _to_dates(days[-1:])[0])
+    return streams
+
+def stream_members(days: np.ndarray, amounts: np.ndarray, streams: List[RecurringStream]) -> np.ndarray:
+    """Mask of transactions on the days each stream was detected or matched on, with the stream's sign."""
+    days = np.asarray(days, dtype="datetime64[D]")
+    amounts = np.asarray(amounts, dtype=float)
+    mask = np.zeros(len(days), dtype=bool)
+    for stream in streams:
+        sign = amounts > 0 if stream.kind == "income" else amounts < 0
+        mask |= sign & np.isin(days, stream.member_days)
+    return mask
+
+def expected_flows(streams: List[RecurringStream], start: date, steps: int) -> List[Dict[str, Any]]:
+    """Expected occurrences of every stream over ``steps`` days from ``start``, in date order."""
+    end = start + timedelta(days=steps)
+    flows = [{"date": day.isoformat(), "kind": s.kind, "period": s.period, "amount": round(float(s.amount), 2)}
+             for s in streams for day in s.occurrences_between(start, end)]
+    return sorted(flows, key=lambda f: f["date"])
+
+class _StreamCacheEntry:
+    __slots__ = ("days", "amounts", "streams", "detected_through")
+
+    def __init__(self, days: np.ndarray, amounts: np.ndarray, streams: List[RecurringStream], detected_through):
+        self.days = days
+        self.amounts = amounts
+        self.streams = streams
+        self.detected_through = detected_through
+
+_stream_cache: "OrderedDict[Any, _StreamCacheEntry]" = OrderedDict()
+_stream_cache_lock = threading.Lock()
+stream_cache_counts = Counter()  # hit / update / detect
+
+def _extends(entry: _StreamCacheEntry, days: np.ndarray, amounts: np.ndarray) -> bool:
+    """True if the ledger is the cached one (window start aside) with transactions from its last day on added."""
+    last = entry.days[-1]
+    old = (entry.days >= days[0]) & (entry.days < last)
+    new = days < last
+    return old.sum() == new.sum() and np.array_equal(entry.days[old], days[new]) and \
+        np.allclose(entry.amounts[old], amounts[new])
+
+def _advance(streams: List[RecurringStream], days: np.ndarray, amounts: np.ndarray, through: date):
+    """Move the streams forward over transactions newer than each stream's last occurrence."""
+    for day, amount in zip(_to_dates(days), amounts.tolist()):
+        for stream in streams:
+            sign = 1 if stream.kind == "income" else -1
+            if amount * sign > 0 and day > stream.last_date and stream.matches(day, amount):
+                stream.amount += 0.3 * (abs(amount) - stream.amount)
+                stream.occurrences += 1
+                stream.last_date = day
+                stream.member_days = np.append(stream.member_days, np.datetime64(day, "D"))
+                stream.missed = 0
+                break
+    for stream in streams:
+        expected = stream.next_date(stream.last_date)
+        while expected + timedelta(days=DAY_TOLERANCE[stream.period]) < through:
+            stream.missed += 1
+            expected = stream.next_date(expected)
+    streams[:] = [s for s in streams if s.missed < MAX_MISSED]
+
+def recurring_streams(days, amounts, user_id=None) -> List[RecurringStream]:
+    """
+    Streams for a ledger, cached per user and advanced incrementally as new days arrive.
+
+    :param days: Transaction dates as datetime64[D] (or anything NumPy can convert), oldest first.
+    :param amounts: Signed amounts.
+    :param user_id: Cache key; None detects from scratch without caching.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    amounts = np.asarray(amounts, dtype=float)
+    if len(days) == 0:
+        return []
+    if user_id is None:
+        return detect_streams(days, amounts)
+
+    through = _to_dates(days[-1:])[0]
+    with _stream_cache_lock:
+        entry = _stream_cache.get(user_id)
+        if entry is not None:
+            _stream_cache.move_to_end(user_id)
+    if entry is not None and len(entry.days) and _extends(entry, days, amounts) and \
+            (through - entry.detected_through).days < config.FORECAST_REFIT_DAYS:
+        if len(days) == len(entry.days) and days[-1] == entry.days[-1]:
+            stream_cache_counts["hit"] += 1
+            return entry.streams
+        fresh = days >= entry.days[-1]
+        streams = [copy.copy(s) for s in entry.streams]
+        _advance(streams, days[fresh], amounts[fresh], through)
+        stream_cache_counts["update"] += 1
+        detected_through = entry.detected_through
+    else:
+        streams = detect_streams(days, amounts)
+        stream_cache_counts["detect"] += 1
+        detected_through = through
+
+    with _stream_cache_lock:
+        _stream_cache[user_id] = _StreamCacheEntry(days, amounts, streams, detected_through)
+        _stream_cache.move_to_end(user_id)
+        while len(_stream_cache) > STREAM_CACHE_MAX_ENTRIES:
+            _stream_cache.popitem(last=False)
+    return streams
@@ -4,6 +4,7 @@ from typing import Optional, Literal
 from datetime import datetime, timedelta
 import io
 from database import db_conn
+from tracing import traced
 
 class ReportInput(BaseModel):
     telegram_id: int = Field(description="User's Telegram ID")
@@ -500,6 +501,7 @@ class ReportGenerationTool(BaseTool):
         except Exception as e:
             raise Exception(f"Error generating Excel: {str(e)}")
     
+    @traced("tool.report_generation")
     def _run(self, telegram_id: int, report_type: str, format: str, period_days: int = 30) -> str:
         """Main execution method."""
         try:
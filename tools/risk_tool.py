@@ -2,6 +2,9 @@ from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 import yfinance as yf
+from tools.portfolio_risk import basket_risk, format_risk_summary
+from tools.allocation_optimizer import optimize_allocation
+from tracing import traced
 
 class RiskInput(BaseModel):
     risk_level: str = Field(description="Risk level: low, medium, or high")
@@ -59,6 +62,7 @@ class RiskAversionTool(BaseTool):
         ]
     }
     
+    @traced("tool.risk_advisor")
     def _run(self, risk_level: str, investment_type: str, amount: float = None) -> str:
         """Provide investment recommendations based on risk profile."""
         try:
@@ -124,6 +128,11 @@ class RiskAversionTool(BaseTool):
 
 """
                 
+                # Measured risk of the equal-weight basket, from cached price history
+                risk_summary = format_risk_summary(basket_risk([s['ticker'] for s in recommendations[:5]]))
+                if risk_summary:
+                    response += risk_summary + "\n\n"
+                
                 response += """**⚠️ Important Guidelines:**
 • Diversify across 5-8 stocks minimum
 • Invest only surplus funds (not emergency money)
@@ -165,7 +174,22 @@ class RiskAversionTool(BaseTool):
 
 **💰 For Your Investment of ₹{amount:,.0f}:**
 """
-                if risk_level == "low":
+                plan = optimize_allocation(
+                    risk_level,
+                    self.STOCK_RECOMMENDATIONS[risk_level],
+                    self.MUTUAL_FUND_RECOMMENDATIONS[risk_level],
+                    amount,
+                    investment_type
+                )
+                if "error" not in plan:
+                    for item in plan['allocations']:
+                        response += f"• {item['name']}: ₹{item['amount']:,.0f} ({item['weight']*100:.0f}%)\n"
+                    response += f"""
+📊 Expected volatility: {plan['expected_volatility']*100:.1f}% (target {plan['target_volatility']*100:.0f}%)"""
+                    if not plan['target_met']:
+                        response += (f"\n⚠️ The {plan['target_volatility']*100:.0f}% target can't be met with these "
+                                     f"holdings; this is the least volatile mix available.")
+                elif risk_level == "low":
                     response += f"""• Debt Funds: ₹{amount*0.7:,.0f} (70%)
 • Large Cap Equity: ₹{amount*0.3:,.0f} (30%)"""
                 elif risk_level == "medium":
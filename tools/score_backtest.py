@@ -0,0 +1,195 @@
+"""
+Backtest for the investment score used by ``_analyze_stock_comprehensive``.
+
+Replays point-in-time fundamentals against cached price history: at every rebalance
+date each ticker is scored with the shared rules in ``tools.scoring_rules`` using only
+figures published on or before that date, and the forward return over the holding
+horizon is attributed to the ticker's score bucket (STRONG BUY, BUY/ACCUMULATE, ...).
+
+Everything after loading is array arithmetic over (rebalance dates x tickers), so ten
+years of monthly rebalances over 500 tickers runs in well under a second.
+
+Prices are read from the market data disk cache only (``<symbol>_<period>.csv`` in
+MARKET_DATA_CACHE_DIR). The live tools only fetch one year, so fill the cache with
+the longer history once, online, with ``--warm-cache``; later runs work offline.
+
+Usage:
+    python -m tools.score_backtest --fundamentals data/fundamentals_pit.csv --warm-cache
+    python -m tools.score_backtest --fundamentals data/fundamentals_pit.csv --horizon 63
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from tools.scoring_rules import score_fundamentals, score_bucket, BUCKET_LABELS
+from tools.market_data import fetch_many, get_price_history, load_cached_closes
+
+FUNDAMENTAL_FIELDS = ["pe", "roe", "debt_equity", "revenue_growth", "earnings_growth"]
+DEFAULT_HORIZON_DAYS = 63  # About one quarter of trading days
+MAX_FUNDAMENTAL_AGE_DAYS = 400  # Ignore figures older than the last annual report
+PRICE_GAP_FILL_DAYS = 5
+
+def load_fundamentals_csv(path: str) -> pd.DataFrame:
+    """
+    Load point-in-time fundamentals.
+
+    Expected columns: ``date`` (when the figures became public), ``ticker`` and the
+    scored fields in the units the live tool uses (ROE and growth in percent,
+    debt/equity as a ratio).
+    """
+    df = pd.read_csv(path, parse_dates=['date'])
+    missing = [c for c in ['date', 'ticker'] + FUNDAMENTAL_FIELDS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Fundamentals file is missing columns: {', '.join(missing)}")
+    return df
+
+def rebalance_positions(index: pd.DatetimeIndex, freq: str = "M") -> np.ndarray:
+    """Row positions of the last trading day in each period."""
+    return np.flatnonzero(~index.to_period(freq).duplicated(keep='last'))
+
+def align_fundamentals(fundamentals: pd.DataFrame, dates: pd.DatetimeIndex, tickers: List[str],
+                       max_age_days: int = MAX_FUNDAMENTAL_AGE_DAYS) -> Dict[str, np.ndarray]:
+    """
+    As-of join of fundamentals onto rebalance dates.
+
+    Returns one (dates x tickers) array per field plus a boolean ``covered`` mask that
+    is False where no figures were public yet or the latest ones are too old.
+    """
+    f = fundamentals[fundamentals['ticker'].isin(tickers)].copy()
+    f = f.sort_values('date').drop_duplicates(['date', 'ticker'], keep='last')
+    f['published'] = f['date'].values.astype('datetime64[D]').astype(np.int64).astype(float)
+
+    wide = f.pivot(index='date', columns='ticker', values=FUNDAMENTAL_FIELDS + ['published'])
+    wide = wide.reindex(wide.index.union(dates)).ffill().loc[dates]
+
+    aligned = {field: wide[field].reindex(columns=tickers).to_numpy(dtype=float)
+               for field in FUNDAMENTAL_FIELDS + ['published']}
+    published = aligned.pop('published')
+    age = dates.values.astype('datetime64[D]').astype(np.int64)[:, None] - published
+    aligned['covered'] = ~np.isnan(published) & (age <= max_age_days)
+    return aligned
+
+def _period_bucket_means(fwd: np.ndarray, buckets: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Mean forward return per (rebalance date, bucket); NaN where a bucket is empty."""
+    onehot = (buckets[..., None] == np.arange(len(BUCKET_LABELS))) & valid[..., None]
+    sums = np.einsum('rn,rnb->rb', np.where(valid, fwd, 0.0), onehot)
+    counts = onehot.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def _rank_ic(scores: np.ndarray, fwd: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Spearman correlation between score and forward return for each rebalance date."""
+    x = pd.DataFrame(np.where(valid, scores, np.nan)).rank(axis=1).to_numpy()
+    y = pd.DataFrame(np.where(valid, fwd, np.nan)).rank(axis=1).to_numpy()
+    x = x - np.nanmean(x, axis=1, keepdims=True)
+    y = y - np.nanmean(y, axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(x * y, axis=1) / np.sqrt(np.nansum(x * x, axis=1) * np.nansum(y * y, axis=1))
+
+def run_backtest(closes: pd.DataFrame, fundamentals: pd.DataFrame,
+                 horizon_days: int = DEFAULT_HORIZON_DAYS, freq: str = "M",
+                 max_age_days: int = MAX_FUNDAMENTAL_AGE_DAYS) -> Dict[str, Any]:
+    """
+    Score every ticker at each rebalance date and measure forward returns per bucket.
+
+    :param closes: Daily closing prices, (dates x tickers).
+    :param fundamentals: Point-in-time fundamentals, see ``load_fundamentals_csv``.
+    :param horizon_days: Holding period in trading days.
+    :param freq: Rebalance frequency as a pandas period alias ("M", "Q", "W").
+    :return: A dictionary with per-bucket statistics, per-period bucket returns and
+             the top-minus-bottom spread and rank IC summaries.
+    """
+    closes = closes.sort_index().ffill(limit=PRICE_GAP_FILL_DAYS)
+    tickers = list(closes.columns)
+    prices = closes.to_numpy(dtype=float)
+
+    pos = rebalance_positions(closes.index, freq)
+    pos = pos[pos + horizon_days < len(prices)]
+    if len(pos) == 0:
+        raise ValueError("Price history is shorter than one rebalance period plus the horizon.")
+    dates = closes.index[pos]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fwd = prices[pos + horizon_days] / prices[pos] - 1.0
+
+    f = align_fundamentals(fundamentals, dates, tickers, max_age_days)
+    # Inside coverage, a missing field behaves like the live tool's default of 0
+    fields = {name: np.nan_to_num(f[name], nan=0.0) for name in FUNDAMENTAL_FIELDS}
+    scores = score_fundamentals(**fields)
+    buckets = score_bucket(scores)
+    valid = f['covered'] & np.isfinite(fwd)
+
+    with np.errstate(invalid='ignore'):
+        universe = np.nanmean(np.where(valid, fwd, np.nan), axis=1, keepdims=True)
+    excess = fwd - universe
+
+    rows = []
+    for b, label in enumerate(BUCKET_LABELS):
+        mask = valid & (buckets == b)
+        r = fwd[mask]
+        rows.append({
+            'bucket': label,
+            'observations': int(mask.sum()),
+            'mean_return': float(r.mean()) if r.size else np.nan,
+            'median_return': float(np.median(r)) if r.size else np.nan,
+            'hit_rate': float((r > 0).mean()) if r.size else np.nan,
+            'mean_excess_return': float(excess[mask].mean()) if r.size else np.nan,
+        })
+
+    period_means = _period_bucket_means(fwd, buckets, valid)
+    spread = period_means[:, -1] - period_means[:, 0]
+    spread = spread[~np.isnan(spread)]
+    ic = _rank_ic(scores.astype(float), fwd, valid)
+    ic = ic[np.isfinite(ic)]
+
+    return {
+        'buckets': pd.DataFrame(rows).set_index('bucket'),
+        'period_returns': pd.DataFrame(period_means, index=dates, columns=BUCKET_LABELS),
+        'spread_mean': float(spread.mean()) if spread.size else np.nan,
+        'spread_tstat': float(spread.mean() / (spread.std(ddof=1) / np.sqrt(spread.size)))
+                        if spread.size > 1 and spread.std(ddof=1) > 0 else np.nan,
+        'rank_ic_mean': float(ic.mean()) if ic.size else np.nan,
+        'rebalances': len(dates),
+        'tickers': len(tickers),
+        'horizon_days': horizon_days,
+    }
+
+def format_report(result: Dict[str, Any]) -> str:
+    """Plain-text summary of a backtest result."""
+    table = result['buckets'].copy()
+    for col in ['mean_return', 'median_return', 'mean_excess_return']:
+        table[col] = (table[col] * 100).map(lambda v: f"{v:+.2f}%" if pd.notna(v) else "n/a")
+    table['hit_rate'] = (table['hit_rate'] * 100).map(lambda v: f"{v:.1f}%" if pd.notna(v) else "n/a")
+    return f"""Investment score backtest
+{result['tickers']} tickers, {result['rebalances']} rebalances, {result['horizon_days']}-day forward returns
+
+{table.to_string()}
+
+STRONG BUY minus AVOID/SELL: {result['spread_mean'] * 100:+.2f}% per period (t = {result['spread_tstat']:.2f})
+Mean rank IC: {result['rank_ic_mean']:.3f}"""
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backtest the investment score buckets offline.")
+    parser.add_argument("--fundamentals", required=True, help="CSV of point-in-time fundamentals")
+    parser.add_argument("--tickers", help="Comma-separated tickers (default: all in the fundamentals file)")
+    parser.add_argument("--period", default="10y", help="Cached price history period to read")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON_DAYS, help="Holding period in trading days")
+    parser.add_argument("--freq", default="M", help="Rebalance frequency (M, Q, W)")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Fetch the price history from yfinance into the disk cache first")
+    args = parser.parse_args(argv)
+
+    fundamentals = load_fundamentals_csv(args.fundamentals)
+    tickers = args.tickers.split(",") if args.tickers else sorted(fundamentals['ticker'].unique())
+    if args.warm_cache:
+        histories = fetch_many(lambda t: get_price_history(t, period=args.period), tickers)
+        fetched = sum(1 for h in histories if h is not None and not h.empty)
+        print(f"Cached {args.period} price history for {fetched} of {len(tickers)} tickers")
+    closes = load_cached_closes(tickers, period=args.period)
+    if closes.empty:
+        raise SystemExit(f"No cached price history found for the requested tickers; "
+                         f"run again with --warm-cache to fetch the {args.period} history.")
+    print(format_report(run_backtest(closes, fundamentals, args.horizon, args.freq)))
+
+if __name__ == "__main__":
+    main()
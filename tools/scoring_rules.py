@@ -0,0 +1,101 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Each rule is (condition, points, note). Conditions are written with element-wise
+# operators so the same table scores a single stock or a (dates x tickers) array.
+# The first matching condition wins, mirroring the original if/elif chains.
+VALUATION_RULES = [
+    (lambda pe: (pe > 0) & (pe < 15), 25, "✅ Excellent valuation - Trading at attractive P/E"),
+    (lambda pe: (pe >= 15) & (pe < 25), 18, "🟡 Fair valuation - Reasonably priced"),
+    (lambda pe: (pe >= 25) & (pe < 35), 10, "⚠️ Slightly expensive - P/E above market average"),
+    (lambda pe: pe >= 35, 0, "🔴 Overvalued - Very high P/E ratio"),
+]
+VALUATION_FALLBACK = "⚠️ P/E data not available"
+
+PROFITABILITY_RULES = [
+    (lambda roe: roe > 20, 25, "✅ Excellent profitability - ROE > 20%"),
+    (lambda roe: roe > 15, 18, "🟡 Good profitability - Healthy ROE"),
+    (lambda roe: roe > 10, 10, "⚠️ Moderate profitability - Average ROE"),
+]
+PROFITABILITY_FALLBACK = "🔴 Weak profitability - Low ROE"
+
+HEALTH_RULES = [
+    (lambda de: de < 0.5, 25, "✅ Strong balance sheet - Very low debt"),
+    (lambda de: de < 1.0, 18, "🟡 Healthy finances - Manageable debt"),
+    (lambda de: de < 2.0, 10, "⚠️ Moderate debt levels - Monitor closely"),
+]
+HEALTH_FALLBACK = "🔴 High debt burden - Financial risk"
+
+GROWTH_RULES = [
+    (lambda g: g > 20, 25, "✅ Strong growth momentum - Expanding rapidly"),
+    (lambda g: g > 10, 18, "🟡 Steady growth - Consistent expansion"),
+    (lambda g: g > 0, 10, "⚠️ Slow growth - Limited expansion"),
+]
+GROWTH_FALLBACK = "🔴 Declining growth - Concerning trend"
+
+# Lower bounds of the recommendation buckets, ascending
+BUCKET_THRESHOLDS = [40, 60, 80]
+BUCKET_LABELS = ["AVOID/SELL", "HOLD", "BUY/ACCUMULATE", "STRONG BUY"]
+
+def average_growth(revenue_growth, earnings_growth):
+    """Mean of revenue and earnings growth; zero unless both figures are reported."""
+    revenue_growth = np.asarray(revenue_growth, dtype=float)
+    earnings_growth = np.asarray(earnings_growth, dtype=float)
+    both = (revenue_growth != 0) & (earnings_growth != 0)
+    return np.where(both, (revenue_growth + earnings_growth) / 2, 0.0)
+
+def _apply_rules(rules: List[Tuple], values) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore"):
+        conditions = [condition(values) for condition, _, _ in rules]
+    return np.select(conditions, [points for _, points, _ in rules], default=0)
+
+def _first_note(rules: List[Tuple], fallback: str, value: float) -> Tuple[int, str]:
+    for condition, points, note in rules:
+        if condition(value):
+            return points, note
+    return 0, fallback
+
+def score_fundamentals(pe, roe, debt_equity, revenue_growth, earnings_growth) -> np.ndarray:
+    """
+    Vectorized 100-point investment score.
+
+    Inputs may be scalars or equally shaped arrays; ROE and growth are percentages and
+    debt/equity is a ratio. Missing values (NaN) earn no points for that component.
+    """
+    growth = average_growth(revenue_growth, earnings_growth)
+    return (
+        _apply_rules(VALUATION_RULES, pe)
+        + _apply_rules(PROFITABILITY_RULES, roe)
+        + _apply_rules(HEALTH_RULES, debt_equity)
+        + _apply_rules(GROWTH_RULES, growth)
+    )
+
+def explain_score(pe: float, roe: float, debt_equity: float,
+                  revenue_growth: float, earnings_growth: float) -> Tuple[int, List[str]]:
+    """Score a single stock and return the note behind each component."""
+    growth = float(average_growth(revenue_growth, earnings_growth))
+    parts = [
+        _first_note(VALUATION_RULES, VALUATION_FALLBACK, pe),
+        _first_note(PROFITABILITY_RULES, PROFITABILITY_FALLBACK, roe),
+        _first_note(HEALTH_RULES, HEALTH_FALLBACK, debt_equity),
+        _first_note(GROWTH_RULES, GROWTH_FALLBACK, growth),
+    ]
+    return sum(points for points, _ in parts), [note for _, note in parts]
+
+def score_bucket(scores) -> np.ndarray:
+    """Bucket index per score: 0=AVOID/SELL, 1=HOLD, 2=BUY/ACCUMULATE, 3=STRONG BUY."""
+    return np.digitize(np.asarray(scores, dtype=float), BUCKET_THRESHOLDS)
+
+def bucket_label(score: float) -> str:
+    return BUCKET_LABELS[int(score_bucket(score))]
+
+def fundamentals_from_info(info: Dict) -> Dict[str, float]:
+    """Pull the scored fields out of a yfinance ``info`` dict, in the units the rules expect."""
+    return {
+        "pe": info.get('trailingPE', info.get('forwardPE', 0)) or 0,
+        "roe": info.get('returnOnEquity', 0) * 100 if info.get('returnOnEquity') else 0,
+        "debt_equity": info.get('debtToEquity', 0) / 100 if info.get('debtToEquity') else 0,
+        "revenue_growth": info.get('revenueGrowth', 0) * 100 if info.get('revenueGrowth') else 0,
+        "earnings_growth": info.get('earningsGrowth', 0) * 100 if info.get('earningsGrowth') else 0,
+    }
@@ -1,6 +1,7 @@
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 import yfinance as yf
+from tracing import span, traced
 
 class StockInput(BaseModel):
     ticker: str = Field(description="Stock ticker symbol like RELIANCE, TCS, INFY")
@@ -10,17 +11,20 @@ class StockScreenerTool(BaseTool):
     description: str = "Analyzes Indian stocks using fundamental metrics and quality checks"
     args_schema: type[BaseModel] = StockInput
     
+    @traced("tool.stock_screener")
     def _run(self, ticker: str) -> str:
         """Analyze a stock using fundamental metrics."""
         try:
             # Try NSE first, then BSE
             stock = yf.Ticker(f"{ticker}.NS")
-            info = stock.info
+            with span("http.yfinance.info"):
+                info = stock.info
             
             # If NSE fails, try BSE
             if not info or 'regularMarketPrice' not in info:
                 stock = yf.Ticker(f"{ticker}.BO")
-                info = stock.info
+                with span("http.yfinance.info"):
+                    info = stock.info
             
             # Check if we got valid data
             if not info or 'regularMarketPrice' not in info:
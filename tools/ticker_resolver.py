@@ -0,0 +1,273 @@
+import csv
+import difflib
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import config
+
+# Words that show up around stock questions but are never tickers
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "it", "its", "this", "that", "of", "in", "on", "for",
+    "to", "and", "or", "vs", "v", "versus", "with", "me", "my", "i", "we", "you", "should",
+    "can", "could", "would", "will", "what", "how", "which", "about", "tell", "show", "check",
+    "analyze", "analyse", "compare", "good", "bad", "best", "buy", "sell", "hold", "stock",
+    "stocks", "share", "shares", "equity", "company", "price", "nse", "bse", "now", "today",
+    "invest", "investment", "please", "limited", "ltd", "inc", "co", "corporation", "corp",
+}
+
+# Finance acronyms users type in capitals that are not listed tickers
+NON_TICKER_ACRONYMS = {
+    "SIP", "EMI", "ETF", "NAV", "IPO", "GST", "PAN", "UPI", "KYC", "SEBI", "RBI", "OTP", "PDF",
+    "USD", "INR", "DFG", "NIFTY", "SENSEX", "ROE", "EPS", "PPF", "EPF", "NPS", "ELSS", "HUF",
+}
+
+# Symbols that are also everyday words; only trusted when typed in capitals
+AMBIGUOUS_SYMBOLS = {"IDEA", "SAIL"}
+
+MAX_PHRASE_TOKENS = 5
+PREFIX_MIN_LENGTH = 5
+FUZZY_MIN_LENGTH = 5
+FUZZY_CUTOFF = 0.85
+FUZZY_SCORE_THRESHOLD = 0.6
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9&'\-\.]*[A-Za-z0-9&]|[A-Za-z0-9]")
+_NAME_TOKEN_RE = re.compile(r"[a-z0-9&]+")
+_EXCHANGE_SUFFIX_RE = re.compile(r"\.(NS|BO)$", re.IGNORECASE)
+_UNLISTED_RE = re.compile(r"^[A-Z][A-Z&\-]{2,9}$")
+
+class Listing(NamedTuple):
+    symbol: str
+    name: str
+    exchange: str
+
+    @property
+    def yahoo_symbol(self) -> str:
+        """Symbol with the yfinance exchange suffix."""
+        return f"{self.symbol}.{'BO' if self.exchange == 'BSE' else 'NS'}"
+
+def _normalize_name(text: str) -> List[str]:
+    """Lowercase a company name or mention into comparable tokens."""
+    tokens = _NAME_TOKEN_RE.findall(text.lower().replace("'", ""))
+    return [t for t in tokens if t != "&" and t not in STOPWORDS]
+
+class SymbolIndex:
+    """
+    In-memory index over an exchange listing.
+
+    Combines an exact symbol hash, a character trie over company names/aliases for
+    prefix lookups, and an IDF-weighted token index for fuzzy name matching.
+    """
+
+    def __init__(self, listings: List[Listing], aliases: Optional[Dict[str, List[str]]] = None):
+        self._symbols: Dict[str, Listing] = {}
+        self._phrases: Dict[str, str] = {}
+        self._trie: dict = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._docs: List[Tuple[str, List[str]]] = []
+        aliases = aliases or {}
+
+        for listing in listings:
+            # First occurrence wins so NSE rows listed before BSE rows take precedence
+            if listing.symbol in self._symbols:
+                continue
+            self._symbols[listing.symbol] = listing
+            for text in [listing.name] + aliases.get(listing.symbol, []):
+                tokens = _normalize_name(text)
+                if not tokens:
+                    continue
+                phrase = " ".join(tokens)
+                self._phrases.setdefault(phrase, listing.symbol)
+                self._trie_insert(phrase, listing.symbol)
+                doc_id = len(self._docs)
+                self._docs.append((listing.symbol, tokens))
+                for token in set(tokens):
+                    self._postings.setdefault(token, set()).add(doc_id)
+
+        n_docs = max(len(self._docs), 1)
+        self._idf = {t: math.log(1 + n_docs / len(ids)) for t, ids in self._postings.items()}
+        self._vocabulary = list(self._postings)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "SymbolIndex":
+        """
+        Build the index from a listing CSV.
+
+        Accepts the NSE ``EQUITY_L.csv`` layout (SYMBOL, NAME OF COMPANY) as well as
+        the bundled file, which adds optional EXCHANGE and pipe-separated ALIASES columns.
+        """
+        listings = []
+        aliases: Dict[str, List[str]] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                row = {(k or "").strip().upper(): (v or "").strip() for k, v in row.items()}
+                symbol = row.get("SYMBOL", "").upper()
+                if not symbol:
+                    continue
+                name = row.get("NAME OF COMPANY") or row.get("NAME") or symbol
+                listings.append(Listing(symbol, name, row.get("EXCHANGE", "NSE").upper() or "NSE"))
+                if row.get("ALIASES"):
+                    aliases.setdefault(symbol, []).extend(a for a in row["ALIASES"].split("|") if a)
+        return cls(listings, aliases)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _trie_insert(self, phrase: str, symbol: str):
+        node = self._trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+            node.setdefault("$", set()).add(symbol)
+
+    def _is_distinctive(self, token: str) -> bool:
+        doc_ids = self._postings.get(token)
+        return not doc_ids or len({self._docs[d][0] for d in doc_ids}) == 1
+
+    def lookup_symbol(self, symbol: str) -> Optional[Listing]:
+        """Exact symbol lookup, tolerating a .NS/.BO suffix."""
+        return self._symbols.get(_EXCHANGE_SUFFIX_RE.sub("", symbol.strip()).upper())
+
+    def complete(self, prefix: str) -> Set[str]:
+        """Symbols whose company name or alias starts with the given prefix."""
+        node = self._trie
+        for ch in " ".join(_normalize_name(prefix)):
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node.get("$", set())
+
+    def _fuzzy_token(self, token: str) -> Optional[str]:
+        if token in self._postings:
+            return token
+        if len(token) < FUZZY_MIN_LENGTH:
+            return None
+        return _closest_token(token, tuple(self._vocabulary))
+
+    def _match_tokens(self, tokens: List[str]) -> Optional[str]:
+        """IDF-weighted token overlap; returns a symbol only for a clear, unique winner."""
+        matched = [m for m in (self._fuzzy_token(t) for t in tokens) if m]
+        if not matched:
+            return None
+        scores: Dict[int, float] = {}
+        for token in set(matched):
+            for doc_id in self._postings[token]:
+                scores[doc_id] = scores.get(doc_id, 0.0) + self._idf[token]
+        best_by_symbol: Dict[str, float] = {}
+        for doc_id, overlap in scores.items():
+            symbol, doc_tokens = self._docs[doc_id]
+            score = overlap / sum(self._idf[t] for t in set(doc_tokens))
+            best_by_symbol[symbol] = max(best_by_symbol.get(symbol, 0.0), score)
+        ranked = sorted(best_by_symbol.items(), key=lambda kv: kv[1], reverse=True)
+        if ranked[0][1] < FUZZY_SCORE_THRESHOLD:
+            return None
+        if len(ranked) > 1 and ranked[1][1] >= ranked[0][1]:
+            return None
+        return ranked[0][0]
+
+    def resolve(self, mention: str) -> Optional[Listing]:
+        """Resolve a single mention (symbol, company name or alias) to a listing."""
+        listing = self.lookup_symbol(mention)
+        if listing:
+            return listing
+        tokens = _normalize_name(mention)
+        if not tokens:
+            return None
+        phrase = " ".join(tokens)
+        if phrase in self._phrases:
+            return self._symbols[self._phrases[phrase]]
+        if len(phrase) >= PREFIX_MIN_LENGTH:
+            candidates = self.complete(phrase)
+            if len(candidates) == 1:
+                return self._symbols[next(iter(candidates))]
+        symbol = self._match_tokens(tokens)
+        return self._symbols[symbol] if symbol else None
+
+    def find_mentions(self, message: str, limit: Optional[int] = None,
+                      allow_unlisted: bool = False) -> List[str]:
+        """
+        Find every ticker mentioned in a free-text message, in order of appearance.
+
+        Longer company-name phrases win over the single words they contain, so
+        "Tata Motors" resolves to TATAMOTORS rather than anything matching "Tata".
+        With ``allow_unlisted`` a capitalised word that is not in the listing is
+        passed through as-is, for trees that ship only a partial listing.
+        """
+        raw_tokens = _TOKEN_RE.findall(message)
+        norm_tokens = [" ".join(_normalize_name(t)) for t in raw_tokens]
+        found: List[str] = []
+        i = 0
+        while i < len(raw_tokens) and (limit is None or len(found) < limit):
+            symbol, consumed = self._match_at(raw_tokens, norm_tokens, i)
+            if symbol is None and allow_unlisted:
+                candidate = _EXCHANGE_SUFFIX_RE.sub("", raw_tokens[i])
+                if (_UNLISTED_RE.match(candidate) and candidate.lower() not in STOPWORDS
+                        and candidate not in NON_TICKER_ACRONYMS):
+                    symbol = candidate
+            if symbol and symbol not in found:
+                found.append(symbol)
+            i += consumed
+        return found
+
+    def _match_at(self, raw_tokens: List[str], norm_tokens: List[str], i: int) -> Tuple[Optional[str], int]:
+        raw = raw_tokens[i]
+        if not norm_tokens[i] or (raw.upper() in AMBIGUOUS_SYMBOLS and not raw.isupper()):
+            return None, 1
+
+        # 1. Longest exact company-name/alias phrase starting here
+        for width in range(min(MAX_PHRASE_TOKENS, len(raw_tokens) - i), 0, -1):
+            window = [t for t in norm_tokens[i:i + width] if t]
+            if not window or not norm_tokens[i + width - 1]:
+                continue
+            symbol = self._phrases.get(" ".join(window))
+            if symbol:
+                return symbol, width
+
+        # 2. Exact symbol
+        listing = self.lookup_symbol(raw)
+        if listing:
+            return listing.symbol, 1
+
+        # 3. Unique company-name prefix; whole words shared by several companies
+        #    ("bank", "power") are too generic to stand for one of them
+        token = norm_tokens[i]
+        if len(token) >= PREFIX_MIN_LENGTH and self._is_distinctive(token):
+            candidates = self.complete(token)
+            if len(candidates) == 1:
+                return next(iter(candidates)), 1
+
+        # 4. Token-based fuzzy match over the next couple of words
+        for width in (2, 1):
+            window = [t for t in norm_tokens[i:i + width] if t]
+            if len(window) == width:
+                symbol = self._match_tokens(" ".join(window).split())
+                if symbol:
+                    return symbol, width
+        return None, 1
+
+@lru_cache(maxsize=4096)
+def _closest_token(token: str, vocabulary: Tuple[str, ...]) -> Optional[str]:
+    matches = difflib.get_close_matches(token, vocabulary, n=1, cutoff=FUZZY_CUTOFF)
+    return matches[0] if matches else None
+
+_index: Optional[SymbolIndex] = None
+
+def get_symbol_index() -> SymbolIndex:
+    """Load the listing once per process."""
+    global _index
+    if _index is None:
+        path = config.SYMBOL_LISTING_PATH
+        _index = SymbolIndex.from_csv(path) if os.path.exists(path) else SymbolIndex([])
+    return _index
+
+def resolve_tickers(message: str, limit: Optional[int] = None, allow_unlisted: Optional[bool] = None) -> List[str]:
+    """
+    Return bare NSE/BSE symbols mentioned in a message, without any network calls.
+
+    Unlisted capitalised words are passed through only when ``allow_unlisted`` is set,
+    or by default when the listing is known to be partial (SYMBOL_LISTING_PARTIAL, or no listing file).
+    """
+    index = get_symbol_index()
+    if allow_unlisted is None:
+        allow_unlisted = config.SYMBOL_LISTING_PARTIAL or len(index) == 0
+    return index.find_mentions(message, limit=limit, allow_unlisted=allow_unlisted)
@@ -0,0 +1,268 @@
+"""
+Lightweight tracing for the agent graph.
+
+Graph nodes, tool ``_run`` calls, SQLite statements, yfinance requests and LLM
+calls are wrapped in timed spans. Each span carries the request's intent and a
+hashed user bucket (never the raw Telegram id) and is appended as one JSON line
+to a size-rotated file. Per-span latency histograms are also kept in memory.
+
+Usage:
+    python -m tracing                      # latency summary of the trace files
+    python -m tracing --prefix tool.       # only spans whose name starts with "tool."
+"""
+import argparse
+import contextvars
+import functools
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import config
+
+# Latency buckets are powers of two in milliseconds: <=1, <=2, <=4, ... <=65536
+HISTOGRAM_BUCKETS = 17
+
+class _Trace:
+    """State shared by every span of one request; attributes may be added as it runs."""
+    __slots__ = ("trace_id", "attributes")
+
+    def __init__(self, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(8).hex()
+        self.attributes = attributes
+
+_current: contextvars.ContextVar = contextvars.ContextVar("karobuddy_span", default=None)  # (trace, span_id)
+_histograms: Dict[str, List[int]] = defaultdict(lambda: [0] * HISTOGRAM_BUCKETS)
+_totals: Dict[str, float] = defaultdict(float)
+_histogram_lock = threading.Lock()
+_trace_logger = None
+_logger_lock = threading.Lock()
+
+def user_bucket(telegram_id) -> Optional[int]:
+    """Stable bucket for a user, so traces can be grouped without storing ids."""
+    if telegram_id is None:
+        return None
+    digest = hashlib.sha1(str(telegram_id).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % config.TRACE_USER_BUCKETS
+
+def _get_trace_logger() -> logging.Logger:
+    global _trace_logger
+    if _trace_logger is None:
+        with _logger_lock:
+            if _trace_logger is None:
+                os.makedirs(os.path.dirname(config.TRACE_LOG_PATH) or ".", exist_ok=True)
+                handler = RotatingFileHandler(config.TRACE_LOG_PATH, maxBytes=config.TRACE_MAX_BYTES,
+                                              backupCount=config.TRACE_BACKUP_COUNT, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                trace_logger = logging.getLogger("karobuddy.traces")
+                trace_logger.setLevel(logging.INFO)
+                trace_logger.propagate = False
+                trace_logger.addHandler(handler)
+                _trace_logger = trace_logger
+    return _trace_logger
+
+def _bucket(duration_ms: float) -> int:
+    if duration_ms <= 1:
+        return 0
+    return min(math.ceil(math.log2(duration_ms)), HISTOGRAM_BUCKETS - 1)
+
+def _record(name: str, trace: _Trace, span_id: str, parent_id: Optional[str], started: float,
+            duration_ms: float, error: Optional[BaseException], attributes: Dict[str, Any]):
+    with _histogram_lock:
+        _histograms[name][_bucket(duration_ms)] += 1
+        _totals[name] += duration_ms
+    record = {
+        "ts": round(started, 3),
+        "trace_id": trace.trace_id,
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "name": name,
+        "duration_ms": round(duration_ms, 3),
+        "status": "error" if error is not None else "ok",
+        **trace.attributes,
+        **attributes,
+    }
+    if error is not None:
+        record["error"] = type(error).__name__
+    try:
+        _get_trace_logger().info(json.dumps(record, default=str, ensure_ascii=False))
+    except OSError:
+        pass  # Tracing must never break a reply
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Time the enclosed block as a child of the current span (or as a new trace)."""
+    if not config.TRACE_ENABLED:
+        yield
+        return
+    parent = _current.get()
+    trace, parent_id = parent if parent is not None else (_Trace({}), None)
+    span_id = os.urandom(4).hex()
+    token = _current.set((trace, span_id))
+    started = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        _record(name, trace, span_id, parent_id, started, (time.perf_counter() - start) * 1000, error, attributes)
+
+@contextmanager
+def start_trace(name: str, telegram_id=None, **attributes) -> Iterator[None]:
+    """Open the root span of a request; nested spans inherit its attributes."""
+    if not config.TRACE_ENABLED:
+        yield
+        return
+    trace = _Trace({"user_bucket": user_bucket(telegram_id), **attributes})
+    token = _current.set((trace, None))
+    try:
+        with span(name):
+            yield
+    finally:
+        _current.reset(token)
+
+def set_attributes(**attributes):
+    """Attach attributes (e.g. the routed intent) to every later span of the current trace."""
+    current = _current.get()
+    if current is not None:
+        current[0].attributes.update(attributes)
+
+def traced(name: str) -> Callable:
+    """Decorator form of :func:`span`; keeps the wrapped signature for LangGraph."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind_context(fn: Callable) -> Callable:
+    """Carry the current trace into worker threads (thread pools don't copy contextvars)."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor whose statements are recorded as ``db.<verb>`` spans."""
+
+    @staticmethod
+    def _span_name(sql: str) -> str:
+        verb = sql.lstrip().split(None, 1)
+        return f"db.{verb[0].lower()}" if verb else "db.execute"
+
+    def execute(self, sql, parameters=()):
+        with span(self._span_name(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with span(self._span_name(sql)):
+            return super().executemany(sql, seq_of_parameters)
+
+class TracedConnection(sqlite3.Connection):
+    """``sqlite3.connect(..., factory=TracedConnection)`` to trace every statement."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _percentile_from_histogram(counts: List[int], q: float) -> float:
+    target = q * sum(counts)
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= target and count:
+            return float(2 ** i)
+    return 0.0
+
+def summary() -> Dict[str, Dict[str, Any]]:
+    """In-process latency summary per span name (bucket upper bounds for percentiles)."""
+    with _histogram_lock:
+        snapshot = {name: (list(counts), _totals[name]) for name, counts in _histograms.items()}
+    return {
+        name: {
+            "count": sum(counts),
+            "mean_ms": total / sum(counts),
+            "p50_ms": _percentile_from_histogram(counts, 0.5),
+            "p95_ms": _percentile_from_histogram(counts, 0.95),
+            "histogram": counts,
+        }
+        for name, (counts, total) in snapshot.items() if sum(counts)
+    }
+
+def load_spans(path: str = None, since: float = None) -> Iterator[Dict[str, Any]]:
+    """Spans from the trace file and its rotated backups, oldest file first."""
+    path = path or config.TRACE_LOG_PATH
+    backups = [p for p in glob.glob(f"{glob.escape(path)}.*") if p.rsplit(".", 1)[1].isdigit()]
+    files = sorted(backups, key=lambda p: -int(p.rsplit(".", 1)[1]))
+    for file_path in files + [path]:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or record.get("ts", 0) >= since:
+                    yield record
+
+def format_summary(spans, prefix: str = "", group_by: str = None) -> str:
+    """Count, percentiles and a log2-bucket histogram per span name."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for record in spans:
+        if not record.get("name", "").startswith(prefix):
+            continue
+        key = record["name"] if not group_by else f"{record['name']} [{group_by}={record.get(group_by)}]"
+        durations[key].append(record["duration_ms"])
+        errors[key] += record.get("status") == "error"
+    if not durations:
+        return "No spans recorded."
+
+    lines = [f"{'span':<42} {'count':>7} {'err':>5} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  histogram 1ms..65s (log2)"]
+    for key in sorted(durations, key=lambda k: -sum(durations[k])):
+        values = sorted(durations[key])
+        n = len(values)
+        pct = lambda q: values[min(n - 1, int(q * n))]
+        counts = [0] * HISTOGRAM_BUCKETS
+        for v in values:
+            counts[_bucket(v)] += 1
+        peak = max(counts)
+        bars = "".join(" ▁▂▃▄▅▆▇█"[math.ceil(c / peak * 8)] for c in counts)
+        lines.append(f"{key[:42]:<42} {n:>7} {errors[key]:>5} {pct(0.5):>9.1f} {pct(0.9):>9.1f} "
+                     f"{pct(0.99):>9.1f} {values[-1]:>9.1f}  |{bars}|")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize recorded trace spans")
+    parser.add_argument("--path", default=config.TRACE_LOG_PATH)
+    parser.add_argument("--prefix", default="", help="only spans whose name starts with this")
+    parser.add_argument("--hours", type=float, help="only spans from the last N hours")
+    parser.add_argument("--by", choices=["intent", "user_bucket"], help="split each span name by an attribute")
+    args = parser.parse_args(argv)
+    since = time.time() - args.hours * 3600 if args.hours else None
+    print(format_summary(load_spans(args.path, since), args.prefix, args.by))
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit.source_util import get_pages
 from database import db_conn
 import hashlib
 import secrets
-from agent_graph import run_agent_graph
+from agent_graph import run_agent_graph, invoke_agent_graph
+from tools.dynamic_budget_tool import generate_dynamic_budget, load_active_goals
+from tools.ledger import get_ledger
+from tools.budget_tracker import budget_tracker
 import asyncio
 
+STREAM_RENDER_INTERVAL = 0.05  # Seconds between chat placeholder redraws while streaming
+
 # Page configuration
 st.set_page_config(
     page_title="KaroBuddy - AI Financial Advisor",
@@ -469,29 +477,43 @@ def chat_page():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Get AI response, rendering streamed LLM text as it arrives
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    response, _ = asyncio.run(run_agent_graph(
-                        st.session_state.telegram_id,
-                        prompt,
-                        "general"
-                    ))
-                    st.markdown(response)
-                    
-                    # Add assistant response to chat history
-                    st.session_state.chat_history.append({
-                        'role': 'assistant',
-                        'content': response
-                    })
-                except Exception as e:
-                    error_msg = f"⚠️ Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.chat_history.append({
-                        'role': 'assistant',
-                        'content': error_msg
-                    })
+            placeholder = st.empty()
+            placeholder.markdown("⏳ Thinking...")
+            
+            try:
+                # on_token fires on LangGraph worker threads, which have no Streamlit script
+                # context; queue the chunks and redraw from this thread while the graph runs
+                chunks = queue.Queue()
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(invoke_agent_graph, st.session_state.telegram_id,
+                                             prompt, "general", chunks.put)
+                    streamed, rendered_at = "", 0.0
+                    while not (future.done() and chunks.empty()):
+                        try:
+                            streamed += chunks.get(timeout=STREAM_RENDER_INTERVAL)
+                        except queue.Empty:
+                            continue
+                        now = time.perf_counter()
+                        if now - rendered_at >= STREAM_RENDER_INTERVAL:
+                            placeholder.markdown(streamed + "▌")
+                            rendered_at = now
+                    response, _ = future.result()
+                placeholder.markdown(response)
+                
+                # Add assistant response to chat history
+                st.session_state.chat_history.append({
+                    'role': 'assistant',
+                    'content': response
+                })
+            except Exception as e:
+                error_msg = f"⚠️ Error: {str(e)}"
+                placeholder.error(error_msg)
+                st.session_state.chat_history.append({
+                    'role': 'assistant',
+                    'content': error_msg
+                })
 
 def goals_page():
     """Goals management page."""
@@ -743,8 +765,13 @@ def transactions_page():
                                 VALUES (?, ?, 'expense', ?, ?, ?)""",
                             (st.session_state.telegram_id, expense_amount, expense_category,
                              expense_description or f"{expense_category} expense", expense_date.isoformat()))
+                    budget_alert = budget_tracker.record_expense(
+                        db_conn, st.session_state.telegram_id, expense_amount, expense_category,
+                        expense_description, expense_date.isoformat(), c.lastrowid)
                     db_conn.commit()
                     st.success(f"✅ Added expense of ₹{expense_amount:,.0f}!")
+                    if budget_alert:
+                        st.warning(budget_alert)
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
     
@@ -793,12 +820,12 @@ def dfg_page():
     dfg_data = c.fetchone()
     
     # Fetch latest budget
-    c.execute("""SELECT recommended_allocations_json FROM dynamic_budgets 
+    c.execute("""SELECT recommended_allocations_json, created_at FROM dynamic_budgets 
                  WHERE user_id=? ORDER BY created_at DESC LIMIT 1""", (telegram_id,))
     budget_data = c.fetchone()
     
     if not dfg_data:
-        st.info("No DFG analysis found. Go to the Chat and ask to 'Analyze my DFG' or 'Predict cash flow'!")
+        st.info("No DFG analysis found yet. Forecasts are refreshed nightly; you can also ask the Chat to 'Analyze my DFG' or 'Predict cash flow'!")
         if st.button("🔮 Run DFG Analysis Now"):
              with st.spinner("Crunching the numbers..."):
                  try:
@@ -813,16 +840,18 @@ def dfg_page():
 
     import json
     try:
-        cash_flow = json.loads(dfg_data[1].replace("'", '"'))
-        volatility = dfg_data[0]
-    except:
+        cash_flow = json.loads(dfg_data[1])
+    except (TypeError, ValueError):
+        # Rows saved before the forecast was stored as JSON hold a Python repr
         try:
             import ast
             cash_flow = ast.literal_eval(dfg_data[1])
-            volatility = dfg_data[0]
-        except:
+        except (ValueError, SyntaxError):
              st.error("Error parsing DFG data.")
              return
+    volatility = dfg_data[0]
+
+    st.caption(f"Forecast updated {dfg_data[2][:16].replace('T', ' ')}")
 
     # --- Metrics Section ---
     col1, col2, col3, col4 = st.columns(4)
@@ -842,15 +871,12 @@ def dfg_page():
     # --- Cash Flow Graph ---
     st.subheader("📈 Cash Flow Projection")
     
-    # 1. Get Historical Data (Last 90 days)
-    c.execute("""SELECT date, SUM(amount) as net_amount 
-                 FROM transactions 
-                 WHERE telegram_id=? AND date > date('now', '-90 days')
-                 GROUP BY date ORDER BY date""", (telegram_id,))
-    history_rows = c.fetchall()
-    
-    history_df = pd.DataFrame(history_rows, columns=['Date', 'Net Amount'])
-    history_df['Date'] = pd.to_datetime(history_df['Date'])
+    # 1. Get Historical Data (Last 90 days), signed so expenses pull the line down
+    ledger = get_ledger(telegram_id, days=90)
+    ledger = ledger.select(ledger.is_cash_flow)
+    history_days, day_index = np.unique(ledger.day, return_inverse=True)
+    history_df = pd.DataFrame({'Date': pd.to_datetime(history_days),
+                               'Net Amount': np.bincount(day_index, weights=ledger.amount, minlength=len(history_days))})
     
     # Cumulative Cash Flow
     if not history_df.empty:
@@ -862,10 +888,19 @@ def dfg_page():
     last_date = history_df['Date'].max() if not history_df.empty else datetime.now()
     last_val = history_df['Cumulative'].iloc[-1] if not history_df.empty else 0
     
-    pred_net_daily = cash_flow.get('net_cash_flow', 0) / 30 
+    # Recurring inflows/outflows land on their expected dates; the rest of the net flow is spread evenly
+    scheduled = {}
+    for flow in cash_flow.get('expected_flows', []):
+        signed = flow['amount'] if flow['kind'] == 'income' else -flow['amount']
+        scheduled[flow['date']] = scheduled.get(flow['date'], 0) + signed
+    pred_net_daily = (cash_flow.get('net_cash_flow', 0) - sum(scheduled.values())) / 30 
     
     future_dates = [last_date + timedelta(days=i) for i in range(1, 31)]
-    future_vals = [last_val + (pred_net_daily * i) for i in range(1, 31)]
+    future_vals = []
+    running = last_val
+    for day in future_dates:
+        running += pred_net_daily + scheduled.get(day.strftime('%Y-%m-%d'), 0)
+        future_vals.append(running)
     
     future_df = pd.DataFrame({'Date': future_dates, 'Cumulative': future_vals})
 
@@ -882,6 +917,35 @@ def dfg_page():
             line=dict(color='#2ca02c', width=3)
         ))
 
+    # Shaded P10–P90 fan from the bootstrap simulation, with its median path
+    simulation = cash_flow.get('simulation') or {}
+    fan = simulation.get('fan')
+    if fan:
+        fan_dates = [last_date + timedelta(days=i) for i in range(1, len(fan['p10']) + 1)]
+        fig.add_trace(go.Scatter(
+            x=fan_dates,
+            y=[last_val + v for v in fan['p90']],
+            mode='lines',
+            name='P90',
+            line=dict(color='rgba(255,127,14,0.4)', width=1)
+        ))
+        fig.add_trace(go.Scatter(
+            x=fan_dates,
+            y=[last_val + v for v in fan['p10']],
+            mode='lines',
+            name='P10',
+            fill='tonexty',
+            fillcolor='rgba(255,127,14,0.2)',
+            line=dict(color='rgba(255,127,14,0.4)', width=1)
+        ))
+        fig.add_trace(go.Scatter(
+            x=fan_dates,
+            y=[last_val + v for v in fan['p50']],
+            mode='lines',
+            name='Median Path',
+            line=dict(color='#ffbb78', width=2)
+        ))
+
     # Dotted line for predicted cost/flow
     fig.add_trace(go.Scatter(
         x=future_df['Date'], 
@@ -901,20 +965,37 @@ def dfg_page():
     )
     st.plotly_chart(fig, use_container_width=True)
 
+    if simulation:
+        r_col1, r_col2, r_col3 = st.columns(3)
+        with r_col1:
+            st.metric("Net Flow Range (P10–P90)", f"₹{simulation['net_p10']:,.0f} – ₹{simulation['net_p90']:,.0f}")
+        with r_col2:
+            st.metric("Chance of Negative Balance", f"{simulation['prob_negative_balance']:.0%}")
+        with r_col3:
+            st.metric("Expected Shortfall", f"₹{simulation['expected_shortfall']:,.0f}",
+                      help="Average lowest balance below zero, over the simulated months that go negative")
+
     # --- Dynamic Budget Section ---
     st.markdown("---")
     st.subheader("💡 Dynamic Budget Allocation")
     
-    if budget_data:
+    # The nightly batch refreshes only the forecast; derive the budget from it when the saved one is older
+    budget = None
+    if not budget_data or budget_data[1] < dfg_data[2]:
+        budget = generate_dynamic_budget(cash_flow, load_active_goals(telegram_id, db_conn))
+        if 'error' in budget:
+            budget = None
+    if budget is None and budget_data:
         try:
-            budget = json.loads(budget_data[0].replace("'", '"'))
+            budget = json.loads(budget_data[0])
         except:
              try:
                 import ast
                 budget = ast.literal_eval(budget_data[0])
              except:
                 budget = {}
-        
+
+    if budget is not None:
         b_col1, b_col2 = st.columns([1, 1])
         
         with b_col1:
@@ -937,6 +1018,18 @@ def dfg_page():
             
             if budget.get('notes'):
                 st.caption(f"*Note: {budget.get('notes')}*")
+
+        if budget.get('goal_allocations'):
+            st.markdown("### 🎯 Goal Savings Plan")
+            st.caption("This month's savings, shared across your active goals, earliest deadline first.")
+            st.dataframe(pd.DataFrame([{
+                "Goal": g['goal_name'],
+                "Deadline": g['deadline'] or "—",
+                "Remaining": f"₹{g['remaining']:,.0f}",
+                "Needed / Month": f"₹{g['required_monthly']:,.0f}",
+                "Allocated": f"₹{g['allocation']:,.0f}",
+                "Status": "✅ On track" if g['on_track'] else "⚠️ Behind",
+            } for g in budget['goal_allocations']]), hide_index=True, use_container_width=True)
     else:
         st.info("No dynamic budget generated yet.")
 